@@ -0,0 +1,559 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Deterministic, in-process stand-ins for BigQuery and Dataplex objects, used to
+exercise the agent's code paths without network access or GCP credentials.
+Every call can be given a fixed latency, so timings measured against the fakes
+are comparable from one run to the next.
+"""
+
+import datetime
+import itertools
+import json
+import re
+import threading
+import time
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+# The `modified` time of every fake table and dataset. It lies in the past, so
+# results cached by the query result cache stay valid.
+FAKE_MODIFIED = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class FakeRow(dict):
+    """A result row; like `google.cloud.bigquery.Row`, it supports `items()`."""
+
+
+class FakeBigQueryReadClient:
+    """
+    Stands in for `bigquery_storage.BigQueryReadClient`. It records how many
+    downloads it served, so callers can check which path was taken.
+    """
+
+    def __init__(self, **kwargs):
+        self.downloads = 0
+
+
+class FakeSchemaField:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class FakeRowIterator:
+    """
+    Stands in for the RowIterator returned by `QueryJob.result()`, serving
+    the given rows both over the REST-style iterator and as Arrow batches.
+    """
+
+    def __init__(self, rows: list[dict], batch_size: int = 10000):
+        self._rows = rows
+        self._batch_size = batch_size
+        self.total_rows = len(rows)
+        self.schema = [FakeSchemaField(name) for name in (rows[0] if rows else {})]
+
+    def __iter__(self):
+        return (FakeRow(row) for row in self._rows)
+
+    def to_arrow_iterable(self, bqstorage_client=None, **kwargs):
+        import pyarrow
+
+        if isinstance(bqstorage_client, FakeBigQueryReadClient):
+            bqstorage_client.downloads += 1
+        if isinstance(self._rows, GeneratedRows):
+            yield from self._rows.record_batches(self._batch_size)
+            return
+        for start in range(0, len(self._rows), self._batch_size):
+            yield pyarrow.RecordBatch.from_pylist(
+                self._rows[start : start + self._batch_size]
+            )
+
+
+def _make_row(i: int, num_columns: int) -> dict:
+    row = {}
+    for c in range(num_columns):
+        if c % 3 == 0:
+            row[f"col_{c}"] = f"value_{(i * 7 + c) % 101}"
+        elif c % 3 == 1:
+            row[f"col_{c}"] = i * (c + 1)
+        else:
+            row[f"col_{c}"] = (i % 1000) / (c + 1)
+    return row
+
+
+def make_rows(num_rows: int, num_columns: int = 5) -> list[dict]:
+    """
+    Returns `num_rows` deterministic rows mixing string, integer and float columns.
+    """
+    return [_make_row(i, num_columns) for i in range(num_rows)]
+
+
+class GeneratedRows:
+    """
+    The rows of `make_rows`, generated on access instead of held in memory, so
+    results of millions of rows can be served. The Arrow batches are built once
+    and kept, so repeated downloads measure the reader rather than the fake.
+    """
+
+    def __init__(self, num_rows: int, num_columns: int = 5):
+        self.num_rows = num_rows
+        self.num_columns = num_columns
+        self._batches: dict[int, list] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.num_rows
+
+    def __iter__(self):
+        return (_make_row(i, self.num_columns) for i in range(self.num_rows))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [_make_row(i, self.num_columns) for i in range(*key.indices(self.num_rows))]
+        if not -self.num_rows <= key < self.num_rows:
+            raise IndexError(key)
+        return _make_row(key % self.num_rows, self.num_columns)
+
+    def record_batches(self, batch_size: int) -> list:
+        import pyarrow
+
+        with self._lock:
+            if batch_size not in self._batches:
+                self._batches[batch_size] = [
+                    pyarrow.RecordBatch.from_pylist(self[start : start + batch_size])
+                    for start in range(0, self.num_rows, batch_size)
+                ]
+            return self._batches[batch_size]
+
+
+class FakeDataset:
+    """
+    Describes the deterministic dataset served by the fake clients: its tables,
+    their columns and sizes, the data profiles and few-shot examples tables,
+    and the latency of every API call.
+    Args:
+        project_id: The project of the dataset.
+        dataset_id: The dataset ID.
+        num_tables: Number of tables, named table_000, table_001, ...
+        num_columns: Number of columns per table (see `make_rows`).
+        rows_per_table: Row count of every table, as seen by `list_rows`.
+        profiles_table_id: Full ID of the data profiles table, if any.
+        few_shot_table_id: Full ID of the few-shot examples table, if any.
+        num_few_shot_examples: Number of few-shot examples.
+        profile_top_n: Number of top values in each column profile.
+        latency_seconds: Latency added to every API call.
+        query_seconds: Time a query job runs before its result is ready.
+        queue_seconds: Time a query job is queued (PENDING) before it runs.
+        location: The Dataplex location of the entries.
+    """
+
+    def __init__(
+        self,
+        project_id: str = "bench-project",
+        dataset_id: str = "bench_dataset",
+        num_tables: int = 20,
+        num_columns: int = 10,
+        rows_per_table: int = 1000,
+        profiles_table_id: str | None = None,
+        few_shot_table_id: str | None = None,
+        num_few_shot_examples: int = 50,
+        profile_top_n: int = 10,
+        latency_seconds: float = 0.0,
+        query_seconds: float = 0.0,
+        queue_seconds: float = 0.0,
+        location: str = "us-central1",
+    ):
+        self.project_id = project_id
+        self.dataset_id = dataset_id
+        self.table_ids = [f"table_{i:03d}" for i in range(num_tables)]
+        self.num_columns = num_columns
+        self.rows_per_table = rows_per_table
+        self.profiles_table_id = profiles_table_id
+        self.few_shot_table_id = few_shot_table_id
+        self.num_few_shot_examples = num_few_shot_examples
+        self.profile_top_n = profile_top_n
+        self.latency_seconds = latency_seconds
+        self.query_seconds = query_seconds
+        self.queue_seconds = queue_seconds
+        self.location = location
+        self.calls: dict[str, int] = {}
+        self._calls_lock = threading.Lock()
+        self._results: dict[tuple[int, int], GeneratedRows] = {}
+        # The `modified` time of each table and the start time of its latest
+        # profile scan; `modify_table` and `rescan_profile` move them forward.
+        self.table_modified = {table_id: FAKE_MODIFIED for table_id in self.table_ids}
+        self.profile_scanned = {table_id: FAKE_MODIFIED for table_id in self.table_ids}
+
+    def call(self, name: str) -> None:
+        """Counts an API call and waits for its latency."""
+        with self._calls_lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+    def modify_table(self, table_id: str) -> None:
+        """Marks a table as modified now."""
+        self.table_modified[table_id] = datetime.datetime.now(datetime.timezone.utc)
+
+    def rescan_profile(self, table_id: str) -> None:
+        """Records a new profile scan of a table."""
+        self.profile_scanned[table_id] = datetime.datetime.now(datetime.timezone.utc)
+
+    def table_state(self, full_table_id: str) -> tuple[datetime.datetime, int]:
+        """Returns the `modified` time and row count of a table."""
+        if full_table_id == self.profiles_table_id:
+            modified = max(self.profile_scanned.values(), default=FAKE_MODIFIED)
+            return modified, len(self.table_ids) * self.num_columns
+        if full_table_id == self.few_shot_table_id:
+            return FAKE_MODIFIED, len(self.few_shot_rows())
+        table_id = full_table_id.split(".")[-1]
+        return self.table_modified.get(table_id, FAKE_MODIFIED), self.rows_per_table
+
+    def column_type(self, c: int) -> str:
+        return ("STRING", "INT64", "FLOAT64")[c % 3]
+
+    def full_table_id(self, table_id: str) -> str:
+        return f"{self.project_id}.{self.dataset_id}.{table_id}"
+
+    def entry_name(self, table_id: str) -> str:
+        return (
+            f"projects/{self.project_id}/locations/{self.location}/entryGroups/@bigquery/entries/"
+            f"bigquery.googleapis.com/projects/{self.project_id}/datasets/{self.dataset_id}/tables/{table_id}"
+        )
+
+    def generated_rows(self, num_rows: int, num_columns: int = 5) -> GeneratedRows:
+        """Returns the (shared) generated rows of a query result."""
+        key = (num_rows, num_columns)
+        with self._calls_lock:
+            if key not in self._results:
+                self._results[key] = GeneratedRows(num_rows, num_columns)
+            return self._results[key]
+
+    def schema_rows(self) -> list[dict]:
+        rows = []
+        for i, table_id in enumerate(self.table_ids):
+            for c in range(self.num_columns):
+                rows.append(
+                    {
+                        "table_name": table_id,
+                        "table_description": f'"Table {i} of the benchmark dataset."',
+                        "field_path": f"col_{c}",
+                        "data_type": self.column_type(c),
+                        "description": f"Column {c} of {table_id}.",
+                        "is_partitioning_column": "NO",
+                        "clustering_ordinal_position": None,
+                    }
+                )
+        return rows
+
+    def profile_rows(self) -> list[dict]:
+        rows = []
+        for i, table_id in enumerate(self.table_ids):
+            for c in range(self.num_columns):
+                rows.append(
+                    {
+                        "source_table_id": self.full_table_id(table_id),
+                        "column_name": f"col_{c}",
+                        "percent_null": float((i + c) % 20),
+                        "percent_unique": float((i * 3 + c) % 100),
+                        "min_string_length": 7 if c % 3 == 0 else None,
+                        "max_string_length": 9 if c % 3 == 0 else None,
+                        "min_value": None if c % 3 == 0 else "0",
+                        "max_value": None if c % 3 == 0 else str(self.rows_per_table * (c + 1)),
+                        "job_start_time": self.profile_scanned[table_id],
+                        "top_n": [
+                            {"value": f"value_{v}", "count": 100 - v, "ratio": (100 - v) / 1000}
+                            for v in range(self.profile_top_n)
+                        ],
+                    }
+                )
+        return rows
+
+    def few_shot_rows(self) -> list[dict]:
+        rows = []
+        for i in range(self.num_few_shot_examples if self.table_ids else 0):
+            table_id = self.table_ids[i % len(self.table_ids)]
+            column = f"col_{i % self.num_columns}"
+            rows.append(
+                {
+                    "dataset": self.dataset_id,
+                    "question": f"What is the total {column} per col_0 in {table_id}?",
+                    "sql": f"SELECT col_0, SUM({column}) FROM `{self.full_table_id(table_id)}` GROUP BY col_0",
+                }
+            )
+        return rows
+
+    def sample_union_rows(self, sql: str) -> list[dict]:
+        rows = []
+        for table_id, limit in re.findall(
+            r"SELECT '(\w+)' AS table_id.*?LIMIT (\d+)", sql
+        ):
+            for row in make_rows(min(int(limit), self.rows_per_table), self.num_columns):
+                rows.append({"table_id": table_id, "row_json": json.dumps(row)})
+        return rows
+
+    def entry_aspects(self, table_id: str) -> dict:
+        i = self.table_ids.index(table_id)
+        return {
+            f"{self.project_id}.global.schema": FakeAspect(
+                {
+                    "fields": [
+                        {
+                            "name": f"col_{c}",
+                            "dataType": self.column_type(c),
+                            "description": f"Column {c} of {table_id}.",
+                        }
+                        for c in range(self.num_columns)
+                    ]
+                }
+            ),
+            f"{self.project_id}.global.overview": FakeAspect(
+                {"content": f"Table {i} of the benchmark dataset."}
+            ),
+        }
+
+
+class FakeTableReference:
+    def __init__(self, project: str, dataset_id: str, table_id: str):
+        self.project = project
+        self.dataset_id = dataset_id
+        self.table_id = table_id
+
+    @classmethod
+    def from_any(cls, ref) -> "FakeTableReference":
+        if isinstance(ref, str):
+            return cls(*ref.replace(":", ".").split("."))
+        return cls(ref.project, ref.dataset_id, ref.table_id)
+
+
+class FakeTable:
+    """Stands in for `bigquery.Table` (and the items of `list_tables`)."""
+
+    def __init__(self, ref: FakeTableReference):
+        self.project = ref.project
+        self.dataset_id = ref.dataset_id
+        self.table_id = ref.table_id
+        self.table_type = "TABLE"
+        self.modified = FAKE_MODIFIED
+        self.num_rows = None
+        self.time_partitioning = None
+        self.range_partitioning = None
+        self.require_partition_filter = False
+
+
+class FakeDatasetInfo:
+    """Stands in for `bigquery.Dataset` and `bigquery.DatasetReference`."""
+
+    def __init__(self, project: str, dataset_id: str):
+        self.project = project
+        self.dataset_id = dataset_id
+        self.description = f"The {dataset_id} benchmark dataset."
+        self.modified = FAKE_MODIFIED
+
+
+class FakeQueryJob:
+    """
+    Stands in for `bigquery.QueryJob`. The job is queued for `queue_seconds`
+    after it was submitted, then runs for `query_seconds`.
+    """
+
+    _job_ids = itertools.count()
+
+    def __init__(
+        self,
+        rows,
+        query_seconds: float,
+        referenced_tables: list,
+        dry_run: bool,
+        queue_seconds: float = 0.0,
+    ):
+        self.job_id = f"fake_job_{next(self._job_ids)}"
+        self.created = datetime.datetime.now(datetime.timezone.utc)
+        if dry_run:
+            queue_seconds = query_seconds = 0.0
+        self.referenced_tables = referenced_tables
+        # A dry run reports 10 MiB per table read.
+        self.total_bytes_processed = (
+            10 * 1024 * 1024 * len(referenced_tables) if dry_run else len(rows) * 100
+        )
+        self.cache_hit = False
+        self.cancelled = False
+        self.error_result = None
+        self._rows = rows
+        self._started_at = time.monotonic() + queue_seconds
+        self._done_at = self._started_at + query_seconds
+        self._queue_seconds = queue_seconds
+
+    @property
+    def state(self) -> str:
+        now = time.monotonic()
+        if self.cancelled or now >= self._done_at:
+            return "DONE"
+        return "RUNNING" if now >= self._started_at else "PENDING"
+
+    @property
+    def started(self) -> datetime.datetime | None:
+        if self.state == "PENDING":
+            return None
+        return self.created + datetime.timedelta(seconds=self._queue_seconds)
+
+    def done(self, **kwargs) -> bool:
+        return self.cancelled or time.monotonic() >= self._done_at
+
+    def result(self, timeout: float | None = None, **kwargs) -> FakeRowIterator:
+        remaining = self._done_at - time.monotonic()
+        if remaining > 0 and not self.cancelled:
+            if timeout is not None and timeout < remaining:
+                time.sleep(timeout)
+                raise FuturesTimeoutError()
+            time.sleep(remaining)
+        return FakeRowIterator(self._rows)
+
+    def cancel(self, **kwargs) -> bool:
+        self.cancelled = True
+        return True
+
+
+class FakeBigQueryClient:
+    """
+    Stands in for `bigquery.Client`, serving a FakeDataset. Queries are routed
+    by what they read: `__TABLES__`, INFORMATION_SCHEMA, the data profiles and
+    few-shot examples tables, batched samples, and otherwise generated rows
+    (as many as the query's LIMIT, 10 without one).
+    """
+
+    SCOPE = ("https://www.googleapis.com/auth/cloud-platform",)
+
+    def __init__(self, dataset: FakeDataset, project: str | None = None, **kwargs):
+        self.fake_dataset = dataset
+        self.project = project or dataset.project_id
+
+    def _table(self, ref) -> FakeTableReference:
+        return FakeTableReference.from_any(ref)
+
+    def query(self, sql: str, job_config=None, **kwargs) -> FakeQueryJob:
+        ds = self.fake_dataset
+        ds.call("bigquery.query")
+        dry_run = bool(job_config is not None and getattr(job_config, "dry_run", False))
+        referenced_tables = [
+            FakeTableReference(project, dataset_id, table_id)
+            for project, dataset_id, table_id in re.findall(
+                r"`([\w-]+)\.(\w+)\.(\w+)`", sql
+            )
+        ]
+        if dry_run:
+            rows = []
+        elif "__TABLES__" in sql:
+            rows = [
+                {"table_id": table_id, "last_modified_time": int(modified.timestamp() * 1000)}
+                for table_id, modified in ds.table_modified.items()
+            ]
+        elif "INFORMATION_SCHEMA.COLUMN_FIELD_PATHS" in sql:
+            rows = ds.schema_rows()
+        elif ds.profiles_table_id and ds.profiles_table_id in sql:
+            if "MAX(job_start_time)" in sql:
+                rows = [
+                    {"table_id": table_id, "job_start_time": scanned}
+                    for table_id, scanned in ds.profile_scanned.items()
+                ]
+            else:
+                rows = ds.profile_rows()
+        elif ds.few_shot_table_id and ds.few_shot_table_id in sql:
+            rows = ds.few_shot_rows()
+        elif "TO_JSON_STRING(t) AS row_json" in sql:
+            rows = ds.sample_union_rows(sql)
+        else:
+            limit = re.search(r"\bLIMIT\s+(\d+)\s*;?\s*$", sql, re.IGNORECASE)
+            rows = ds.generated_rows(int(limit.group(1)) if limit else 10)
+        return FakeQueryJob(
+            rows, ds.query_seconds, referenced_tables, dry_run, ds.queue_seconds
+        )
+
+    def get_table(self, ref, **kwargs) -> FakeTable:
+        self.fake_dataset.call("bigquery.get_table")
+        table = FakeTable(self._table(ref))
+        table.modified, table.num_rows = self.fake_dataset.table_state(
+            f"{table.project}.{table.dataset_id}.{table.table_id}"
+        )
+        return table
+
+    def get_dataset(self, ref, **kwargs) -> FakeDatasetInfo:
+        self.fake_dataset.call("bigquery.get_dataset")
+        if isinstance(ref, str):
+            project, _, dataset_id = ref.rpartition(".")
+            return FakeDatasetInfo(project or self.project, dataset_id)
+        return FakeDatasetInfo(ref.project, ref.dataset_id)
+
+    def dataset(self, dataset_id: str, project: str | None = None) -> FakeDatasetInfo:
+        return FakeDatasetInfo(project or self.project, dataset_id)
+
+    def list_tables(self, dataset_ref, **kwargs) -> list[FakeTable]:
+        ds = self.fake_dataset
+        ds.call("bigquery.list_tables")
+        return [
+            FakeTable(FakeTableReference(ds.project_id, ds.dataset_id, table_id))
+            for table_id in ds.table_ids
+        ]
+
+    def list_rows(self, table_ref, max_results: int | None = None, **kwargs) -> FakeRowIterator:
+        ds = self.fake_dataset
+        ds.call("bigquery.list_rows")
+        num_rows = ds.rows_per_table
+        if max_results is not None:
+            num_rows = min(num_rows, max_results)
+        return FakeRowIterator(make_rows(num_rows, ds.num_columns))
+
+
+class FakeAspect:
+    def __init__(self, data: dict):
+        self.data = data
+
+
+class FakeEntry:
+    def __init__(self, name: str, aspects: dict | None = None):
+        self.name = name
+        self.aspects = aspects or {}
+
+
+class FakeSearchEntriesResult:
+    def __init__(self, entry: FakeEntry):
+        self.dataplex_entry = entry
+
+
+class FakeCatalogServiceClient:
+    """
+    Stands in for `dataplex_v1.CatalogServiceClient`, serving an entry with a
+    schema and an overview aspect for every table of a FakeDataset.
+    """
+
+    def __init__(self, dataset: FakeDataset, **kwargs):
+        self.fake_dataset = dataset
+
+    def search_entries(self, request=None, **kwargs) -> list[FakeSearchEntriesResult]:
+        ds = self.fake_dataset
+        ds.call("dataplex.search_entries")
+        return [
+            FakeSearchEntriesResult(FakeEntry(ds.entry_name(table_id)))
+            for table_id in ds.table_ids
+        ]
+
+    def get_entry(self, request=None, retry=None, **kwargs) -> FakeEntry:
+        ds = self.fake_dataset
+        ds.call("dataplex.get_entry")
+        table_id = request.name.split("/")[-1]
+        if table_id not in ds.table_ids:
+            from google.api_core import exceptions as api_exceptions
+
+            raise api_exceptions.NotFound(f"Entry {request.name} not found.")
+        return FakeEntry(request.name, ds.entry_aspects(table_id))
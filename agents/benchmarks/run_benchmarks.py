@@ -0,0 +1,572 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Offline benchmarks of the data agent.
+
+BigQuery, the BigQuery Storage Read API and Dataplex are replaced by the
+deterministic in-process fakes of `benchmarks/fakes.py`, with a fixed latency
+per API call, so no credentials or network access are needed and results are
+comparable across commits. It times:
+
+- the import of `data_agent.agent` in a fresh interpreter, and the first
+  build of its instruction, with and without a context snapshot on disk;
+- `return_instructions_bigquery` end to end, with and without a snapshot, and
+  each context fetcher on its own;
+- `validate_query` on a valid query and on one with an unknown column;
+- `refresh_context` with nothing changed and with one table changed;
+- `execute_bigquery_query` for results of 10 to 1,000,000 rows, and a cache hit;
+- `execute_bigquery_queries` with a full batch of uncached queries;
+- admitting and releasing query jobs through the job scheduler;
+- keeping a full result for follow-up analysis, and `analyze_query_result`.
+
+Run from the `agents/` directory:
+
+    python benchmarks/run_benchmarks.py --output baseline.json
+    python benchmarks/run_benchmarks.py --output current.json --compare baseline.json
+
+With `--compare`, the exit status is 1 if any benchmark is slower than the
+baseline by more than `--threshold`.
+"""
+
+import argparse
+import importlib.util
+import itertools
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_VERSION = 1
+
+
+def _load_fakes():
+    """
+    Loads benchmarks/fakes.py by its path, so that the benchmark runs from
+    any working directory.
+    """
+    spec = importlib.util.spec_from_file_location(
+        "benchmark_fakes", os.path.join(AGENTS_DIR, "benchmarks", "fakes.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _benchmark_env(args, cache_dir: str) -> dict:
+    """
+    Returns the environment the agent is configured from in a benchmark run.
+    """
+    env = {
+        "PROJECT_ID": args.project_id,
+        "DATASET_NAME": args.dataset_name,
+        "BQ_LOCATION": "us-central1",
+        "DISPLAY_NAME": "BENCHMARK_AGENT",
+        "FEW_SHOT_EXAMPLES_TABLE_FULL_ID": f"{args.project_id}.bench_meta.few_shot_examples",
+        "CONTEXT_CACHE_DIR": cache_dir,
+        "INSTRUCTION_MODE": args.instruction_mode,
+        # Refreshes are benchmarked on their own, not in a background thread.
+        "CONTEXT_REFRESH_INTERVAL_SECONDS": "0",
+    }
+    if not args.no_profiles:
+        env["DATA_PROFILES_TABLE_FULL_ID"] = f"{args.project_id}.bench_meta.data_profiles"
+    return env
+
+
+def _install_fakes(args):
+    """
+    Replaces the Google Cloud clients with fakes serving the benchmark dataset.
+    Must run before data_agent is imported.
+    Returns:
+        The FakeDataset served by the fakes.
+    """
+    import google.auth
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import bigquery, dataplex_v1
+
+    fakes = _load_fakes()
+    dataset = fakes.FakeDataset(
+        project_id=args.project_id,
+        dataset_id=args.dataset_name,
+        num_tables=args.tables,
+        num_columns=args.columns,
+        rows_per_table=args.rows_per_table,
+        profiles_table_id=os.environ.get("DATA_PROFILES_TABLE_FULL_ID"),
+        few_shot_table_id=os.environ.get("FEW_SHOT_EXAMPLES_TABLE_FULL_ID"),
+        num_few_shot_examples=args.few_shot_examples,
+        latency_seconds=args.latency_ms / 1000,
+        query_seconds=args.query_ms / 1000,
+    )
+
+    class BenchmarkBigQueryClient(fakes.FakeBigQueryClient):
+        def __init__(self, *client_args, **kwargs):
+            super().__init__(dataset, **kwargs)
+
+    class BenchmarkCatalogServiceClient(fakes.FakeCatalogServiceClient):
+        def __init__(self, *client_args, **kwargs):
+            super().__init__(dataset, **kwargs)
+
+    google.auth.default = lambda *auth_args, **kwargs: (
+        AnonymousCredentials(),
+        args.project_id,
+    )
+    bigquery.Client = BenchmarkBigQueryClient
+    dataplex_v1.CatalogServiceClient = BenchmarkCatalogServiceClient
+    try:
+        from google.cloud import bigquery_storage
+
+        bigquery_storage.BigQueryReadClient = fakes.FakeBigQueryReadClient
+    except ImportError:
+        pass
+    return dataset
+
+
+def _summarize(runs: list[float], **metrics) -> dict:
+    return {
+        "unit": "seconds",
+        "runs": runs,
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "mean": statistics.fmean(runs),
+        "max": max(runs),
+        **metrics,
+    }
+
+
+def _measure(fn, repeat: int, setup=None) -> tuple[list[float], object]:
+    """
+    Calls `fn(i)` `repeat` times, after `setup()` if given, and returns the
+    wall-clock duration of each call and the last return value.
+    """
+    runs = []
+    value = None
+    for i in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        value = fn(i)
+        runs.append(time.perf_counter() - start)
+    return runs, value
+
+
+def _clear_dir(path: str) -> None:
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def _child_args(args) -> list[str]:
+    return [
+        "--project-id", args.project_id,
+        "--dataset-name", args.dataset_name,
+        "--tables", str(args.tables),
+        "--columns", str(args.columns),
+        "--rows-per-table", str(args.rows_per_table),
+        "--few-shot-examples", str(args.few_shot_examples),
+        "--latency-ms", str(args.latency_ms),
+        "--query-ms", str(args.query_ms),
+        "--instruction-mode", args.instruction_mode,
+    ] + (["--no-profiles"] if args.no_profiles else [])
+
+
+def _import_child(args) -> None:
+    """
+    Runs in a fresh interpreter: installs the fakes, imports data_agent.agent,
+    builds its instruction, and prints how long each step took.
+    """
+    _install_fakes(args)
+    start = time.perf_counter()
+    import data_agent.agent
+
+    imported = time.perf_counter()
+    data_agent.agent.root_agent.instruction.resolve()
+    print(
+        json.dumps(
+            {
+                "import_seconds": imported - start,
+                "resolve_seconds": time.perf_counter() - imported,
+            }
+        )
+    )
+
+
+def _time_import(args, cache_dir: str) -> dict:
+    env = dict(os.environ, **_benchmark_env(args, cache_dir))
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--import-child"] + _child_args(args),
+        cwd=AGENTS_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def bench_import(args, results: dict) -> None:
+    cold_runs = []
+    for _ in range(args.repeat):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold_runs.append(_time_import(args, cache_dir))
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # The first run writes the context snapshot the others load.
+        _time_import(args, cache_dir)
+        warm_runs = [_time_import(args, cache_dir) for _ in range(args.repeat)]
+
+    results["import_agent"] = _summarize(
+        [run["import_seconds"] for run in cold_runs + warm_runs]
+    )
+    results["resolve_instruction[cold]"] = _summarize(
+        [run["resolve_seconds"] for run in cold_runs]
+    )
+    results["resolve_instruction[snapshot]"] = _summarize(
+        [run["resolve_seconds"] for run in warm_runs]
+    )
+
+
+def bench_instructions(args, results: dict, cache_dir: str, dataset) -> None:
+    from data_agent import context_refresh, instructions, sql_validation, utils
+
+    clear_cache = lambda: _clear_dir(cache_dir)  # noqa: E731
+    runs, instruction = _measure(
+        lambda i: instructions.return_instructions_bigquery(), args.repeat, clear_cache
+    )
+    results["return_instructions_bigquery[cold]"] = _summarize(
+        runs, instruction_chars=len(instruction)
+    )
+    runs, instruction = _measure(
+        lambda i: instructions.return_instructions_bigquery(), args.repeat
+    )
+    results["return_instructions_bigquery[snapshot]"] = _summarize(
+        runs, instruction_chars=len(instruction)
+    )
+
+    fetchers = {
+        "dataset_description": utils.fetch_dataset_description,
+        "table_metadata": utils.fetch_table_entry_metadata,
+        "table_schemas": utils.fetch_table_schemas,
+        "data_profiles": utils.fetch_bigquery_data_profiles,
+        "few_shot_examples": utils.fetch_few_shot_examples,
+        "sample_data": lambda: utils.fetch_sample_data_for_tables(num_rows=3),
+    }
+    for source, fetch_fn in fetchers.items():
+        runs, value = _measure(lambda i: fetch_fn(), args.repeat, clear_cache)
+        results[f"fetch[{source}]"] = _summarize(runs, items=len(value))
+
+    context = instructions.fetch_instruction_context()
+    runs, instruction = _measure(
+        lambda i: instructions.build_instruction_from_context(context), args.repeat
+    )
+    results["build_instruction_from_context"] = _summarize(
+        runs, instruction_chars=len(instruction)
+    )
+
+    # The offline check a query goes through before it is sent to BigQuery.
+    catalog = sql_validation.SchemaCatalog.from_context(context)
+    table_id = dataset.full_table_id(dataset.table_ids[0])
+    sql_queries = {
+        "valid": f"SELECT col_0, SUM(col_1) AS total FROM `{table_id}` t WHERE t.col_1 > 0 GROUP BY col_0",
+        "unknown_column": f"SELECT col_0, SUM(col_1x) AS total FROM `{table_id}` GROUP BY col_0",
+    }
+    for case, sql_query in sql_queries.items():
+        runs, problem = _measure(
+            lambda i: sql_validation.validate_query(sql_query, catalog), args.repeat
+        )
+        results[f"validate_query[{case}]"] = _summarize(runs, rejected=problem is not None)
+
+    runs, _ = _measure(lambda i: context_refresh.refresh_context(context), args.repeat)
+    results["refresh_context[no_change]"] = _summarize(runs)
+    runs, refreshed = _measure(
+        lambda i: context_refresh.refresh_context(context),
+        args.repeat,
+        lambda: dataset.modify_table(dataset.table_ids[0]),
+    )
+    results["refresh_context[one_table]"] = _summarize(
+        runs, changed=refreshed is not None
+    )
+
+
+def bench_queries(args, results: dict, dataset) -> None:
+    from data_agent import custom_tools, job_scheduler, result_download, result_store
+
+    table_id = dataset.full_table_id(dataset.table_ids[0])
+    # A different query on every call, so none is served from the result cache.
+    query_ids = itertools.count()
+
+    def run_query(num_rows: int) -> str:
+        return custom_tools.execute_bigquery_query(
+            f"SELECT * FROM `{table_id}` WHERE col_1 >= -{next(query_ids)} LIMIT {num_rows}",
+            SimpleNamespace(state={}),
+        )
+
+    for mode in args.download_modes:
+        result_download.BQ_RESULT_DOWNLOAD_MODE = mode
+        for num_rows in args.result_sizes:
+            # Warm up, so the fake's one-off generation of the rows is not timed.
+            run_query(num_rows)
+            runs, payload = _measure(lambda i: run_query(num_rows), args.repeat)
+            results[f"execute_bigquery_query[{mode},{num_rows}]"] = _summarize(
+                runs, payload_bytes=len(payload)
+            )
+
+    result_download.BQ_RESULT_DOWNLOAD_MODE = "auto"
+    sql_query = f"SELECT * FROM `{table_id}` LIMIT {args.result_sizes[0]}"
+    custom_tools.execute_bigquery_query(sql_query, SimpleNamespace(state={}))
+    runs, payload = _measure(
+        lambda i: custom_tools.execute_bigquery_query(sql_query, SimpleNamespace(state={})),
+        args.repeat,
+    )
+    results["execute_bigquery_query[cache_hit]"] = _summarize(
+        runs, payload_bytes=len(payload)
+    )
+
+    # A batch of uncached queries should take about as long as one of them.
+    def run_batch(num_queries: int) -> str:
+        return custom_tools.execute_bigquery_queries(
+            [
+                f"SELECT * FROM `{table_id}` WHERE col_1 >= -{next(query_ids)} LIMIT {args.result_sizes[0]}"
+                for _ in range(num_queries)
+            ],
+            SimpleNamespace(state={}),
+        )
+
+    num_queries = custom_tools.BQ_BATCH_MAX_QUERIES
+    runs, payload = _measure(lambda i: run_batch(num_queries), args.repeat)
+    results[f"execute_bigquery_queries[{num_queries}]"] = _summarize(
+        runs, payload_bytes=len(payload)
+    )
+
+    # The job scheduler's overhead on every query job, when nothing waits.
+    num_jobs = 1000
+
+    def admit_jobs() -> None:
+        for _ in range(num_jobs):
+            job_scheduler.acquire_job_slot("service_account", time.time())
+            job_scheduler.release_job_slot("service_account")
+
+    runs, _ = _measure(lambda i: admit_jobs(), args.repeat)
+    results[f"job_scheduler[uncontended,{num_jobs}]"] = _summarize(runs)
+
+    # Keeping the full result for a session, then a follow-up answered from it.
+    session_context = SimpleNamespace(
+        state={},
+        _invocation_context=SimpleNamespace(
+            session=SimpleNamespace(app_name="benchmark", user_id="user", id="session")
+        ),
+    )
+    num_rows = min(max(args.result_sizes), result_store.RESULT_STORE_MAX_ROWS)
+    runs, payload = _measure(
+        lambda i: custom_tools.execute_bigquery_query(
+            f"SELECT * FROM `{table_id}` WHERE col_1 >= -{next(query_ids)} LIMIT {num_rows}",
+            session_context,
+        ),
+        args.repeat,
+    )
+    results[f"execute_bigquery_query[keep_result,{num_rows}]"] = _summarize(
+        runs, payload_bytes=len(payload)
+    )
+    result_handle = json.loads(payload)["result_handle"]
+    runs, payload = _measure(
+        lambda i: custom_tools.analyze_query_result(
+            result_handle,
+            session_context,
+            filters=["col_1 >= 0"],
+            group_by=["col_0"],
+            aggregations=["sum(col_1)", "count(*)"],
+            order_by=["sum_col_1 desc"],
+            limit=10,
+        ),
+        args.repeat,
+    )
+    results[f"analyze_query_result[{num_rows}]"] = _summarize(
+        runs, payload_bytes=len(payload)
+    )
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=AGENTS_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict, threshold: float, min_delta: float) -> list[str]:
+    """
+    Prints the median of each benchmark next to the baseline's.
+    Returns:
+        The names of the benchmarks slower than the baseline by more than
+        `threshold` (relative) and `min_delta` seconds.
+    """
+    if current["config"] != baseline.get("config"):
+        print("Warning: the benchmark configuration differs from the baseline's.")
+    regressions = []
+    print(f"\n{'benchmark':<48} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, result in current["benchmarks"].items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if base is None:
+            print(f"{name:<48} {'-':>10} {result['median']:>10.4f} {'new':>7}")
+            continue
+        ratio = result["median"] / base["median"] if base["median"] else float("inf")
+        regressed = (
+            ratio > 1 + threshold and result["median"] - base["median"] > min_delta
+        )
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{name:<48} {base['median']:>10.4f} {result['median']:>10.4f} {ratio:>6.2f}x"
+            + ("  REGRESSION" if regressed else "")
+        )
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the data agent against in-process BigQuery and Dataplex fakes."
+    )
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--compare", help="Compare the results with this baseline JSON file.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Relative slowdown of the median reported as a regression (default 0.2).",
+    )
+    parser.add_argument(
+        "--min-delta",
+        type=float,
+        default=0.005,
+        help="Slowdowns of fewer seconds are never regressions (default 0.005).",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark.")
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=["import", "instructions", "queries"],
+        default=["import", "instructions", "queries"],
+        help="Benchmark groups to run.",
+    )
+    parser.add_argument(
+        "--result-sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=[10, 1000, 10000, 100000, 1000000],
+        help="Comma-separated row counts of the query results.",
+    )
+    parser.add_argument(
+        "--download-modes",
+        type=lambda value: value.split(","),
+        default=["auto"],
+        help="Comma-separated BQ_RESULT_DOWNLOAD_MODE values to run the queries with.",
+    )
+    parser.add_argument("--tables", type=int, default=50)
+    parser.add_argument("--columns", type=int, default=12)
+    parser.add_argument("--rows-per-table", type=int, default=1000)
+    parser.add_argument("--few-shot-examples", type=int, default=200)
+    parser.add_argument(
+        "--latency-ms", type=float, default=20, help="Latency of every fake API call."
+    )
+    parser.add_argument(
+        "--query-ms", type=float, default=50, help="Run time of every fake query job."
+    )
+    parser.add_argument(
+        "--no-profiles",
+        action="store_true",
+        help="Run without a data profiles table, so sample data is fetched instead.",
+    )
+    parser.add_argument(
+        "--instruction-mode", choices=["static", "retrieval"], default="static"
+    )
+    parser.add_argument("--project-id", default="bench-project")
+    parser.add_argument("--dataset-name", default="bench_dataset")
+    parser.add_argument("--verbose", action="store_true", help="Show the agent's logs.")
+    parser.add_argument("--import-child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    sys.path.insert(0, AGENTS_DIR)
+    # The agent's modules only configure logging if nothing else did first.
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    if args.import_child:
+        _import_child(args)
+        return 0
+
+    config = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in ("output", "compare", "threshold", "min_delta", "only", "verbose", "import_child")
+    }
+    results: dict = {}
+    started = time.time()
+    if "import" in args.only:
+        bench_import(args, results)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        os.environ.update(_benchmark_env(args, cache_dir))
+        dataset = _install_fakes(args)
+        if "instructions" in args.only:
+            bench_instructions(args, results, cache_dir, dataset)
+        if "queries" in args.only:
+            bench_queries(args, results, dataset)
+        api_calls = dict(sorted(dataset.calls.items()))
+
+    output = {
+        "version": RESULTS_VERSION,
+        "revision": _git_revision(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(started)),
+        "duration_seconds": time.time() - started,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "api_calls": api_calls,
+        "benchmarks": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+            f.write("\n")
+
+    print(f"\n{'benchmark':<48} {'median':>10} {'min':>10} {'max':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<48} {result['median']:>10.4f} {result['min']:>10.4f} {result['max']:>10.4f}"
+        )
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(output, baseline, args.threshold, args.min_delta)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Summarizes the spans written by the "file" telemetry exporter
+(TELEMETRY_EXPORTERS=file): the count and p50/p95/p99/max latency of each
+operation and outcome, and the rows and BigQuery bytes processed.
+
+    python benchmarks/telemetry_report.py data_agent_telemetry.jsonl
+"""
+
+import argparse
+import datetime
+import json
+import sys
+from collections import defaultdict
+
+
+def _percentile(values: list[float], p: float) -> float:
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def _seconds(timestamp: str) -> float:
+    return datetime.datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp()
+
+
+def read_spans(path: str) -> list[dict]:
+    """
+    Returns the spans of a telemetry file; metric lines are skipped.
+    """
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "start_time" in record and "end_time" in record:
+                spans.append(record)
+    return spans
+
+
+def summarize(spans: list[dict]) -> dict:
+    """
+    Groups spans of the data_agent operations by operation and outcome.
+    """
+    groups = defaultdict(lambda: {"durations": [], "rows": 0, "bytes_processed": 0})
+    for span in spans:
+        attributes = span.get("attributes") or {}
+        if "data_agent.operation" not in attributes:
+            continue
+        group = groups[
+            (attributes["data_agent.operation"], attributes.get("data_agent.outcome", ""))
+        ]
+        group["durations"].append(_seconds(span["end_time"]) - _seconds(span["start_time"]))
+        group["rows"] += attributes.get("data_agent.rows", 0)
+        group["bytes_processed"] += attributes.get("bigquery.bytes_processed", 0)
+
+    summary = {}
+    for (operation, outcome), group in sorted(groups.items()):
+        durations = sorted(group["durations"])
+        summary[f"{operation}[{outcome}]"] = {
+            "count": len(durations),
+            "p50": _percentile(durations, 0.5),
+            "p95": _percentile(durations, 0.95),
+            "p99": _percentile(durations, 0.99),
+            "max": durations[-1],
+            "rows": group["rows"],
+            "bytes_processed": group["bytes_processed"],
+        }
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Summarize the spans of a data agent telemetry file."
+    )
+    parser.add_argument("path", help="The file written by the 'file' telemetry exporter.")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+    args = parser.parse_args(argv)
+
+    summary = summarize(read_spans(args.path))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return 0
+    print(
+        f"{'operation[outcome]':<52} {'count':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'rows':>10} {'bytes':>14}"
+    )
+    for name, stats in summary.items():
+        print(
+            f"{name:<52} {stats['count']:>6} {stats['p50']:>8.3f} {stats['p95']:>8.3f} "
+            f"{stats['p99']:>8.3f} {stats['max']:>8.3f} {stats['rows']:>10} {stats['bytes_processed']:>14}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
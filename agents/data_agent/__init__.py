@@ -12,4 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from . import agent
\ No newline at end of file
+import importlib
+
+
+def __getattr__(name):
+    # The agent module is imported on first access, so importing the package
+    # stays fast for tools that do not need the agent.
+    if name == "agent":
+        return importlib.import_module(".agent", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
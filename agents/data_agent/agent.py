@@ -13,19 +13,73 @@
 # limitations under the License.
 
 from google.adk.agents import Agent
-from .constants import MODEL, DISPLAY_NAME, AGENT_DESCRIPTION
-from .custom_tools import execute_bigquery_query
-from .instructions import return_instructions_bigquery
+from google.adk.agents.readonly_context import ReadonlyContext
+from .constants import (
+    MODEL,
+    DISPLAY_NAME,
+    AGENT_DESCRIPTION,
+    AGENT_WARMUP_ENABLED,
+    BQ_ASYNC_TOOL_ENABLED,
+)
+from .custom_tools import (
+    analyze_query_result,
+    execute_bigquery_queries,
+    execute_bigquery_queries_async,
+    execute_bigquery_query,
+    execute_bigquery_query_async,
+)
+from .datasets import DatasetConfig, load_dataset_configs
+from .instructions import build_routing_instruction
+from .lazy_instruction import LazyInstruction
 from dotenv import load_dotenv
 
 
 # Load environment variables from a .env file for local development
 load_dotenv(".env")
 
-root_agent = Agent(
-    model=MODEL,
-    name=DISPLAY_NAME,
-    description=AGENT_DESCRIPTION,
-    instruction=return_instructions_bigquery(),
-    tools=[execute_bigquery_query]
-)
+
+def build_data_agent(dataset: DatasetConfig) -> Agent:
+    """
+    Creates the agent answering questions about one dataset. Its instruction
+    context is loaded on its first turn (or by the warm-up thread), not when
+    the agent is created.
+    """
+    dataset_instruction = LazyInstruction(dataset)
+    if AGENT_WARMUP_ENABLED:
+        dataset_instruction.start_warmup()
+    return Agent(
+        model=MODEL,
+        name=dataset.name,
+        description=dataset.description,
+        instruction=dataset_instruction,
+        before_agent_callback=dataset_instruction.before_agent_callback,
+        tools=[
+            execute_bigquery_query_async if BQ_ASYNC_TOOL_ENABLED else execute_bigquery_query,
+            execute_bigquery_queries_async if BQ_ASYNC_TOOL_ENABLED else execute_bigquery_queries,
+            analyze_query_result,
+        ]
+    )
+
+
+datasets = load_dataset_configs()
+dataset_agents = [build_data_agent(dataset) for dataset in datasets]
+
+if len(dataset_agents) == 1:
+    root_agent = dataset_agents[0]
+else:
+    # Several datasets are served from this process: the root agent transfers
+    # each question to the agent of the dataset it is about. The agents share
+    # the BigQuery and Dataplex clients and the query, dry-run and sample caches.
+    routing_instruction = build_routing_instruction(datasets)
+
+    def _routing_instruction(readonly_context: ReadonlyContext) -> str:
+        # A provider, so the descriptions are not formatted with session state.
+        return routing_instruction
+
+    root_agent = Agent(
+        model=MODEL,
+        name=DISPLAY_NAME,
+        description=AGENT_DESCRIPTION,
+        instruction=_routing_instruction,
+        sub_agents=dataset_agents,
+    )
@@ -0,0 +1,244 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+import google.auth
+import requests
+from google.auth.transport.requests import AuthorizedSession
+from google.oauth2.credentials import Credentials
+from requests.adapters import HTTPAdapter
+
+from .constants import (
+    BQ_HTTP_POOL_SIZE,
+    BQ_USER_CLIENT_CACHE_SIZE,
+    BQ_USER_CLIENT_TTL_SECONDS,
+    DISPLAY_NAME,
+    PROJECT_ID,
+)
+
+# The client libraries are imported on first use, so importing the agent stays fast.
+if TYPE_CHECKING:
+    from google.cloud import bigquery, dataplex_v1
+
+# --- Logging Configuration ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_http_adapter: HTTPAdapter | None = None
+_service_account_client: "bigquery.Client | None" = None
+_dataplex_client: "dataplex_v1.CatalogServiceClient | None" = None
+_service_account_storage_client = None
+# sha256(access token) -> (client, created_at), least recently used first.
+_user_clients: "OrderedDict[str, tuple[bigquery.Client, float]]" = OrderedDict()
+_user_storage_clients: OrderedDict[str, tuple[object, float]] = OrderedDict()
+# sha256(access token) -> (principal, resolved_at), least recently used first.
+# Resolving a principal makes a network call, so it has a lock of its own.
+_principals: OrderedDict[str, tuple[str, float]] = OrderedDict()
+_principals_lock = threading.Lock()
+_TOKENINFO_URL = "https://oauth2.googleapis.com/tokeninfo"
+_TOKENINFO_TIMEOUT_SECONDS = 5
+
+
+def _shared_http_adapter() -> HTTPAdapter:
+    """
+    Returns the HTTP adapter whose connection pool is shared by every BigQuery
+    client, so service account and per-user clients reuse the same TLS
+    connections. Must be called with _lock held.
+    """
+    global _http_adapter
+    if _http_adapter is None:
+        _http_adapter = HTTPAdapter(
+            pool_connections=BQ_HTTP_POOL_SIZE, pool_maxsize=BQ_HTTP_POOL_SIZE
+        )
+    return _http_adapter
+
+
+def _create_bigquery_client(credentials) -> "bigquery.Client":
+    from google.cloud import bigquery
+
+    session = AuthorizedSession(credentials)
+    session.mount("https://", _shared_http_adapter())
+    return bigquery.Client(project=PROJECT_ID, credentials=credentials, _http=session)
+
+
+def token_fingerprint(access_token: str) -> str:
+    """
+    Returns a stable, non-reversible identifier for an OAuth access token.
+    """
+    return hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+
+
+def _token_user(access_token: str) -> str | None:
+    """
+    Returns the email, or else the account ID, of the user an OAuth access
+    token was issued to, from Google's tokeninfo endpoint, or None if it
+    cannot be looked up.
+    """
+    try:
+        response = requests.get(
+            _TOKENINFO_URL,
+            params={"access_token": access_token},
+            timeout=_TOKENINFO_TIMEOUT_SECONDS,
+        )
+        response.raise_for_status()
+        token_info = response.json()
+    except Exception as e:
+        logger.warning(
+            f"[{DISPLAY_NAME}] Could not look up the user of an OAuth access token. Using the token as its principal. Error: {e}"
+        )
+        return None
+    return token_info.get("email") or token_info.get("sub")
+
+
+def principal_for_token(access_token: str | None) -> str:
+    """
+    Returns the identity BigQuery calls are made as: the service account, or
+    the user behind an OAuth access token.
+
+    The user is looked up once per token, and cached like the user clients,
+    so that every token of one user (e.g. after a refresh) is the same
+    principal. A token whose user cannot be looked up is a principal of its
+    own. Principals are hashed, so they can be logged.
+    """
+    if access_token is None:
+        return "service_account"
+    key = token_fingerprint(access_token)
+    now = time.time()
+    with _principals_lock:
+        cached = _principals.get(key)
+        if cached is not None and now - cached[1] <= BQ_USER_CLIENT_TTL_SECONDS:
+            _principals.move_to_end(key)
+            return cached[0]
+
+    user = _token_user(access_token)
+    principal_key = hashlib.sha256(user.encode("utf-8")).hexdigest() if user else key
+    principal = f"user:{principal_key[:32]}"
+    with _principals_lock:
+        _principals[key] = (principal, now)
+        _principals.move_to_end(key)
+        while len(_principals) > BQ_USER_CLIENT_CACHE_SIZE:
+            _principals.popitem(last=False)
+    return principal
+
+
+def get_bigquery_client(access_token: str | None = None) -> "bigquery.Client":
+    """
+    Returns a pooled BigQuery client.
+
+    Without an access token this is the long-lived client using the agent's
+    service account credentials. With an OAuth access token, it is a client
+    acting as that user, taken from an LRU of per-user clients. Entries expire
+    after BQ_USER_CLIENT_TTL_SECONDS, which matches the lifetime of the token.
+    Args:
+        access_token: The user's OAuth access token, if any.
+    Returns:
+        A BigQuery client for PROJECT_ID.
+    """
+    global _service_account_client
+    from google.cloud import bigquery
+
+    with _lock:
+        if access_token is None:
+            if _service_account_client is None:
+                credentials, _ = google.auth.default(scopes=bigquery.Client.SCOPE)
+                _service_account_client = _create_bigquery_client(credentials)
+                logger.info(
+                    f"[{DISPLAY_NAME}] Created pooled BigQuery client with service account credentials."
+                )
+            return _service_account_client
+
+        return _get_user_client(
+            _user_clients,
+            access_token,
+            lambda: _create_bigquery_client(Credentials(token=access_token)),
+        )
+
+
+def _get_user_client(cache: OrderedDict, access_token: str, create_client):
+    """
+    Returns the client cached for `access_token` in `cache`, creating it with
+    `create_client` if needed. Must be called with _lock held.
+    """
+    now = time.time()
+    for key in [
+        key
+        for key, (_, created_at) in cache.items()
+        if now - created_at > BQ_USER_CLIENT_TTL_SECONDS
+    ]:
+        # Do not close evicted clients: closing would also close the shared adapter.
+        del cache[key]
+
+    key = token_fingerprint(access_token)
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key][0]
+
+    client = create_client()
+    cache[key] = (client, now)
+    while len(cache) > BQ_USER_CLIENT_CACHE_SIZE:
+        cache.popitem(last=False)
+    logger.info(
+        f"[{DISPLAY_NAME}] Created pooled {type(client).__name__} with user credentials ({len(cache)} user clients cached)."
+    )
+    return client
+
+
+def get_bigquery_storage_client(access_token: str | None = None):
+    """
+    Returns a pooled BigQuery Storage Read API client for the service account,
+    or for the user behind `access_token`, or None if the
+    google-cloud-bigquery-storage package is not installed.
+    """
+    global _service_account_storage_client
+    try:
+        from google.cloud import bigquery_storage
+    except ImportError:
+        return None
+
+    with _lock:
+        if access_token is None:
+            if _service_account_storage_client is None:
+                _service_account_storage_client = bigquery_storage.BigQueryReadClient()
+            return _service_account_storage_client
+        return _get_user_client(
+            _user_storage_clients,
+            access_token,
+            lambda: bigquery_storage.BigQueryReadClient(
+                credentials=Credentials(token=access_token)
+            ),
+        )
+
+
+def get_dataplex_client() -> "dataplex_v1.CatalogServiceClient":
+    """
+    Returns the long-lived Dataplex Catalog client.
+    """
+    global _dataplex_client
+    from google.cloud import dataplex_v1
+
+    with _lock:
+        if _dataplex_client is None:
+            _dataplex_client = dataplex_v1.CatalogServiceClient()
+        return _dataplex_client
@@ -34,3 +34,212 @@ AGENT_DESCRIPTION = os.getenv(
 )
 FEW_SHOT_EXAMPLES_TABLE_FULL_ID = os.getenv("FEW_SHOT_EXAMPLES_TABLE_FULL_ID")
 AUTH_ID = os.getenv("AUTH_ID")
+# Optional registry of datasets served by one process, each by its own agent:
+# inline JSON, or the path of a YAML or JSON file, holding a list of configs
+# (see datasets.py). Without it, the agent serves DATASET_NAME.
+DATASET_CONFIGS = os.getenv("DATASET_CONFIGS", "")
+
+# On-disk snapshot cache of the fetched instruction context
+CONTEXT_CACHE_ENABLED = os.getenv("CONTEXT_CACHE_ENABLED", "true").lower() == "true"
+CONTEXT_CACHE_DIR = os.getenv(
+    "CONTEXT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "data_agent")
+)
+# Snapshots older than this are discarded and the context is fetched again
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "86400"))
+# Snapshots younger than this are trusted without checking freshness signals
+CONTEXT_CACHE_VALIDATE_AFTER_SECONDS = int(
+    os.getenv("CONTEXT_CACHE_VALIDATE_AFTER_SECONDS", "900")
+)
+
+# Concurrency and per-source deadline for fetching the instruction context
+CONTEXT_FETCH_MAX_WORKERS = int(os.getenv("CONTEXT_FETCH_MAX_WORKERS", "5"))
+CONTEXT_FETCH_TIMEOUT_SECONDS = float(os.getenv("CONTEXT_FETCH_TIMEOUT_SECONDS", "120"))
+# How often a running agent checks the context's change signals and re-fetches
+# the tables that changed (0 to never refresh)
+CONTEXT_REFRESH_INTERVAL_SECONDS = float(
+    os.getenv("CONTEXT_REFRESH_INTERVAL_SECONDS", "900")
+)
+
+# Pooled BigQuery clients
+# Connections kept open to BigQuery, shared by all clients; size it for concurrent sessions
+BQ_HTTP_POOL_SIZE = int(os.getenv("BQ_HTTP_POOL_SIZE", "32"))
+# Maximum number of per-user (OAuth) clients kept, and how long each is reused
+BQ_USER_CLIENT_CACHE_SIZE = int(os.getenv("BQ_USER_CLIENT_CACHE_SIZE", "256"))
+BQ_USER_CLIENT_TTL_SECONDS = int(os.getenv("BQ_USER_CLIENT_TTL_SECONDS", "3300"))
+
+# In-process cache of query results, keyed by normalized SQL and principal
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "256"))
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+QUERY_CACHE_MAX_ENTRY_BYTES = int(
+    os.getenv("QUERY_CACHE_MAX_ENTRY_BYTES", str(8 * 1024 * 1024))
+)
+QUERY_CACHE_TTL_SECONDS = int(os.getenv("QUERY_CACHE_TTL_SECONDS", "3600"))
+# Time allowed to check that the tables of a cached result did not change; a
+# cached result that cannot be checked in time is treated as a miss
+QUERY_CACHE_VALIDATION_TIMEOUT_SECONDS = float(
+    os.getenv("QUERY_CACHE_VALIDATION_TIMEOUT_SECONDS", "5")
+)
+# Optional directory that entries evicted from memory are spilled to
+QUERY_CACHE_SPILL_DIR = os.getenv("QUERY_CACHE_SPILL_DIR")
+QUERY_CACHE_SPILL_MAX_BYTES = int(
+    os.getenv("QUERY_CACHE_SPILL_MAX_BYTES", str(512 * 1024 * 1024))
+)
+
+# Result download: "auto" uses the BigQuery Storage Read API and Arrow for
+# results of at least BQ_ARROW_MIN_ROWS rows, "rest" and "arrow" force a path
+BQ_RESULT_DOWNLOAD_MODE = os.getenv("BQ_RESULT_DOWNLOAD_MODE", "auto").lower()
+BQ_ARROW_MIN_ROWS = int(os.getenv("BQ_ARROW_MIN_ROWS", "5000"))
+
+# Hard caps on the rows and bytes of query results returned to the model
+RESULT_MAX_ROWS = int(os.getenv("RESULT_MAX_ROWS", "500"))
+RESULT_MAX_BYTES = int(os.getenv("RESULT_MAX_BYTES", "200000"))
+# Maximum number of rows read to compute the column summaries of a truncated
+# result; every row read past the caps is downloaded only for the summaries
+RESULT_SUMMARY_MAX_ROWS = int(os.getenv("RESULT_SUMMARY_MAX_ROWS", "10000"))
+
+# Result store: the full results of queries of up to RESULT_STORE_MAX_ROWS rows
+# are kept in memory as pandas frames, so follow-up questions can be answered
+# from them locally; least recently used results are evicted beyond
+# RESULT_STORE_MAX_BYTES in total or RESULT_STORE_SESSION_MAX_BYTES per session
+RESULT_STORE_ENABLED = os.getenv("RESULT_STORE_ENABLED", "true").lower() == "true"
+RESULT_STORE_MAX_ROWS = int(os.getenv("RESULT_STORE_MAX_ROWS", "200000"))
+RESULT_STORE_MAX_BYTES = int(
+    os.getenv("RESULT_STORE_MAX_BYTES", str(512 * 1024 * 1024))
+)
+RESULT_STORE_SESSION_MAX_BYTES = int(
+    os.getenv("RESULT_STORE_SESSION_MAX_BYTES", str(64 * 1024 * 1024))
+)
+
+# Cost guard: the maximum bytes a query may bill (0 for no limit), an optional
+# dry run before each query, and whether queries on partitioned tables must
+# filter on the partition column
+BQ_MAX_BYTES_BILLED = int(os.getenv("BQ_MAX_BYTES_BILLED", "0"))
+BQ_DRY_RUN_ENABLED = os.getenv("BQ_DRY_RUN_ENABLED", "false").lower() == "true"
+BQ_REQUIRE_PARTITION_FILTER = (
+    os.getenv("BQ_REQUIRE_PARTITION_FILTER", "false").lower() == "true"
+)
+BQ_DRY_RUN_CACHE_TTL_SECONDS = int(os.getenv("BQ_DRY_RUN_CACHE_TTL_SECONDS", "600"))
+# Offline validation: queries reading tables or columns missing from the schema
+# in the instruction context are rejected before any BigQuery call
+SQL_VALIDATION_ENABLED = os.getenv("SQL_VALIDATION_ENABLED", "true").lower() == "true"
+
+# Deadline of a query tool call; the BigQuery job is cancelled once it passes
+BQ_QUERY_TIMEOUT_SECONDS = float(os.getenv("BQ_QUERY_TIMEOUT_SECONDS", "300"))
+# Job polling interval bounds of the asynchronous query tool
+BQ_MIN_POLL_INTERVAL_SECONDS = float(os.getenv("BQ_MIN_POLL_INTERVAL_SECONDS", "0.25"))
+BQ_MAX_POLL_INTERVAL_SECONDS = float(os.getenv("BQ_MAX_POLL_INTERVAL_SECONDS", "2"))
+# Register the asynchronous query tool with the agent instead of the blocking one
+BQ_ASYNC_TOOL_ENABLED = os.getenv("BQ_ASYNC_TOOL_ENABLED", "true").lower() == "true"
+# The most queries the batch query tool runs concurrently in one call
+BQ_BATCH_MAX_QUERIES = int(os.getenv("BQ_BATCH_MAX_QUERIES", "5"))
+
+# Retry policy of BigQuery calls and query jobs: transient errors are retried
+# with exponential backoff and jitter, from BQ_RETRY_INITIAL_SECONDS up to
+# BQ_RETRY_MAX_SECONDS between attempts, for at most BQ_RETRY_DEADLINE_SECONDS
+# in total (the query tool stops retrying at its own deadline)
+BQ_RETRY_INITIAL_SECONDS = float(os.getenv("BQ_RETRY_INITIAL_SECONDS", "0.5"))
+BQ_RETRY_MAX_SECONDS = float(os.getenv("BQ_RETRY_MAX_SECONDS", "8"))
+BQ_RETRY_DEADLINE_SECONDS = float(os.getenv("BQ_RETRY_DEADLINE_SECONDS", "60"))
+# Hedging of read-only queries: a duplicate job is submitted when the first is
+# still queued after the BQ_HEDGE_PERCENTILE of the last BQ_HEDGE_WINDOW jobs'
+# queueing times (at least BQ_HEDGE_MIN_DELAY_SECONDS); the slower job is cancelled
+BQ_HEDGE_ENABLED = os.getenv("BQ_HEDGE_ENABLED", "false").lower() == "true"
+BQ_HEDGE_PERCENTILE = float(os.getenv("BQ_HEDGE_PERCENTILE", "95"))
+BQ_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("BQ_HEDGE_MIN_DELAY_SECONDS", "2"))
+BQ_HEDGE_WINDOW = int(os.getenv("BQ_HEDGE_WINDOW", "200"))
+# Admission control of query jobs: at most BQ_MAX_CONCURRENT_JOBS jobs run at
+# once, and at most BQ_MAX_CONCURRENT_JOBS_PER_PRINCIPAL per principal (the
+# service account or an OAuth user), 0 for no limit. Other queries wait, served
+# round-robin across principals, for at most BQ_ADMISSION_MAX_WAIT_SECONDS; once
+# BQ_ADMISSION_MAX_QUEUED queries wait, new ones are rejected right away. Without
+# OAuth every query runs as the service account, so there is no per-principal
+# limit by default
+BQ_MAX_CONCURRENT_JOBS = int(os.getenv("BQ_MAX_CONCURRENT_JOBS", "50"))
+BQ_MAX_CONCURRENT_JOBS_PER_PRINCIPAL = int(
+    os.getenv("BQ_MAX_CONCURRENT_JOBS_PER_PRINCIPAL", "0")
+)
+BQ_ADMISSION_MAX_QUEUED = int(os.getenv("BQ_ADMISSION_MAX_QUEUED", "100"))
+BQ_ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("BQ_ADMISSION_MAX_WAIT_SECONDS", "30"))
+
+# Query history: an append-only SQLite store of the query jobs run by the tool,
+# summarized per query shape over its last QUERY_HISTORY_WINDOW runs. Runs older
+# than QUERY_HISTORY_RETENTION_DAYS are pruned when the store is opened.
+QUERY_HISTORY_ENABLED = os.getenv("QUERY_HISTORY_ENABLED", "true").lower() == "true"
+QUERY_HISTORY_PATH = os.getenv(
+    "QUERY_HISTORY_PATH", os.path.join(CONTEXT_CACHE_DIR, "query_history.sqlite")
+)
+QUERY_HISTORY_WINDOW = int(os.getenv("QUERY_HISTORY_WINDOW", "50"))
+QUERY_HISTORY_RETENTION_DAYS = float(os.getenv("QUERY_HISTORY_RETENTION_DAYS", "30"))
+# Results of queries whose shape took at least this long (median) carry a hint
+# to the model (0 for no hints)
+QUERY_HISTORY_SLOW_SECONDS = float(os.getenv("QUERY_HISTORY_SLOW_SECONDS", "30"))
+
+# Sample data: "parallel" samples tables with list_rows on a worker pool,
+# "batched" uses one (billed) UNION ALL query per dataset
+SAMPLE_DATA_MODE = os.getenv("SAMPLE_DATA_MODE", "parallel").lower()
+SAMPLE_DATA_MAX_WORKERS = int(os.getenv("SAMPLE_DATA_MAX_WORKERS", "8"))
+
+# Concurrency of Dataplex entry fetches, and the total time spent retrying
+# transient errors of each call
+DATAPLEX_FETCH_MAX_WORKERS = int(os.getenv("DATAPLEX_FETCH_MAX_WORKERS", "8"))
+DATAPLEX_RETRY_DEADLINE_SECONDS = float(
+    os.getenv("DATAPLEX_RETRY_DEADLINE_SECONDS", "30")
+)
+
+# Data profiles: columns with a higher percentage of nulls are left out of the
+# prompt, and at most DATA_PROFILE_TOP_N top values are kept per column
+DATA_PROFILE_MAX_PERCENT_NULL = float(os.getenv("DATA_PROFILE_MAX_PERCENT_NULL", "90"))
+DATA_PROFILE_TOP_N = int(os.getenv("DATA_PROFILE_TOP_N", "10"))
+
+# Prompt size: the estimated token budget of the context rendered into the
+# instruction (0 for no limit), and the characters per token used to estimate it
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "60000"))
+PROMPT_CHARS_PER_TOKEN = float(os.getenv("PROMPT_CHARS_PER_TOKEN", "4"))
+# Dataplex aspect fields kept in the prompt, at any depth (case, "_" and "-" are ignored)
+PROMPT_ASPECT_FIELDS = [
+    field.strip()
+    for field in os.getenv(
+        "PROMPT_ASPECT_FIELDS",
+        "description,tableType,type,fields,name,dataType,mode,partitioning,clustering,"
+        "joins,relationships,relatedTable,relatedTableId,joinKeys,localColumn,"
+        "relatedColumn,joinType,cardinality,rowCount,queryCount,lastAccessTime",
+    ).split(",")
+    if field.strip()
+]
+
+# Instruction mode: "static" renders the whole dataset into one instruction,
+# "retrieval" describes only the tables relevant to each user turn
+INSTRUCTION_MODE = os.getenv("INSTRUCTION_MODE", "static").lower()
+# Retrieval mode: how many tables are matched per turn, how many of their join
+# partners are added, and the most tables described
+SCHEMA_RETRIEVAL_TOP_K = int(os.getenv("SCHEMA_RETRIEVAL_TOP_K", "5"))
+SCHEMA_RETRIEVAL_MAX_JOIN_PARTNERS = int(
+    os.getenv("SCHEMA_RETRIEVAL_MAX_JOIN_PARTNERS", "5")
+)
+SCHEMA_RETRIEVAL_MAX_TABLES = int(os.getenv("SCHEMA_RETRIEVAL_MAX_TABLES", "15"))
+# Optional embedding model (e.g. "text-embedding-005") combined with BM25
+SCHEMA_RETRIEVAL_EMBEDDING_MODEL = os.getenv("SCHEMA_RETRIEVAL_EMBEDDING_MODEL", "")
+
+# Few-shot examples: how many of the examples most similar to the question are
+# sent, and their estimated token cap (0 for no limit)
+FEW_SHOT_TOP_K = int(os.getenv("FEW_SHOT_TOP_K", "5"))
+FEW_SHOT_MAX_TOKENS = int(os.getenv("FEW_SHOT_MAX_TOKENS", "4000"))
+
+# Telemetry: optional local exporters of the agent's spans and metrics,
+# comma-separated: "file" (JSON lines at TELEMETRY_FILE_PATH) and "prometheus"
+# (scrape endpoint on TELEMETRY_PROMETHEUS_PORT, needs opentelemetry-exporter-prometheus)
+TELEMETRY_EXPORTERS = [
+    exporter.strip().lower()
+    for exporter in os.getenv("TELEMETRY_EXPORTERS", "").split(",")
+    if exporter.strip()
+]
+TELEMETRY_FILE_PATH = os.getenv("TELEMETRY_FILE_PATH", "data_agent_telemetry.jsonl")
+TELEMETRY_PROMETHEUS_PORT = int(os.getenv("TELEMETRY_PROMETHEUS_PORT", "9464"))
+TELEMETRY_EXPORT_INTERVAL_SECONDS = float(
+    os.getenv("TELEMETRY_EXPORT_INTERVAL_SECONDS", "60")
+)
+
+# Build the instruction in a background thread as soon as the agent is loaded,
+# instead of on the first user turn
+AGENT_WARMUP_ENABLED = os.getenv("AGENT_WARMUP_ENABLED", "false").lower() == "true"
@@ -0,0 +1,213 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import time
+
+from .constants import (
+    CONTEXT_CACHE_DIR,
+    CONTEXT_CACHE_ENABLED,
+    CONTEXT_CACHE_TTL_SECONDS,
+    CONTEXT_CACHE_VALIDATE_AFTER_SECONDS,
+    DISPLAY_NAME,
+)
+from .datasets import current_dataset
+from .utils import fetch_context_freshness
+
+# --- Logging Configuration ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# Bump whenever the shape of the cached context changes, so that snapshots
+# written by an older version of the agent are ignored.
+SNAPSHOT_VERSION = 3
+
+
+def context_cache_key() -> str:
+    """
+    Returns the cache key of the context snapshot for the scope of the
+    current dataset.
+    """
+    config = current_dataset()
+    key_parts = [
+        SNAPSHOT_VERSION,
+        config.project_id,
+        config.dataset_name,
+        config.table_names,
+        config.data_profiles_table_full_id,
+        config.few_shot_examples_table_full_id,
+    ]
+    return hashlib.sha256(json.dumps(key_parts).encode("utf-8")).hexdigest()
+
+
+def failed_sources(context: dict) -> list[str]:
+    """
+    Returns the sources of the context whose fetch failed or missed its
+    deadline, as recorded in its fetch timings.
+    """
+    return [
+        source
+        for source, timing in (context.get("fetch_timings") or {}).items()
+        if timing is None
+    ]
+
+
+def _snapshot_path(cache_key: str) -> str:
+    return os.path.join(CONTEXT_CACHE_DIR, f"context-{cache_key[:16]}.pkl")
+
+
+def _write_snapshot(path: str, snapshot: dict) -> None:
+    """
+    Writes the snapshot atomically, so concurrent readers never see a partial file.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_context_snapshot() -> dict | None:
+    """
+    Loads the instruction context from the on-disk snapshot cache.
+
+    A snapshot is discarded once it is older than CONTEXT_CACHE_TTL_SECONDS,
+    or CONTEXT_CACHE_VALIDATE_AFTER_SECONDS if some of its sources failed.
+    Snapshots validated less than CONTEXT_CACHE_VALIDATE_AFTER_SECONDS ago are
+    served without any network call; older ones are first checked against the
+    dataset and table `modified` timestamps.
+    Returns:
+        The cached context, or None if there is no valid snapshot.
+    """
+    if not CONTEXT_CACHE_ENABLED:
+        return None
+
+    start_time = time.time()
+    cache_key = context_cache_key()
+    path = _snapshot_path(cache_key)
+    try:
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+    except FileNotFoundError:
+        logger.info(f"[{DISPLAY_NAME}] No context snapshot found at {path}.")
+        return None
+    except Exception as e:
+        logger.warning(
+            f"[{DISPLAY_NAME}] Could not read context snapshot {path}. Ignoring it. Error: {e}"
+        )
+        return None
+
+    if (
+        not isinstance(snapshot, dict)
+        or snapshot.get("version") != SNAPSHOT_VERSION
+        or snapshot.get("key") != cache_key
+    ):
+        logger.info(
+            f"[{DISPLAY_NAME}] Context snapshot {path} does not match the current version or scope. Ignoring it."
+        )
+        return None
+
+    now = time.time()
+    age = now - snapshot["created_at"]
+    ttl = snapshot.get("ttl", CONTEXT_CACHE_TTL_SECONDS)
+    if age > ttl:
+        logger.info(
+            f"[{DISPLAY_NAME}] Context snapshot expired (age: {age:.0f} seconds, TTL: {ttl} seconds)."
+        )
+        return None
+
+    if now - snapshot["validated_at"] > CONTEXT_CACHE_VALIDATE_AFTER_SECONDS:
+        freshness = fetch_context_freshness()
+        if freshness is None or freshness != snapshot["freshness"]:
+            logger.info(
+                f"[{DISPLAY_NAME}] Context snapshot is stale or could not be validated. Fetching the context again."
+            )
+            return None
+        snapshot["validated_at"] = now
+        try:
+            _write_snapshot(path, snapshot)
+        except Exception as e:
+            logger.warning(
+                f"[{DISPLAY_NAME}] Could not update context snapshot {path}: {e}"
+            )
+
+    duration = time.time() - start_time
+    logger.info(
+        f"[{DISPLAY_NAME}] --- Loaded context snapshot (age: {age:.0f} seconds, Duration: {duration:.3f} seconds) ---"
+    )
+    return snapshot["context"]
+
+
+def save_context_snapshot(context: dict) -> None:
+    """
+    Saves the instruction context to the on-disk snapshot cache, together with
+    the freshness signals it will be validated against: those fetched with the
+    context, or fetched now if it has none. A context with failed sources is
+    kept for CONTEXT_CACHE_VALIDATE_AFTER_SECONDS only, so that a cold start
+    soon fetches it in full again instead of serving the gaps until the
+    snapshot expires.
+    """
+    if not CONTEXT_CACHE_ENABLED:
+        return
+    # A context without any table information usually means the fetch failed
+    # (e.g. missing permissions during a build); never cache that.
+    if not any(
+        context.get(section)
+        for section in ("table_metadata", "table_schemas", "data_profiles", "sample_data")
+    ):
+        logger.info(
+            f"[{DISPLAY_NAME}] Fetched context has no table information. Not saving a snapshot."
+        )
+        return
+
+    ttl = CONTEXT_CACHE_TTL_SECONDS
+    failed = failed_sources(context)
+    if failed:
+        ttl = min(ttl, CONTEXT_CACHE_VALIDATE_AFTER_SECONDS)
+        logger.info(
+            f"[{DISPLAY_NAME}] Fetched context is missing {failed}. Saving a snapshot that expires after {ttl} seconds."
+        )
+
+    now = time.time()
+    cache_key = context_cache_key()
+    path = _snapshot_path(cache_key)
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "key": cache_key,
+        "created_at": now,
+        "validated_at": now,
+        "ttl": ttl,
+        "freshness": context.get("freshness") or fetch_context_freshness(),
+        "context": context,
+    }
+    try:
+        _write_snapshot(path, snapshot)
+        logger.info(f"[{DISPLAY_NAME}] Saved context snapshot to {path}.")
+    except Exception as e:
+        logger.warning(
+            f"[{DISPLAY_NAME}] Could not save context snapshot to {path}: {e}"
+        )
@@ -0,0 +1,275 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .constants import CONTEXT_FETCH_MAX_WORKERS, DISPLAY_NAME
+from .context_cache import failed_sources, save_context_snapshot
+from .datasets import current_dataset
+from .instructions import fetch_instruction_context, timed_fetch
+from .telemetry import instrumented, set_attributes
+from .utils import (
+    fetch_bigquery_data_profiles,
+    fetch_context_freshness,
+    fetch_dataset_description,
+    fetch_few_shot_examples,
+    fetch_profile_scan_times,
+    fetch_sample_data_for_tables,
+    fetch_table_entry_metadata,
+    fetch_table_schemas,
+)
+
+# --- Logging Configuration ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# The per-table sections of the context, and the key naming the table of each item.
+TABLE_SECTIONS = {
+    "table_metadata": "table_name",
+    "table_schemas": "table_name",
+    "data_profiles": "source_table_id",
+    "sample_data": "table_name",
+}
+
+
+def _table_id(table_name: str) -> str:
+    return table_name.split(".")[-1]
+
+
+def profile_scan_times(context: dict) -> dict:
+    """
+    Returns the start time of the latest profile scan of each table, as seen
+    in the data profiles of the context.
+    """
+    scan_times = {}
+    for profile in context.get("data_profiles") or []:
+        table_id = _table_id(profile["source_table_id"])
+        scanned_at = profile.get("job_start_time")
+        if scanned_at is not None and (
+            table_id not in scan_times or scanned_at > scan_times[table_id]
+        ):
+            scan_times[table_id] = scanned_at
+    return scan_times
+
+
+def plan_refresh(context: dict, freshness: dict) -> dict:
+    """
+    Compares the change signals the context was fetched with to the current
+    ones, and returns what has to be fetched again: "tables" (changed or new
+    tables), "profiled_tables" (tables with a newer profile scan),
+    "removed_tables", "dataset_description" and "few_shot_examples", and the
+    "failed_sources" of the last fetch, which are fetched again in full
+    ("all_tables").
+    """
+    config = current_dataset()
+    previous = context["freshness"]
+    previous_tables = previous["tables_modified"]
+    tables = {
+        table_id
+        for table_id, modified in freshness["tables_modified"].items()
+        if previous_tables.get(table_id) != modified
+    }
+    removed_tables = set(previous_tables) - set(freshness["tables_modified"])
+
+    def source_changed(source_table_id: str | None) -> bool:
+        if not source_table_id:
+            return False
+        return any(
+            previous.get(signal, {}).get(source_table_id)
+            != freshness.get(signal, {}).get(source_table_id)
+            for signal in ("sources_modified", "sources_rows")
+        )
+
+    profiled_tables = set()
+    if source_changed(config.data_profiles_table_full_id):
+        scan_times = fetch_profile_scan_times()
+        previous_scan_times = profile_scan_times(context)
+        profiled_tables = {
+            table_id
+            for table_id in freshness["tables_modified"]
+            if scan_times is None
+            or (
+                table_id in scan_times
+                and scan_times[table_id] != previous_scan_times.get(table_id)
+            )
+        }
+
+    return {
+        "tables": tables,
+        "profiled_tables": profiled_tables - tables,
+        "removed_tables": removed_tables,
+        "dataset_description": previous["dataset_modified"]
+        != freshness["dataset_modified"],
+        "few_shot_examples": source_changed(config.few_shot_examples_table_full_id),
+        "failed_sources": set(failed_sources(context)),
+        "all_tables": set(freshness["tables_modified"]),
+    }
+
+
+def merge_table_items(
+    items: list[dict], key: str, fetched: list[dict], tables: set[str], removed: set[str]
+) -> list[dict]:
+    """
+    Returns the items of a per-table section with those of the re-fetched
+    tables replaced by the fetched ones, and those of removed tables dropped.
+    A re-fetched table without any fetched item (e.g. its fetch failed) keeps
+    its previous items.
+    """
+    fetched = [item for item in fetched if _table_id(item[key]) in tables]
+    dropped = {_table_id(item[key]) for item in fetched} | removed
+    return [item for item in items if _table_id(item[key]) not in dropped] + fetched
+
+
+def _fetch_changes(context: dict, plan: dict) -> dict:
+    """
+    Fetches the re-fetched sources of a refresh plan concurrently. Returns the
+    fetched sections with, for per-table sections, the tables they cover, and
+    how long each fetch took. A source whose fetch raised is left out.
+    """
+    failed = plan["failed_sources"]
+    all_tables = sorted(plan["all_tables"])
+
+    def tables_for(source: str, changed: set[str]) -> list[str]:
+        # A source whose last fetch failed is fetched again for all tables.
+        return all_tables if source in failed else sorted(changed)
+
+    tables = plan["tables"]
+    profiled_tables = plan["tables"] | plan["profiled_tables"]
+    fetchers = {}
+    for source, fetch_fn in (
+        ("table_schemas", fetch_table_schemas),
+        ("table_metadata", fetch_table_entry_metadata),
+    ):
+        if tables_for(source, tables):
+            fetchers[source] = (fetch_fn, tables_for(source, tables))
+    if current_dataset().data_profiles_table_full_id and tables_for(
+        "data_profiles", profiled_tables
+    ):
+        fetchers["data_profiles"] = (
+            fetch_bigquery_data_profiles,
+            tables_for("data_profiles", profiled_tables),
+        )
+    if tables_for("sample_data", tables) and not context.get("data_profiles"):
+        fetchers["sample_data"] = (
+            fetch_sample_data_for_tables,
+            tables_for("sample_data", tables),
+        )
+    for source in ("dataset_description", "few_shot_examples"):
+        if plan[source] or source in failed:
+            fetchers[source] = (
+                fetch_dataset_description
+                if source == "dataset_description"
+                else fetch_few_shot_examples,
+                None,
+            )
+
+    with ThreadPoolExecutor(
+        max_workers=CONTEXT_FETCH_MAX_WORKERS, thread_name_prefix="context-refresh"
+    ) as executor:
+        futures = {
+            source: executor.submit(
+                contextvars.copy_context().run,
+                timed_fetch,
+                fetch_fn,
+                **({"table_names": table_names} if table_names is not None else {}),
+            )
+            for source, (fetch_fn, table_names) in fetchers.items()
+        }
+        fetched = {}
+        for source, future in futures.items():
+            try:
+                value, timing = future.result()
+            except Exception as e:
+                logger.error(
+                    f"[{DISPLAY_NAME}] Re-fetching '{source}' failed. Keeping its previous value. Error: {e}",
+                    exc_info=True,
+                )
+                continue
+            fetched[source] = (value, set(fetchers[source][1] or []), timing)
+        return fetched
+
+
+@instrumented()
+def refresh_context(context: dict) -> dict | None:
+    """
+    Checks the change signals of the context and re-fetches only what changed:
+    the schema, Dataplex metadata and sample data of changed tables, the data
+    profiles of tables with a newer profile scan, the dataset description and
+    the few-shot examples.
+
+    Sources whose fetch failed or missed its deadline (see `failed_sources`)
+    are fetched again in full, even when nothing changed.
+
+    Dataplex aspects edited without a change to the table itself are only
+    picked up by a full fetch (e.g. when the snapshot expires).
+    Returns:
+        A new context, also saved as the context snapshot, or None if nothing
+        changed or the change signals could not be fetched.
+    """
+    start_time = time.time()
+    freshness = fetch_context_freshness()
+    if freshness is None or (
+        freshness == context.get("freshness") and not failed_sources(context)
+    ):
+        return None
+
+    if not context.get("freshness"):
+        # Without the signals it was fetched with, nothing can be compared.
+        logger.info(
+            f"[{DISPLAY_NAME}] The instruction context has no change signals. Fetching all of it again."
+        )
+        new_context = fetch_instruction_context()
+        save_context_snapshot(new_context)
+        return new_context
+
+    plan = plan_refresh(context, freshness)
+    fetched = _fetch_changes(context, plan)
+
+    fetch_timings = dict(context.get("fetch_timings") or {})
+    for section, (_, _, timing) in fetched.items():
+        fetch_timings[section] = timing
+    new_context = dict(context, freshness=freshness, fetch_timings=fetch_timings)
+    for section, key in TABLE_SECTIONS.items():
+        items, tables, _ = fetched.pop(section, ([], set(), None))
+        new_context[section] = merge_table_items(
+            context.get(section) or [], key, items, tables, plan["removed_tables"]
+        )
+    for section, (value, _, _) in fetched.items():
+        # A source that fetched nothing (e.g. its fetch failed) keeps its previous value.
+        if value:
+            new_context[section] = value
+    if new_context.get("data_profiles"):
+        new_context["sample_data"] = []
+        fetch_timings.pop("sample_data", None)
+
+    set_attributes(
+        rows=len(plan["tables"]) + len(plan["profiled_tables"]),
+        removed_tables=len(plan["removed_tables"]),
+    )
+    duration = time.time() - start_time
+    logger.info(
+        f"[{DISPLAY_NAME}] --- Refreshed instruction context (Duration: {duration:.2f} seconds; "
+        f"changed tables: {sorted(plan['tables'])}, re-profiled tables: {sorted(plan['profiled_tables'])}, "
+        f"removed tables: {sorted(plan['removed_tables'])}, dataset description: {plan['dataset_description']}, "
+        f"few-shot examples: {plan['few_shot_examples']}, retried sources: {sorted(plan['failed_sources'])}) ---"
+    )
+    save_context_snapshot(new_context)
+    return new_context
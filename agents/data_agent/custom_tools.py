@@ -12,15 +12,63 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import base64
+import concurrent.futures
+import contextvars
+import datetime
+import decimal
+import functools
 import json
 import logging
 import time
+from collections.abc import Iterable
+from typing import Optional
 
 from google.adk.tools.tool_context import ToolContext
-from google.cloud import bigquery
-from google.oauth2.credentials import Credentials
 
-from .constants import AUTH_ID, DISPLAY_NAME, PROJECT_ID
+from .clients import get_bigquery_client, principal_for_token
+from .constants import (
+    AUTH_ID,
+    BQ_BATCH_MAX_QUERIES,
+    BQ_MAX_POLL_INTERVAL_SECONDS,
+    BQ_MIN_POLL_INTERVAL_SECONDS,
+    BQ_QUERY_TIMEOUT_SECONDS,
+    DISPLAY_NAME,
+    RESULT_MAX_BYTES,
+    RESULT_MAX_ROWS,
+    RESULT_SUMMARY_MAX_ROWS,
+    SQL_VALIDATION_ENABLED,
+)
+from .execution_policy import (
+    HedgedJob,
+    hedges_query,
+    query_retry_kwargs,
+    record_queue_time,
+    retry_within,
+)
+from .job_scheduler import (
+    AdmissionRejected,
+    acquire_job_slot,
+    acquire_job_slot_async,
+    release_job_slot,
+    try_acquire_job_slot,
+)
+from .query_cache import cache_result, get_cached_result, query_cache_key
+from .query_guard import check_query_cost, query_job_config
+from .query_history import record_query_run, slow_query_hint
+from .result_analysis import analyze_frame
+from .result_download import stream_rows
+from .result_store import (
+    ResultCollector,
+    frame_rows,
+    keeps_result,
+    result_store,
+    session_key,
+    store_result,
+)
+from .sql_validation import SchemaCatalog, schema_catalog, validate_query
+from .telemetry import instrumented, record_error, record_query_job, set_attributes
 
 # --- Logging Configuration ---
 logging.basicConfig(
@@ -30,7 +78,541 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+_CACHE_MISS_PREFIX = '{"cache_hit":false,'
+_CACHE_HIT_PREFIX = '{"cache_hit":true,'
+# Longest string shown as a column minimum or maximum in the truncation footer
+_SUMMARY_MAX_STRING_LENGTH = 100
+
+
+def _json_default(obj):
+    """JSON serializer for BigQuery values not serializable by default json code"""
+    if isinstance(obj, (datetime.date, datetime.datetime, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, bytes):
+        return base64.b64encode(obj).decode("ascii")
+    return str(obj)
+
+
+def _dumps(value) -> str:
+    return json.dumps(
+        value, separators=(",", ":"), ensure_ascii=False, default=_json_default
+    )
+
+
+def _update_column_summaries(summaries: list[dict], row: tuple) -> None:
+    for summary, value in zip(summaries, row):
+        if value is None:
+            summary["nulls"] += 1
+            continue
+        if not summary["comparable"]:
+            continue
+        try:
+            if summary["min"] is None or value < summary["min"]:
+                summary["min"] = value
+            if summary["max"] is None or value > summary["max"]:
+                summary["max"] = value
+        except TypeError:
+            # Mixed or unordered types (e.g. STRUCT values) have no min/max.
+            summary["comparable"] = False
+            summary["min"] = summary["max"] = None
+
+
+def _summary_value(value):
+    if isinstance(value, str) and len(value) > _SUMMARY_MAX_STRING_LENGTH:
+        return value[:_SUMMARY_MAX_STRING_LENGTH] + "..."
+    return value
+
+
+def serialize_result(
+    columns: list[str],
+    rows: Iterable[tuple],
+    total_rows: int | None = None,
+    max_rows: int = RESULT_MAX_ROWS,
+    max_bytes: int = RESULT_MAX_BYTES,
+) -> tuple[str, int]:
+    """
+    Serializes query results as compact, columnar JSON while streaming them.
+
+    Column names are written once and each row is an array of values. At most
+    `max_rows` rows and about `max_bytes` bytes of rows are written, so the
+    output size and memory stay bounded whatever the result size. When rows are
+    left out, the output ends with a truncation footer giving the total row
+    count and per-column null counts and min/max values, computed over the
+    first RESULT_SUMMARY_MAX_ROWS rows (`summarized_rows`); `partial_summaries`
+    tells when that is not the whole result.
+    Args:
+        columns: The column names.
+        rows: An iterable of row value tuples, consumed once.
+        total_rows: The total row count reported by BigQuery, if known.
+        max_rows: The maximum number of rows to include.
+        max_bytes: The approximate maximum size of the serialized rows.
+    Returns:
+        The JSON string and the number of rows read from `rows`.
+    """
+    parts = [_CACHE_MISS_PREFIX, '"columns":', _dumps(columns), ',"rows":[']
+    written_bytes = 0
+    returned_rows = 0
+    read_rows = 0
+    truncated = False
+    partial_summaries = False
+    summaries = [
+        {"nulls": 0, "min": None, "max": None, "comparable": True} for _ in columns
+    ]
+
+    for row in rows:
+        read_rows += 1
+        _update_column_summaries(summaries, row)
+        if not truncated:
+            row_json = _dumps(list(row))
+            if returned_rows >= max_rows or written_bytes + len(row_json) > max_bytes:
+                truncated = True
+            else:
+                parts.append(("," if returned_rows else "") + row_json)
+                written_bytes += len(row_json) + 1
+                returned_rows += 1
+        if truncated and read_rows >= RESULT_SUMMARY_MAX_ROWS:
+            partial_summaries = read_rows != total_rows
+            break
+
+    footer = {
+        "returned_rows": returned_rows,
+        "total_rows": total_rows if total_rows is not None else read_rows,
+        "truncated": truncated,
+    }
+    if truncated:
+        footer["summarized_rows"] = read_rows
+        footer["partial_summaries"] = partial_summaries
+        footer["column_summaries"] = {
+            column: {
+                "nulls": summary["nulls"],
+                "min": _summary_value(summary["min"]),
+                "max": _summary_value(summary["max"]),
+            }
+            for column, summary in zip(columns, summaries)
+        }
+    parts.append("]," + _dumps(footer)[1:])
+    return "".join(parts), read_rows
+
+
+def _with_fields(payload: str, **fields) -> str:
+    """
+    Adds fields, e.g. a hint for the model, to a serialized result. None
+    values are skipped.
+    """
+    extra = "".join(
+        f",{_dumps(name)}:{_dumps(value)}" for name, value in fields.items() if value is not None
+    )
+    return payload[:-1] + extra + "}" if extra else payload
+
+
+def _get_access_token(tool_context: ToolContext) -> str | None:
+    """
+    Returns the user's OAuth access token from the ToolContext, if present.
+    """
+    auth_token_key = f"temp:{AUTH_ID}"
+
+    # Check for OAuth token in the tool context
+    if AUTH_ID and auth_token_key in tool_context.state:
+        logger.info(
+            f"[{DISPLAY_NAME}] Found OAuth token for '{AUTH_ID}'. Executing query with user credentials."
+        )
+        return tool_context.state[auth_token_key]
+    logger.info(
+        f"[{DISPLAY_NAME}] No user-provided OAuth token found. Executing query with service account credentials."
+    )
+    return None
+
+
+def _prepare_query(
+    sql_query: str,
+    access_token: str | None,
+    start_time: float,
+    catalog: SchemaCatalog | None = None,
+    max_rows: int = RESULT_MAX_ROWS,
+    max_bytes: int = RESULT_MAX_BYTES,
+):
+    """
+    Validates the query against the schema catalog, if given, then gets the
+    client for the principal and runs the checks done before a query is
+    submitted. Results are cached per caps (`max_rows`, `max_bytes`) they
+    were serialized with.
+    Returns:
+        The BigQuery client, the result cache key, and the response to return
+        right away (a cached result or a rejection), if any.
+    """
+    problem = validate_query(sql_query, catalog) if SQL_VALIDATION_ENABLED else None
+    if problem is not None:
+        logger.info(
+            f"[{DISPLAY_NAME}] --- BigQuery query rejected by the SQL validation: {problem} ---"
+        )
+        set_attributes(outcome="rejected")
+        return None, None, f"Query rejected before execution: {problem}"
+
+    # Reuse the pooled BQ client for the user if a token is available, otherwise the service account one
+    client = get_bigquery_client(access_token)
+
+    # Results are cached per principal, so users never see each other's data
+    principal = principal_for_token(access_token)
+    cache_key = query_cache_key(sql_query, principal, f"{max_rows}:{max_bytes}")
+    cached_entry = get_cached_result(client, cache_key)
+    if cached_entry is not None:
+        duration = time.time() - start_time
+        logger.info(
+            f"[{DISPLAY_NAME}] --- BigQuery query served from cache (cache hit, Duration: {duration:.2f} seconds) ---"
+        )
+        payload = _CACHE_HIT_PREFIX + cached_entry["result"][len(_CACHE_MISS_PREFIX) :]
+        set_attributes(cache_hit=True, payload_bytes=len(payload))
+        return client, cache_key, payload
+    set_attributes(cache_hit=False)
+
+    remaining = BQ_QUERY_TIMEOUT_SECONDS - (time.time() - start_time)
+    rejection = check_query_cost(
+        client, sql_query, principal, retry=retry_within(remaining)
+    )
+    if rejection is not None:
+        logger.info(
+            f"[{DISPLAY_NAME}] --- BigQuery query rejected by the cost guard: {rejection} ---"
+        )
+        set_attributes(outcome="rejected")
+        return client, cache_key, f"Query rejected before execution: {rejection}"
+    return client, cache_key, None
+
+
+def _submit_query(client, sql_query: str, start_time: float):
+    """
+    Submits a query job. Transient errors of the submission and of the job
+    are retried until BQ_QUERY_TIMEOUT_SECONDS after `start_time`.
+    """
+    logger.info(f"[{DISPLAY_NAME}] Submitting query to BigQuery...")
+    remaining = BQ_QUERY_TIMEOUT_SECONDS - (time.time() - start_time)
+    return client.query(
+        sql_query, job_config=query_job_config(), **query_retry_kwargs(remaining)
+    )
+
+
+def _submit_hedge(client, sql_query: str, start_time: float, principal: str):
+    """
+    Submits the duplicate job of a hedged query under a job slot of its own,
+    taken only if one is free right away.
+    Returns:
+        The duplicate job, or None if no slot is free.
+    """
+    if not try_acquire_job_slot(principal):
+        return None
+    try:
+        return _submit_query(client, sql_query, start_time)
+    except Exception:
+        release_job_slot(principal)
+        raise
+
+
+def _release_job_slots(principal: str, hedged: HedgedJob | None) -> None:
+    """
+    Releases the job slot of a query, and that of its hedged duplicate job,
+    if one was submitted. By then the losing job has been cancelled.
+    """
+    for _ in range(len(hedged.jobs) if hedged is not None else 1):
+        release_job_slot(principal)
+
+
+def _wait_hedged(hedged: HedgedJob, start_time: float):
+    """
+    Polls the jobs of a hedged query until one of them succeeded, or all
+    of them are done.
+    Returns:
+        The winning job (see `HedgedJob.poll`).
+    Raises:
+        concurrent.futures.TimeoutError: If none is done BQ_QUERY_TIMEOUT_SECONDS
+            after `start_time`. The duplicate job, if any, is cancelled.
+    """
+    poll_interval = BQ_MIN_POLL_INTERVAL_SECONDS
+    while (query_job := hedged.poll()) is None:
+        remaining = BQ_QUERY_TIMEOUT_SECONDS - (time.time() - start_time)
+        if remaining <= 0:
+            hedged.cancel_others()
+            raise concurrent.futures.TimeoutError()
+        time.sleep(min(poll_interval, remaining))
+        poll_interval = min(poll_interval * 1.5, BQ_MAX_POLL_INTERVAL_SECONDS)
+    return query_job
+
+
+def _finish_query(
+    query_job,
+    sql_query: str,
+    access_token: str | None,
+    cache_key: str | None,
+    start_time: float,
+    session: str | None = None,
+    max_rows: int = RESULT_MAX_ROWS,
+    max_bytes: int = RESULT_MAX_BYTES,
+) -> str:
+    """
+    Downloads and serializes the result of a finished query job, within
+    `max_rows` and `max_bytes`, and records the run in the query history. When queries of the same shape were slow
+    before, the result carries a hint. A result small enough is also kept in
+    the result store for the session, and the result carries its handle.
+    """
+    results = query_job.result()
+    record_queue_time(query_job)
+    download_start_time = time.time()
+    columns, rows, download_mode = stream_rows(results, access_token)
+    keep_result = keeps_result(session, results.total_rows)
+    if keep_result:
+        rows = ResultCollector(columns, rows)
+    # On success, return the data as a compact JSON string
+    payload, num_rows = serialize_result(
+        columns, rows, results.total_rows, max_rows, max_bytes
+    )
+    total_rows = results.total_rows if results.total_rows is not None else num_rows
+    record_query_job(query_job)
+    set_attributes(
+        rows=total_rows,
+        download_mode=download_mode,
+        payload_bytes=len(payload),
+    )
+
+    end_time = time.time()
+    duration = end_time - start_time
+    rows_per_second = num_rows / max(end_time - download_start_time, 1e-6)
+    logger.info(
+        f"[{DISPLAY_NAME}] --- BigQuery query execution successful ({num_rows} rows, {rows_per_second:.0f} rows/s via {download_mode}, Duration: {duration:.2f} seconds) ---"
+    )
+
+    cache_result(cache_key, query_job, payload, size_bytes=len(payload))
+    result_handle = store_result(session, sql_query, rows) if keep_result else None
+    hint = slow_query_hint(sql_query)
+    record_query_run(sql_query, "success", duration, query_job, total_rows)
+    return _with_fields(payload, result_handle=result_handle, hint=hint)
+
+
+def _cancel_query(
+    query_job, sql_query: str, start_time: float, outcome: str = "timeout"
+) -> str:
+    """
+    Cancels a query job server-side, if one was submitted, so an abandoned
+    query stops billing.
+    """
+    duration = time.time() - start_time
+    set_attributes(outcome=outcome)
+    hint = slow_query_hint(sql_query)
+    record_query_run(sql_query, outcome, duration, query_job)
+    if query_job is None:
+        logger.warning(
+            f"[{DISPLAY_NAME}] --- BigQuery query abandoned after {duration:.2f} seconds, before its job was submitted ---"
+        )
+    else:
+        try:
+            query_job.cancel()
+            logger.warning(
+                f"[{DISPLAY_NAME}] --- BigQuery job {query_job.job_id} cancelled after {duration:.2f} seconds ---"
+            )
+        except Exception:
+            logger.error(
+                f"[{DISPLAY_NAME}] Could not cancel BigQuery job {query_job.job_id}.",
+                exc_info=True,
+            )
+    message = (
+        f"The query did not finish within {BQ_QUERY_TIMEOUT_SECONDS:.0f} seconds and was cancelled. "
+        "Try a more selective query, e.g. a narrower date range, fewer columns or more aggregation."
+    )
+    return f"{message} {hint}" if hint else message
+
+
+def _not_admitted(error: AdmissionRejected, start_time: float) -> str:
+    """
+    Returns the response to a query whose job the job scheduler did not admit.
+    """
+    duration = time.time() - start_time
+    set_attributes(outcome="throttled")
+    logger.warning(
+        f"[{DISPLAY_NAME}] --- BigQuery query not admitted after {duration:.2f} seconds: {error} ---"
+    )
+    return (
+        f"Query not run: BigQuery is busy with other queries ({error}). "
+        "Wait a moment before trying again."
+    )
+
+
+def _query_failed(
+    error: Exception, sql_query: str, query_job, start_time: float
+) -> str:
+    record_error(error)
+    end_time = time.time()
+    duration = end_time - start_time
+    if query_job is not None:
+        record_query_run(sql_query, "error", duration, query_job)
+    logger.error(
+        f"[{DISPLAY_NAME}] --- BigQuery query execution failed after {duration:.2f} seconds ---",
+        exc_info=True,  # This automatically adds exception info (like traceback)
+    )
+    # On failure, return the error message as a string
+    return f"An error occurred while executing the BigQuery query: {error}"
+
+
+def _run_query(
+    sql_query: str,
+    access_token: str | None,
+    start_time: float,
+    session: str | None = None,
+    catalog: SchemaCatalog | None = None,
+    max_rows: int = RESULT_MAX_ROWS,
+    max_bytes: int = RESULT_MAX_BYTES,
+) -> str:
+    """
+    Runs one query and waits for it until BQ_QUERY_TIMEOUT_SECONDS after
+    `start_time`. The job of a read-only query is hedged when BQ_HEDGE_ENABLED
+    is set (see `HedgedJob`). Its result is kept for `session`, if given, and
+    returned within `max_rows` and `max_bytes`.
+    Returns:
+        The tool response for the query.
+    """
+    query_job = None
+    try:
+        client, cache_key, response = _prepare_query(
+            sql_query, access_token, start_time, catalog, max_rows, max_bytes
+        )
+        if response is not None:
+            return response
+
+        principal = principal_for_token(access_token)
+        acquire_job_slot(principal, start_time)
+        hedged = None
+        try:
+            query_job = _submit_query(client, sql_query, start_time)
+            # Only the wait for the job times out; a TimeoutError raised by
+            # anything else is an error of the query.
+            try:
+                if hedges_query(sql_query):
+                    hedged = HedgedJob(
+                        query_job,
+                        functools.partial(
+                            _submit_hedge, client, sql_query, start_time, principal
+                        ),
+                        hedge=True,
+                    )
+                    query_job = _wait_hedged(hedged, start_time)
+                else:
+                    remaining = BQ_QUERY_TIMEOUT_SECONDS - (time.time() - start_time)
+                    query_job.result(timeout=max(remaining, 0))
+            except concurrent.futures.TimeoutError:
+                return _cancel_query(query_job, sql_query, start_time)
+        finally:
+            _release_job_slots(principal, hedged)
+        return _finish_query(
+            query_job,
+            sql_query,
+            access_token,
+            cache_key,
+            start_time,
+            session,
+            max_rows,
+            max_bytes,
+        )
+
+    except AdmissionRejected as e:
+        return _not_admitted(e, start_time)
+    except Exception as e:
+        return _query_failed(e, sql_query, query_job, start_time)
+
 
+async def _run_query_async(
+    sql_query: str,
+    access_token: str | None,
+    start_time: float,
+    session: str | None = None,
+    catalog: SchemaCatalog | None = None,
+    max_rows: int = RESULT_MAX_ROWS,
+    max_bytes: int = RESULT_MAX_BYTES,
+) -> str:
+    """
+    Runs one query without blocking the event loop, polling the job until it
+    is done or BQ_QUERY_TIMEOUT_SECONDS after `start_time`. The job of a
+    read-only query is hedged when BQ_HEDGE_ENABLED is set (see `HedgedJob`).
+    Its result is kept for `session`, if given, and returned within
+    `max_rows` and `max_bytes`.
+    Returns:
+        The tool response for the query.
+    """
+    query_job = hedged = None
+    try:
+        client, cache_key, response = await asyncio.to_thread(
+            _prepare_query,
+            sql_query,
+            access_token,
+            start_time,
+            catalog,
+            max_rows,
+            max_bytes,
+        )
+        if response is not None:
+            return response
+
+        principal = principal_for_token(access_token)
+        await acquire_job_slot_async(principal, start_time)
+        try:
+            query_job = await asyncio.to_thread(
+                _submit_query, client, sql_query, start_time
+            )
+            hedged = HedgedJob(
+                query_job,
+                functools.partial(
+                    _submit_hedge, client, sql_query, start_time, principal
+                ),
+                hedge=hedges_query(sql_query),
+            )
+            poll_interval = BQ_MIN_POLL_INTERVAL_SECONDS
+            while (done_job := await asyncio.to_thread(hedged.poll)) is None:
+                remaining = BQ_QUERY_TIMEOUT_SECONDS - (time.time() - start_time)
+                if remaining <= 0:
+                    await asyncio.to_thread(hedged.cancel_others)
+                    return await asyncio.to_thread(
+                        _cancel_query, query_job, sql_query, start_time
+                    )
+                await asyncio.sleep(min(poll_interval, remaining))
+                poll_interval = min(poll_interval * 1.5, BQ_MAX_POLL_INTERVAL_SECONDS)
+        finally:
+            _release_job_slots(principal, hedged)
+        query_job = done_job
+        return await asyncio.to_thread(
+            _finish_query,
+            query_job,
+            sql_query,
+            access_token,
+            cache_key,
+            start_time,
+            session,
+            max_rows,
+            max_bytes,
+        )
+
+    except asyncio.CancelledError:
+        # Cancel the jobs in the background: the blocking API calls must not
+        # hold up the event loop, nor the cancellation of this call.
+        loop = asyncio.get_running_loop()
+        if hedged is not None:
+            loop.run_in_executor(None, contextvars.copy_context().run, hedged.cancel_others)
+        if query_job is not None:
+            loop.run_in_executor(
+                None,
+                functools.partial(
+                    contextvars.copy_context().run,
+                    _cancel_query,
+                    query_job,
+                    sql_query,
+                    start_time,
+                    outcome="cancelled",
+                ),
+            )
+        raise
+    except AdmissionRejected as e:
+        return _not_admitted(e, start_time)
+    except Exception as e:
+        return _query_failed(e, sql_query, query_job, start_time)
+
+
+@instrumented()
 def execute_bigquery_query(sql_query: str, tool_context: ToolContext) -> str:
     """
     Executes a given SQL query on Google BigQuery and returns the results.
@@ -43,55 +625,342 @@ def execute_bigquery_query(sql_query: str, tool_context: ToolContext) -> str:
         sql_query: The SQL query string to execute.
         tool_context: The context object provided by the ADK framework.
 
+    Identical queries from the same principal are served from the query result
+    cache until a table they read is modified. A query still running after
+    BQ_QUERY_TIMEOUT_SECONDS is cancelled. Each run is recorded in the query
+    history. Results of up to RESULT_STORE_MAX_ROWS rows are kept for the
+    session, for `analyze_query_result`.
+
     Returns:
-        A JSON string representing the list of result rows. In case of an
-        error, returns a string with the error message.
+        A compact JSON string, as produced by `serialize_result`, with a
+        `cache_hit` flag, a `result_handle` when the full result was kept,
+        and a `hint` when queries of the same shape were slow before. In case
+        of an error, returns a string with the error message.
     """
     logger.info(f"[{DISPLAY_NAME}] --- Starting BigQuery query execution ---")
     start_time = time.time()
-    credentials = None
-    auth_token_key = f"temp:{AUTH_ID}"
+    access_token = _get_access_token(tool_context)
+    set_attributes(credential_mode="user" if access_token else "service_account")
+    return _run_query(
+        sql_query,
+        access_token,
+        start_time,
+        session_key(tool_context),
+        schema_catalog(tool_context),
+    )
 
-    # Check for OAuth token in the tool context
-    if AUTH_ID and auth_token_key in tool_context.state:
-        access_token = tool_context.state[auth_token_key]
-        credentials = Credentials(token=access_token)
-        logger.info(
-            f"[{DISPLAY_NAME}] Found OAuth token for '{AUTH_ID}'. Executing query with user credentials."
-        )
-    else:
-        logger.info(
-            f"[{DISPLAY_NAME}] No user-provided OAuth token found. Executing query with service account credentials."
+
+@instrumented()
+async def execute_bigquery_query_async(
+    sql_query: str, tool_context: ToolContext
+) -> str:
+    """
+    Executes a given SQL query on Google BigQuery and returns the results.
+
+    This is the asynchronous variant of `execute_bigquery_query`, with the
+    same credential handling and output. Blocking calls run in worker threads
+    and the job is polled with `asyncio.sleep` in between, so the event loop
+    keeps serving other sessions. The BigQuery job is cancelled server-side
+    when it runs past BQ_QUERY_TIMEOUT_SECONDS or when the call is cancelled,
+    e.g. because the session went away.
+
+    Args:
+        sql_query: The SQL query string to execute.
+        tool_context: The context object provided by the ADK framework.
+
+    Returns:
+        A compact JSON string, as produced by `serialize_result`, with a
+        `cache_hit` flag, a `result_handle` when the full result was kept,
+        and a `hint` when queries of the same shape were slow before. In case
+        of an error, returns a string with the error message.
+    """
+    logger.info(f"[{DISPLAY_NAME}] --- Starting BigQuery query execution ---")
+    start_time = time.time()
+    access_token = _get_access_token(tool_context)
+    set_attributes(credential_mode="user" if access_token else "service_account")
+    return await _run_query_async(
+        sql_query,
+        access_token,
+        start_time,
+        session_key(tool_context),
+        schema_catalog(tool_context),
+    )
+
+
+def _check_batch(sql_queries: list[str]) -> str | None:
+    """
+    Returns why a batch of queries cannot run, or None.
+    """
+    if not sql_queries:
+        return "No SQL queries were given."
+    if len(sql_queries) > BQ_BATCH_MAX_QUERIES:
+        return (
+            f"Too many queries in one batch ({len(sql_queries)}); at most {BQ_BATCH_MAX_QUERIES} can run together. "
+            "Split them into several batches, or combine related queries into one."
         )
+    return None
 
-    try:
-        # Instantiate BQ client with user credentials if available, otherwise default
-        client = bigquery.Client(project=PROJECT_ID, credentials=credentials)
-        logger.info(f"[{DISPLAY_NAME}] BigQuery client created successfully.")
 
-        logger.info(f"[{DISPLAY_NAME}] Submitting query to BigQuery...")
-        query_job = client.query(sql_query)
+def _batch_caps(num_queries: int) -> tuple[int, int]:
+    """
+    Returns the row and byte caps of each query of a batch: RESULT_MAX_ROWS
+    and RESULT_MAX_BYTES split evenly, so the whole response stays within them.
+    """
+    return max(1, RESULT_MAX_ROWS // num_queries), RESULT_MAX_BYTES // num_queries
 
-        results = query_job.result()
-        data = [dict(row.items()) for row in results]
-        num_rows = len(data)
 
-        end_time = time.time()
-        duration = end_time - start_time
-        logger.info(
-            f"[{DISPLAY_NAME}] --- BigQuery query execution successful ({num_rows} rows, Duration: {duration:.2f} seconds) ---"
+def _batch_result(outcomes: list[tuple[str, float]], start_time: float) -> str:
+    """
+    Serializes the outcomes of the queries of a batch, each a response of the
+    single query tool and its duration. A result (a JSON object) is embedded
+    as is; any other response is an error message.
+    """
+    entries = []
+    failed = 0
+    for index, (response, seconds) in enumerate(outcomes):
+        entry = f'{{"query":{index},"seconds":{seconds:.2f},'
+        if response.startswith("{"):
+            entries.append(entry + '"result":' + response + "}")
+        else:
+            failed += 1
+            entries.append(entry + '"error":' + _dumps(response) + "}")
+    duration = time.time() - start_time
+    set_attributes(queries=len(outcomes), failed_queries=failed)
+    logger.info(
+        f"[{DISPLAY_NAME}] --- BigQuery batch of {len(outcomes)} queries finished ({failed} failed, Duration: {duration:.2f} seconds) ---"
+    )
+    return '{"results":[' + ",".join(entries) + f'],"seconds":{duration:.2f}}}'
+
+
+@instrumented("execute_bigquery_batch_query")
+def _run_batch_query(
+    sql_query: str,
+    access_token: str | None,
+    start_time: float,
+    session: str | None,
+    catalog: SchemaCatalog | None,
+    max_rows: int,
+    max_bytes: int,
+) -> tuple[str, float]:
+    query_start_time = time.time()
+    set_attributes(credential_mode="user" if access_token else "service_account")
+    response = _run_query(
+        sql_query, access_token, start_time, session, catalog, max_rows, max_bytes
+    )
+    return response, time.time() - query_start_time
+
+
+@instrumented("execute_bigquery_batch_query")
+async def _run_batch_query_async(
+    sql_query: str,
+    access_token: str | None,
+    start_time: float,
+    session: str | None,
+    catalog: SchemaCatalog | None,
+    max_rows: int,
+    max_bytes: int,
+) -> tuple[str, float]:
+    query_start_time = time.time()
+    set_attributes(credential_mode="user" if access_token else "service_account")
+    response = await _run_query_async(
+        sql_query, access_token, start_time, session, catalog, max_rows, max_bytes
+    )
+    return response, time.time() - query_start_time
+
+
+@instrumented()
+def execute_bigquery_queries(sql_queries: list[str], tool_context: ToolContext) -> str:
+    """
+    Executes several independent SQL queries on Google BigQuery at the same
+    time and returns all their results.
+
+    Use it instead of several `execute_bigquery_query` calls when the queries
+    do not depend on each other's results, e.g. the same metric for this month
+    and last month: they run as concurrent BigQuery jobs, so the call takes
+    about as long as the slowest query. Each query is run like by
+    `execute_bigquery_query`, with the same credentials, result cache, cost
+    guard and BQ_QUERY_TIMEOUT_SECONDS deadline. At most BQ_BATCH_MAX_QUERIES
+    queries can run in one call. The row and byte caps of a result are split
+    evenly across the queries, so the response is no bigger than one result.
+
+    Args:
+        sql_queries: The SQL query strings to execute.
+        tool_context: The context object provided by the ADK framework.
+
+    Returns:
+        A compact JSON string with `results`, one object per query in the
+        order given: `query` (its position), `seconds` (its duration) and
+        either `result` (as returned by `execute_bigquery_query`) or `error`
+        (the error message). In case the batch cannot run, returns a string
+        with the error message.
+    """
+    logger.info(
+        f"[{DISPLAY_NAME}] --- Starting BigQuery batch of {len(sql_queries)} queries ---"
+    )
+    start_time = time.time()
+    rejection = _check_batch(sql_queries)
+    if rejection is not None:
+        set_attributes(outcome="rejected")
+        return rejection
+    access_token = _get_access_token(tool_context)
+    set_attributes(credential_mode="user" if access_token else "service_account")
+    session = session_key(tool_context)
+    catalog = schema_catalog(tool_context)
+    max_rows, max_bytes = _batch_caps(len(sql_queries))
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=len(sql_queries), thread_name_prefix="bq-batch"
+    ) as executor:
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run,
+                _run_batch_query,
+                sql_query,
+                access_token,
+                start_time,
+                session,
+                catalog,
+                max_rows,
+                max_bytes,
+            )
+            for sql_query in sql_queries
+        ]
+        outcomes = [future.result() for future in futures]
+    return _batch_result(outcomes, start_time)
+
+
+@instrumented()
+async def execute_bigquery_queries_async(
+    sql_queries: list[str], tool_context: ToolContext
+) -> str:
+    """
+    Executes several independent SQL queries on Google BigQuery at the same
+    time and returns all their results.
+
+    Use it instead of several `execute_bigquery_query_async` calls when the
+    queries do not depend on each other's results, e.g. the same metric for
+    this month and last month: they run as concurrent BigQuery jobs, so the
+    call takes about as long as the slowest query. This is the asynchronous
+    variant of `execute_bigquery_queries`, with the same output; each query
+    is run like by `execute_bigquery_query_async`. At most
+    BQ_BATCH_MAX_QUERIES queries can run in one call, and the result caps are
+    split across them like in `execute_bigquery_queries`.
+
+    Args:
+        sql_queries: The SQL query strings to execute.
+        tool_context: The context object provided by the ADK framework.
+
+    Returns:
+        A compact JSON string with `results`, one object per query in the
+        order given: `query` (its position), `seconds` (its duration) and
+        either `result` (as returned by `execute_bigquery_query_async`) or
+        `error` (the error message). In case the batch cannot run, returns a
+        string with the error message.
+    """
+    logger.info(
+        f"[{DISPLAY_NAME}] --- Starting BigQuery batch of {len(sql_queries)} queries ---"
+    )
+    start_time = time.time()
+    rejection = _check_batch(sql_queries)
+    if rejection is not None:
+        set_attributes(outcome="rejected")
+        return rejection
+    access_token = _get_access_token(tool_context)
+    set_attributes(credential_mode="user" if access_token else "service_account")
+    session = session_key(tool_context)
+    catalog = schema_catalog(tool_context)
+    max_rows, max_bytes = _batch_caps(len(sql_queries))
+
+    outcomes = await asyncio.gather(
+        *(
+            _run_batch_query_async(
+                sql_query,
+                access_token,
+                start_time,
+                session,
+                catalog,
+                max_rows,
+                max_bytes,
+            )
+            for sql_query in sql_queries
         )
+    )
+    return _batch_result(list(outcomes), start_time)
 
-        # On success, return the data as a JSON string
-        return json.dumps(data, indent=2)
 
-    except Exception as e:
-        end_time = time.time()
-        duration = end_time - start_time
-        logger.error(
-            f"[{DISPLAY_NAME}] --- BigQuery query execution failed after {duration:.2f} seconds ---",
-            exc_info=True,  # This automatically adds exception info (like traceback)
+# The optional parameters use typing.Optional: ADK builds the function
+# declaration from the signature and does not parse "list[str] | None".
+@instrumented()
+def analyze_query_result(
+    result_handle: str,
+    tool_context: ToolContext,
+    filters: Optional[list[str]] = None,
+    group_by: Optional[list[str]] = None,
+    aggregations: Optional[list[str]] = None,
+    order_by: Optional[list[str]] = None,
+    columns: Optional[list[str]] = None,
+    limit: Optional[int] = None,
+) -> str:
+    """
+    Analyzes the full result of an earlier query of this conversation
+    locally, without running a new BigQuery query. Use it for follow-up
+    questions that filter, re-group, rank or sort data already fetched.
+
+    The steps run in this order: filters, then group_by with aggregations,
+    then order_by and limit.
+
+    Args:
+        result_handle: The `result_handle` returned with the query result.
+        tool_context: The context object provided by the ADK framework.
+        filters: Conditions all rows must meet, each "<column> <operator>
+            <value>", e.g. "region = 'WEST'", "revenue >= 1000",
+            "status in ('open', 'pending')", "name contains 'pro'" or
+            "discount is null". Operators: =, !=, <, <=, >, >=, in, not in,
+            contains, not contains, is null, is not null.
+        group_by: The columns to group by.
+        aggregations: Per group (or over all rows without group_by), each
+            "<function>(<column>)" with function sum, avg, min, max, median,
+            count or count_distinct, or "count(*)". The output columns are
+            named "<function>_<column>" (e.g. "sum_revenue") or "count".
+        order_by: The columns to sort by, each optionally followed by "asc"
+            or "desc", e.g. "sum_revenue desc".
+        columns: The columns to return when nothing is aggregated.
+        limit: The maximum number of rows to return, e.g. 10 for a top 10.
+
+    Returns:
+        A compact JSON string in the format of the query tool's results,
+        with the `result_handle` it was computed from. In case of an error,
+        returns a string with the error message.
+    """
+    start_time = time.time()
+    session = session_key(tool_context)
+    stored = result_store.get(session, result_handle) if session is not None else None
+    if stored is None:
+        set_attributes(outcome="not_found")
+        return (
+            f"The result '{result_handle}' is no longer available. Run the query again "
+            "(with the needed filters or aggregation) instead."
+        )
+    try:
+        result = analyze_frame(
+            stored.frame,
+            filters=filters,
+            group_by=group_by,
+            aggregations=aggregations,
+            order_by=order_by,
+            columns=columns,
+            limit=limit,
         )
-        # On failure, return the error message as a string
-        return f"An error occurred while executing the BigQuery query: {e}"
+    except (ValueError, TypeError) as e:
+        record_error(e)
+        return f"An error occurred while analyzing the result '{result_handle}': {e}"
 
+    payload, num_rows = serialize_result(
+        [str(column) for column in result.columns], frame_rows(result), len(result)
+    )
+    payload = '{"result_handle":' + _dumps(result_handle) + "," + payload[len(_CACHE_MISS_PREFIX) :]
+    set_attributes(rows=len(result), payload_bytes=len(payload))
+    logger.info(
+        f"[{DISPLAY_NAME}] --- Analyzed result {result_handle} locally ({len(stored.frame)} rows in, {len(result)} rows out, Duration: {time.time() - start_time:.3f} seconds) ---"
+    )
+    return payload
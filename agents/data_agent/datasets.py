@@ -0,0 +1,187 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import contextvars
+import json
+import logging
+import re
+
+import yaml
+
+from .constants import (
+    AGENT_DESCRIPTION,
+    DATA_PROFILES_TABLE_FULL_ID,
+    DATASET_CONFIGS,
+    DATASET_NAME,
+    DISPLAY_NAME,
+    FEW_SHOT_EXAMPLES_TABLE_FULL_ID,
+    LOCATION,
+    PROJECT_ID,
+    TABLE_NAMES,
+)
+
+# --- Logging Configuration ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+class DatasetConfig:
+    """
+    The scope one data agent answers questions about: a BigQuery dataset, the
+    tables in scope, and the tables its data profiles and few-shot examples
+    are read from. Settings left out of a DATASET_CONFIGS entry default to
+    the process-wide ones (PROJECT_ID, BQ_LOCATION, DATA_PROFILES_TABLE_FULL_ID,
+    FEW_SHOT_EXAMPLES_TABLE_FULL_ID), which are filtered by dataset anyway.
+    """
+
+    __slots__ = (
+        "name",
+        "description",
+        "project_id",
+        "location",
+        "dataset_name",
+        "table_names",
+        "data_profiles_table_full_id",
+        "few_shot_examples_table_full_id",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        dataset_name: str | None,
+        description: str = AGENT_DESCRIPTION,
+        project_id: str | None = PROJECT_ID,
+        location: str = LOCATION,
+        table_names: list[str] | None = None,
+        data_profiles_table_full_id: str | None = DATA_PROFILES_TABLE_FULL_ID,
+        few_shot_examples_table_full_id: str | None = FEW_SHOT_EXAMPLES_TABLE_FULL_ID,
+    ):
+        self.name = name
+        self.description = description
+        self.project_id = project_id
+        self.location = location
+        self.dataset_name = dataset_name
+        self.table_names = list(table_names or [])
+        self.data_profiles_table_full_id = data_profiles_table_full_id
+        self.few_shot_examples_table_full_id = few_shot_examples_table_full_id
+
+    def __repr__(self) -> str:
+        return f"DatasetConfig(name={self.name!r}, dataset={self.project_id}.{self.dataset_name})"
+
+    @classmethod
+    def from_dict(cls, entry: dict) -> "DatasetConfig":
+        """
+        Creates a config from a DATASET_CONFIGS entry. Only "dataset_name" is
+        required; "name" (the agent name) defaults to it.
+        """
+        if not entry.get("dataset_name"):
+            raise ValueError(f"Dataset config {entry} has no 'dataset_name'.")
+        table_names = entry.get("table_names") or []
+        if isinstance(table_names, str):
+            table_names = [name.strip() for name in table_names.split(",") if name.strip()]
+        name = entry.get("name") or entry["dataset_name"]
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", name):
+            raise ValueError(
+                f"Dataset config name '{name}' must be a valid identifier (letters, digits and underscores)."
+            )
+        return cls(
+            name=name,
+            dataset_name=entry["dataset_name"],
+            description=entry.get("description") or AGENT_DESCRIPTION,
+            project_id=entry.get("project_id") or PROJECT_ID,
+            location=entry.get("location") or LOCATION,
+            table_names=table_names,
+            data_profiles_table_full_id=entry.get(
+                "data_profiles_table_full_id", DATA_PROFILES_TABLE_FULL_ID
+            ),
+            few_shot_examples_table_full_id=entry.get(
+                "few_shot_examples_table_full_id", FEW_SHOT_EXAMPLES_TABLE_FULL_ID
+            ),
+        )
+
+
+# The dataset of a single-dataset deployment, configured by DATASET_NAME,
+# TABLE_NAMES and the other process-wide settings.
+DEFAULT_DATASET = DatasetConfig(
+    name=DISPLAY_NAME, dataset_name=DATASET_NAME, table_names=TABLE_NAMES
+)
+
+# The dataset the code running in the current context works on.
+_current_dataset: contextvars.ContextVar[DatasetConfig | None] = contextvars.ContextVar(
+    "data_agent_dataset", default=None
+)
+
+
+def current_dataset() -> DatasetConfig:
+    """
+    Returns the dataset the current context works on: the one set with
+    `use_dataset`, or DEFAULT_DATASET. Worker threads started with
+    asyncio.to_thread or `contextvars.copy_context().run` see the same one.
+    """
+    return _current_dataset.get() or DEFAULT_DATASET
+
+
+def dataset_state_key(key: str) -> str:
+    """
+    Returns the session state key the agent of the current dataset keeps a
+    value under. The agents of a multi-dataset deployment share one session,
+    so each of them gets its own keys.
+    """
+    dataset = current_dataset()
+    return key if dataset is DEFAULT_DATASET else f"{key}_{dataset.name}"
+
+
+@contextlib.contextmanager
+def use_dataset(dataset: DatasetConfig):
+    """
+    Makes the context fetchers, the context snapshot and the prompt compiler
+    work on the given dataset within the block.
+    """
+    token = _current_dataset.set(dataset)
+    try:
+        yield dataset
+    finally:
+        _current_dataset.reset(token)
+
+
+def load_dataset_configs(value: str = DATASET_CONFIGS) -> list[DatasetConfig]:
+    """
+    Returns the datasets to serve: those listed in DATASET_CONFIGS (inline
+    JSON, or the path of a YAML or JSON file holding a list of entries), or
+    DEFAULT_DATASET if it is not set.
+    """
+    if not value:
+        return [DEFAULT_DATASET]
+    if value.lstrip().startswith("["):
+        entries = json.loads(value)
+    else:
+        with open(value, "r") as f:
+            entries = yaml.safe_load(f)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("DATASET_CONFIGS must be a non-empty list of dataset configs.")
+
+    configs = [DatasetConfig.from_dict(entry) for entry in entries]
+    names = [config.name for config in configs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"DATASET_CONFIGS has duplicate names: {duplicates}")
+    logger.info(
+        f"[{DISPLAY_NAME}] Loaded {len(configs)} dataset configs: {', '.join(repr(config) for config in configs)}"
+    )
+    return configs
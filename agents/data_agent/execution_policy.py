@@ -0,0 +1,267 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+
+import requests
+from google.api_core import exceptions as api_exceptions
+from google.api_core import retry as api_retry
+
+from .constants import (
+    BQ_HEDGE_ENABLED,
+    BQ_HEDGE_MIN_DELAY_SECONDS,
+    BQ_HEDGE_PERCENTILE,
+    BQ_HEDGE_WINDOW,
+    BQ_RETRY_DEADLINE_SECONDS,
+    BQ_RETRY_INITIAL_SECONDS,
+    BQ_RETRY_MAX_SECONDS,
+    DISPLAY_NAME,
+)
+from .sql_utils import is_read_only_query
+from .telemetry import (
+    bigquery_hedge_errors,
+    bigquery_hedges,
+    bigquery_retries,
+    count_event,
+)
+
+# --- Logging Configuration ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# Errors of a call that may succeed when simply made again.
+_TRANSIENT_ERRORS = (
+    api_exceptions.TooManyRequests,
+    api_exceptions.InternalServerError,
+    api_exceptions.BadGateway,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.GatewayTimeout,
+    ConnectionError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.Timeout,
+)
+# Error reasons BigQuery reports, with a 400 or 403 status as well, for rate
+# limits and backend failures of a call or a query job.
+_TRANSIENT_REASONS = frozenset(
+    {
+        "backendError",
+        "internalError",
+        "jobBackendError",
+        "jobInternalError",
+        "jobRateLimitExceeded",
+        "rateLimitExceeded",
+    }
+)
+# Queueing times observed before the hedge delay follows their percentile.
+_HEDGE_MIN_SAMPLES = 20
+
+
+def error_reasons(error: Exception) -> set[str]:
+    """
+    Returns the reasons of the errors BigQuery reported with an API error.
+    """
+    return {
+        item.get("reason")
+        for item in getattr(error, "errors", None) or []
+        if isinstance(item, dict)
+    }
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Classifies an error of a BigQuery call or query job: 429 and 5xx
+    responses, connection failures and errors with a rate-limit or backend
+    reason are transient and worth retrying; everything else (invalid SQL,
+    permissions, quota exceeded, ...) is not.
+    """
+    if isinstance(error, api_exceptions.RetryError) and error.cause is not None:
+        error = error.cause
+    if isinstance(error, _TRANSIENT_ERRORS):
+        return True
+    return bool(error_reasons(error) & _TRANSIENT_REASONS)
+
+
+def _on_retry(error: Exception) -> None:
+    logger.warning(f"[{DISPLAY_NAME}] Retrying BigQuery after a transient error: {error}")
+    count_event("retries", bigquery_retries)
+
+
+def retry_policy(deadline: float = BQ_RETRY_DEADLINE_SECONDS) -> api_retry.Retry:
+    """
+    Returns the retry policy of BigQuery calls, to pass as `retry`: transient
+    errors are retried with exponential backoff and full jitter (each delay
+    is drawn uniformly up to a bound doubling from BQ_RETRY_INITIAL_SECONDS
+    to BQ_RETRY_MAX_SECONDS) until `deadline` seconds have passed. Each
+    retry is counted on the current operation.
+    """
+    return api_retry.Retry(
+        predicate=is_retryable,
+        initial=BQ_RETRY_INITIAL_SECONDS,
+        maximum=BQ_RETRY_MAX_SECONDS,
+        multiplier=2.0,
+        timeout=max(deadline, 0),
+        on_error=_on_retry,
+    )
+
+
+# The policy of calls without a deadline of their own, e.g. the context fetchers.
+BIGQUERY_RETRY = retry_policy()
+
+
+def retry_within(deadline: float | None = None) -> api_retry.Retry:
+    """
+    Returns the retry policy of a call made for a caller with a deadline of
+    its own.
+    Args:
+        deadline: Seconds left to the caller's own deadline, if it has one;
+            retries stop then, or after BQ_RETRY_DEADLINE_SECONDS if sooner.
+    """
+    if deadline is None or deadline >= BQ_RETRY_DEADLINE_SECONDS:
+        return BIGQUERY_RETRY
+    return retry_policy(deadline)
+
+
+def query_retry_kwargs(deadline: float | None = None) -> dict:
+    """
+    Returns the `retry` and `job_retry` arguments of `Client.query`, for a
+    caller with `deadline` seconds left (see `retry_within`). With
+    `job_retry`, a job that fails with a transient error is submitted again
+    as a new job by `QueryJob.result`.
+    """
+    policy = retry_within(deadline)
+    return {"retry": policy, "job_retry": policy}
+
+
+# Recent queueing times (creation to start) of query jobs, in seconds.
+_queue_seconds: deque[float] = deque(maxlen=BQ_HEDGE_WINDOW)
+_queue_seconds_lock = threading.Lock()
+
+
+def record_queue_time(query_job) -> None:
+    """
+    Records how long a finished query job was queued before it started.
+    """
+    created = getattr(query_job, "created", None)
+    started = getattr(query_job, "started", None)
+    if created is None or started is None:
+        return
+    with _queue_seconds_lock:
+        _queue_seconds.append(max((started - created).total_seconds(), 0.0))
+
+
+def hedge_delay() -> float:
+    """
+    Returns how long the job of a read-only query may stay queued before a
+    duplicate is submitted: the BQ_HEDGE_PERCENTILE of recent queueing
+    times, and at least BQ_HEDGE_MIN_DELAY_SECONDS.
+    """
+    with _queue_seconds_lock:
+        samples = sorted(_queue_seconds)
+    if len(samples) < _HEDGE_MIN_SAMPLES:
+        return BQ_HEDGE_MIN_DELAY_SECONDS
+    index = min(int(len(samples) * BQ_HEDGE_PERCENTILE / 100), len(samples) - 1)
+    return max(samples[index], BQ_HEDGE_MIN_DELAY_SECONDS)
+
+
+def hedges_query(sql_query: str) -> bool:
+    """
+    Returns True if the job of a query may be hedged: hedging is enabled and
+    the query is read-only, so running it twice has no effect.
+    """
+    return BQ_HEDGE_ENABLED and is_read_only_query(sql_query)
+
+
+class HedgedJob:
+    """
+    Waits for the job of a query, and for a duplicate of it submitted once the
+    first is still queued after `hedge_delay()`. The first job to succeed wins
+    and the other one is cancelled; a job that failed only wins once the
+    other one is done too.
+    Args:
+        query_job: The submitted job.
+        submit: Submits a duplicate job of the same query, or returns None
+            when no duplicate may run now (e.g. no job slot is free).
+        hedge: Whether a duplicate may be submitted (see `hedges_query`).
+    """
+
+    def __init__(self, query_job, submit: Callable[[], object], hedge: bool):
+        self.jobs = [query_job]
+        self._submit = submit
+        self._hedge_at = time.monotonic() + hedge_delay() if hedge else None
+
+    def poll(self):
+        """
+        Checks the jobs once, submitting the duplicate when it is due. Makes
+        blocking API calls.
+        Returns:
+            The first job that succeeded, or the first job if all of them
+            failed, or None while any is still running and none succeeded.
+        """
+        all_done = True
+        for query_job in self.jobs:
+            if not query_job.done():
+                all_done = False
+            elif query_job.error_result is None:
+                self.cancel_others(query_job)
+                return query_job
+        if all_done:
+            return self.jobs[0]
+        if self._hedge_at is not None and time.monotonic() >= self._hedge_at:
+            self._hedge_at = None
+            first_job = self.jobs[0]
+            if getattr(first_job, "state", None) == "PENDING":
+                try:
+                    duplicate_job = self._submit()
+                except Exception as e:
+                    # The duplicate is only an optimization: keep waiting for the first job.
+                    count_event("hedge_errors", bigquery_hedge_errors)
+                    logger.warning(
+                        f"[{DISPLAY_NAME}] BigQuery job {first_job.job_id} still queued; could not submit a duplicate job. Error: {e}"
+                    )
+                    return None
+                if duplicate_job is None:
+                    logger.info(
+                        f"[{DISPLAY_NAME}] BigQuery job {first_job.job_id} still queued; no slot free for a duplicate job."
+                    )
+                    return None
+                self.jobs.append(duplicate_job)
+                count_event("hedges", bigquery_hedges)
+                logger.info(
+                    f"[{DISPLAY_NAME}] BigQuery job {first_job.job_id} still queued; submitted duplicate job {duplicate_job.job_id}."
+                )
+        return None
+
+    def cancel_others(self, keep=None) -> None:
+        """
+        Cancels the jobs other than `keep` (by default the first one).
+        """
+        keep = keep if keep is not None else self.jobs[0]
+        for query_job in self.jobs:
+            if query_job is keep:
+                continue
+            try:
+                query_job.cancel()
+            except Exception as e:
+                logger.warning(
+                    f"[{DISPLAY_NAME}] Could not cancel BigQuery job {query_job.job_id}. Error: {e}"
+                )
@@ -0,0 +1,187 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import time
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.readonly_context import ReadonlyContext
+
+from .constants import (
+    CONTEXT_CACHE_DIR,
+    CONTEXT_CACHE_ENABLED,
+    DISPLAY_NAME,
+    FEW_SHOT_MAX_TOKENS,
+    FEW_SHOT_TOP_K,
+)
+from .datasets import dataset_state_key
+from .prompt_compiler import estimate_tokens
+from .telemetry import instrumented, set_attributes
+from .text_index import BM25Index
+
+# --- Logging Configuration ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# Bump whenever the shape of the pickled index changes.
+INDEX_VERSION = 1
+# Session state key holding the few-shot examples selected for the current turn.
+FEW_SHOT_STATE_KEY = "retrieved_few_shot_examples"
+# Marks where the selected examples go in an instruction built in static mode.
+FEW_SHOT_PLACEHOLDER = "{few_shot_examples}"
+
+
+def user_text(content) -> str:
+    """
+    Returns the text of a user message.
+    """
+    if content is None or not content.parts:
+        return ""
+    return " ".join(part.text for part in content.parts if part.text)
+
+
+class FewShotIndex:
+    """
+    A BM25 index over the few-shot examples, used to pick the examples most
+    similar to each question instead of sending all of them.
+
+    The index is persisted under CONTEXT_CACHE_DIR, keyed by the content of the
+    examples, so restarts with the same examples skip the build. Building (or
+    loading) the index and each selection are recorded as operations in the
+    telemetry (`build_few_shot_index`, `select_few_shot_examples`).
+    """
+
+    def __init__(self, examples: list[str]):
+        start_time = time.time()
+        self.examples = examples
+        self._token_counts = [estimate_tokens(example) for example in examples]
+        self._index, loaded_from_disk = self._load_or_build()
+        logger.info(
+            f"[{DISPLAY_NAME}] --- {'Loaded' if loaded_from_disk else 'Built'} few-shot example index over {len(examples)} examples (Duration: {time.time() - start_time:.3f} seconds) ---"
+        )
+
+    def _index_path(self) -> str:
+        digest = hashlib.sha256()
+        digest.update(str(INDEX_VERSION).encode("utf-8"))
+        for example in self.examples:
+            digest.update(b"\0" + example.encode("utf-8"))
+        return os.path.join(
+            CONTEXT_CACHE_DIR, f"few-shot-index-{digest.hexdigest()[:16]}.pkl"
+        )
+
+    @instrumented("build_few_shot_index")
+    def _load_or_build(self) -> tuple[BM25Index, bool]:
+        set_attributes(rows=len(self.examples), loaded_from_disk=False)
+        if not CONTEXT_CACHE_ENABLED or not self.examples:
+            return BM25Index(self.examples), False
+        path = self._index_path()
+        try:
+            with open(path, "rb") as f:
+                index = pickle.load(f)
+            if index.num_documents == len(self.examples):
+                set_attributes(loaded_from_disk=True)
+                return index, True
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(
+                f"[{DISPLAY_NAME}] Could not read few-shot example index {path}. Rebuilding it. Error: {e}"
+            )
+
+        index = BM25Index(self.examples)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(
+                f"[{DISPLAY_NAME}] Could not save few-shot example index to {path}: {e}"
+            )
+        return index, False
+
+    @instrumented("select_few_shot_examples")
+    def select(
+        self,
+        question: str,
+        k: int = FEW_SHOT_TOP_K,
+        max_tokens: int = FEW_SHOT_MAX_TOKENS,
+    ) -> list[int]:
+        """
+        Returns the indexes of the (at most) k examples most similar to the
+        question, most similar first, leaving out examples that would take the
+        selection over max_tokens estimated tokens (0 for no limit).
+        """
+        selected = []
+        total_tokens = 0
+        for i in self._index.top(question, k):
+            if max_tokens and total_tokens + self._token_counts[i] > max_tokens:
+                continue
+            selected.append(i)
+            total_tokens += self._token_counts[i]
+        return selected
+
+    def render(self, selected: list[int]) -> str:
+        """
+        Returns the few-shot examples section for the selected examples.
+        """
+        if not selected:
+            return "No few-shot example is similar to this question."
+        return "\n\n---\n\n".join(
+            self.examples[i] for i in selected if i < len(self.examples)
+        )
+
+    async def before_agent_callback(self, callback_context: CallbackContext):
+        """
+        Selects the few-shot examples for the user's message once per turn and
+        keeps them in the session state. When no example matches (e.g. "yes,
+        last month"), the examples of the previous turn are kept.
+        """
+        question = user_text(callback_context.user_content)
+        if question:
+            start_time = time.time()
+            selected = self.select(question)
+            if selected:
+                callback_context.state[dataset_state_key(FEW_SHOT_STATE_KEY)] = selected
+            logger.info(
+                f"[{DISPLAY_NAME}] Selected {len(selected)} few-shot examples in {(time.time() - start_time) * 1000:.1f} ms."
+            )
+        return None
+
+
+class FewShotInstruction:
+    """
+    The instruction provider of the agent in static mode: a fixed instruction
+    whose few-shot examples section holds the examples selected for the
+    current turn.
+    """
+
+    def __init__(self, instruction: str, few_shot_index: FewShotIndex):
+        self._instruction = instruction
+        self._few_shot_index = few_shot_index
+
+    def __call__(self, readonly_context: ReadonlyContext) -> str:
+        selected = readonly_context.state.get(dataset_state_key(FEW_SHOT_STATE_KEY)) or []
+        return self._instruction.replace(
+            FEW_SHOT_PLACEHOLDER, self._few_shot_index.render(selected)
+        )
@@ -12,20 +12,35 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import datetime
-import json
+import contextvars
+import functools
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 
 import yaml
 
-from .constants import DATASET_NAME, DISPLAY_NAME, PROJECT_ID, TABLE_NAMES
+from .constants import (
+    CONTEXT_CACHE_ENABLED,
+    CONTEXT_FETCH_MAX_WORKERS,
+    CONTEXT_FETCH_TIMEOUT_SECONDS,
+    CONTEXT_REFRESH_INTERVAL_SECONDS,
+    DISPLAY_NAME,
+)
+from .context_cache import load_context_snapshot, save_context_snapshot
+from .datasets import DatasetConfig, current_dataset
+from .prompt_compiler import compile_context_sections, estimate_tokens
+from .telemetry import instrumented, set_attributes
 from .utils import (
     fetch_bigquery_data_profiles,
+    fetch_context_freshness,
     fetch_dataset_description,
     fetch_few_shot_examples,
     fetch_sample_data_for_tables,
     fetch_table_entry_metadata,
+    fetch_table_schemas,
 )
 
 # --- Logging Configuration ---
@@ -37,126 +52,140 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def json_serial_default(obj):
-    """JSON serializer for objects not serializable by default json code"""
-    if isinstance(obj, (datetime.date, datetime.datetime)):
-        return obj.isoformat()
-    raise TypeError(f"Type {type(obj)} not serializable")
+def timed_fetch(fetch_fn, *args, **kwargs):
+    """
+    Calls a context fetcher. Returns its result and how long it took, in seconds.
+    """
+    start_time = time.time()
+    return fetch_fn(*args, **kwargs), time.time() - start_time
 
 
-def return_instructions_bigquery() -> str:
+def fetch_instruction_context() -> dict:
     """
-    Fetches table metadata, data profiles (and conditionally sample data),
-    formats them, and injects them into the main instruction template.
+    Fetches the raw context used to build the instruction: the dataset
+    description, Dataplex table metadata, INFORMATION_SCHEMA table schemas,
+    data profiles (or sample data when profiles are unavailable) and few-shot
+    examples. When the context is cached or refreshed, its change signals
+    (see `fetch_context_freshness`) are fetched alongside, as "freshness".
+
+    The sources are fetched concurrently on a bounded executor. A source that
+    fails or misses its deadline (CONTEXT_FETCH_TIMEOUT_SECONDS after it was
+    submitted, so the sample data fallback gets its own) is left empty, so it
+    renders as "not available" without holding up the others.
     """
-    dataset_description = fetch_dataset_description()
-    dataset_description_string_for_prompt = (
-        dataset_description
-        if dataset_description
-        else "Dataset description is not available."
+    start_time = time.time()
+    fetchers = {
+        "dataset_description": (fetch_dataset_description, "", {}),
+        "table_metadata": (fetch_table_entry_metadata, [], {}),
+        "table_schemas": (fetch_table_schemas, [], {}),
+        "data_profiles": (fetch_bigquery_data_profiles, [], {}),
+        "few_shot_examples": (fetch_few_shot_examples, [], {}),
+    }
+    if CONTEXT_CACHE_ENABLED or CONTEXT_REFRESH_INTERVAL_SECONDS > 0:
+        fetchers["freshness"] = (fetch_context_freshness, None, {})
+    sample_data_fetcher = (fetch_sample_data_for_tables, [], {"num_rows": 3})
+    # Without a profiles table the sample data fallback is certain, so start it right away.
+    if not current_dataset().data_profiles_table_full_id:
+        fetchers["sample_data"] = sample_data_fetcher
+
+    context = {"sample_data": []}
+    fetch_timings = {}
+    executor = ThreadPoolExecutor(
+        max_workers=CONTEXT_FETCH_MAX_WORKERS, thread_name_prefix="context-fetch"
     )
 
-    table_metadata_raw = fetch_table_entry_metadata()
-    if not table_metadata_raw:
-        table_metadata_string_for_prompt = "Table metadata information is not available."
-    else:
-        formatted_metadata = []
-        for metadata in table_metadata_raw:
-            try:
-                metadata_str = json.dumps(
-                    metadata, indent=2, ensure_ascii=False, default=json_serial_default
-                )
-                formatted_metadata.append(
-                    f"**Table Entry Metadata:**\n```json\n{metadata_str}\n```"
-                )
-            except TypeError as e:
-                logger.warning(
-                    f"[{DISPLAY_NAME}] Could not serialize table metadata: {e}"
-                )
-                formatted_metadata.append(
-                    "Table metadata contains non-serializable data."
-                )
-        table_metadata_string_for_prompt = "\n\n---\n\n".join(formatted_metadata)
-
-    data_profiles_raw = fetch_bigquery_data_profiles()
-    if data_profiles_raw:
-        formatted_profiles = []
-        for profile in data_profiles_raw:
-            try:
-                profile_str = json.dumps(
-                    profile, indent=2, ensure_ascii=False, default=json_serial_default
-                )
-            except TypeError as e:
-                logger.warning(
-                    f"[{DISPLAY_NAME}] Could not serialize profile part: {e}. Profile: {profile}"
-                )
-                profile_str = f"Profile for column '{profile.get('column_name')}' in table '{profile.get('source_table_id')}' contains non-serializable data."
-            column_key = profile.get("column_name")
-            table_key = profile.get("source_table_id")
-            formatted_profiles.append(
-                f"Data profile for column '{column_key}' in table '{table_key}':\n{profile_str}"
-            )
-        data_profiles_string_for_prompt = "\n\n---\n\n".join(formatted_profiles)
-        samples_string_for_prompt = "Full data profiles are provided; sample data section is omitted for brevity."
-    else:
-        logger.info(
-            f"[{DISPLAY_NAME}] Data profiles not found. Attempting to fetch sample data..."
+    def submit(source):
+        fetch_fn, _, kwargs = fetchers[source]
+        # Run in a copy of this context, so the fetcher spans are children of this one.
+        future = executor.submit(
+            contextvars.copy_context().run, timed_fetch, fetch_fn, **kwargs
         )
-        data_profiles_string_for_prompt = "Data profile information is not available. Please refer to the sample data below."
-        sample_data_raw = fetch_sample_data_for_tables(num_rows=3)
-        if sample_data_raw:
-            formatted_samples = []
-            for item in sample_data_raw:
-                try:
-                    sample_rows_str = json.dumps(
-                        item["sample_rows"],
-                        indent=2,
-                        ensure_ascii=False,
-                        default=json_serial_default,
-                    )
-                except TypeError as e:
-                    logger.warning(
-                        f"[{DISPLAY_NAME}] Could not serialize sample_rows for table {item.get('table_name')}: {e}."
-                    )
-                    sample_rows_str = f"Sample rows for table {item.get('table_name')} contain non-serializable data."
-                formatted_samples.append(
-                    f"**Sample Data for table `{item['table_name']}` (first {len(item.get('sample_rows',[]))} rows):**\n```json\n{sample_rows_str}\n```"
-                )
-            samples_string_for_prompt = "\n\n---\n\n".join(formatted_samples)
-        else:
+        return future, time.time() + CONTEXT_FETCH_TIMEOUT_SECONDS
+
+    def collect(source, submitted):
+        future, deadline = submitted
+        _, default, _ = fetchers[source]
+        remaining = max(0.0, deadline - time.time())
+        try:
+            context[source], fetch_timings[source] = future.result(timeout=remaining)
+        except FuturesTimeoutError:
+            future.cancel()
             logger.warning(
-                f"[{DISPLAY_NAME}] Could not fetch sample data for the target scope: {PROJECT_ID}.{DATASET_NAME} (Tables: {TABLE_NAMES if TABLE_NAMES else 'All'})."
+                f"[{DISPLAY_NAME}] Fetching '{source}' did not finish within {CONTEXT_FETCH_TIMEOUT_SECONDS} seconds. Continuing without it."
+            )
+            context[source], fetch_timings[source] = default, None
+        except Exception as e:
+            logger.error(
+                f"[{DISPLAY_NAME}] Fetching '{source}' failed. Continuing without it. Error: {e}",
+                exc_info=True,
             )
-            samples_string_for_prompt = f"Could not fetch sample data for the target scope: {PROJECT_ID}.{DATASET_NAME} (Tables: {TABLE_NAMES if TABLE_NAMES else 'All'})."
+            context[source], fetch_timings[source] = default, None
+
+    try:
+        futures = {source: submit(source) for source in fetchers}
+        collect("data_profiles", futures.pop("data_profiles"))
+        if not context["data_profiles"] and "sample_data" not in futures:
+            logger.info(
+                f"[{DISPLAY_NAME}] Data profiles not found. Attempting to fetch sample data..."
+            )
+            fetchers["sample_data"] = sample_data_fetcher
+            futures["sample_data"] = submit("sample_data")
+        elif context["data_profiles"] and "sample_data" in futures:
+            futures.pop("sample_data")[0].cancel()
+        for source, submitted in futures.items():
+            collect(source, submitted)
+    finally:
+        # Do not wait for fetches that missed their deadline.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if context["data_profiles"]:
+        context["sample_data"] = []
+    context["fetch_timings"] = fetch_timings
+
+    duration = time.time() - start_time
+    timings_str = ", ".join(
+        f"{source}={timing:.2f}s" if timing is not None else f"{source}=unavailable"
+        for source, timing in fetch_timings.items()
+    )
+    logger.info(
+        f"[{DISPLAY_NAME}] --- Fetched instruction context (Duration: {duration:.2f} seconds; {timings_str}) ---"
+    )
+    return context
+
+
+@instrumented()
+def load_instruction_context() -> dict:
+    """
+    Returns the instruction context from the on-disk snapshot cache when a
+    valid snapshot exists, or fetches it and saves it to the cache.
+    """
+    context = load_context_snapshot()
+    set_attributes(from_snapshot=context is not None)
+    if context is None:
+        context = fetch_instruction_context()
+        save_context_snapshot(context)
+    return context
 
-    few_shot_examples_raw = fetch_few_shot_examples()
-    if few_shot_examples_raw:
-        # The examples are already formatted as strings, so we just join them.
-        few_shot_examples_string_for_prompt = "\n\n---\n\n".join(few_shot_examples_raw)
-    else:
-        few_shot_examples_string_for_prompt = "Few-shot examples are not available for this dataset."
 
+def return_instructions_bigquery() -> str:
+    """
+    Fetches table metadata, data profiles (and conditionally sample data),
+    formats them, and injects them into the main instruction template.
+
+    The fetched context is served from the on-disk snapshot cache when a valid
+    snapshot exists, and saved to it after a fresh fetch.
+    """
+    return build_instruction_from_context(load_instruction_context())
+
+
+# Read once and shared by the instructions of all datasets.
+@functools.lru_cache(maxsize=1)
+def _load_instructions_yaml() -> dict:
     script_dir = os.path.dirname(os.path.abspath(__file__))
     yaml_file_path = os.path.join(script_dir, "instructions.yaml")
     try:
         with open(yaml_file_path, "r") as f:
-            instructions_yaml = yaml.safe_load(f)
-            instruction_template_from_yaml = "\n".join(
-                [
-                    instructions_yaml.get("overall_workflow", ""),
-                    instructions_yaml.get("bigquery_data_schema_and_context", ""),
-                    instructions_yaml.get("table_schema_and_join_information", ""),
-                    instructions_yaml.get("critical_joining_logic_and_context", ""),
-                    instructions_yaml.get("data_profile_information", ""),
-                    instructions_yaml.get("sample_data", ""),
-                    instructions_yaml.get("few_shot_examples", ""),
-                ]
-            )
-            if not instruction_template_from_yaml.strip():
-                logger.error(
-                    f"[{DISPLAY_NAME}] Instruction template loaded from YAML is empty."
-                )
-                raise ValueError("Instruction template loaded from YAML is empty.")
+            return yaml.safe_load(f)
     except FileNotFoundError:
         logger.error(f"[{DISPLAY_NAME}] instructions.yaml not found.")
         raise
@@ -164,11 +193,52 @@ def return_instructions_bigquery() -> str:
         logger.error(f"[{DISPLAY_NAME}] Error loading instructions.yaml: {e}")
         raise
 
-    final_instruction = instruction_template_from_yaml.format(
-        dataset_description=dataset_description_string_for_prompt,
-        table_metadata=table_metadata_string_for_prompt,
-        data_profiles=data_profiles_string_for_prompt,
-        samples=samples_string_for_prompt,
-        few_shot_examples=few_shot_examples_string_for_prompt,
+
+def build_routing_instruction(datasets: list[DatasetConfig]) -> str:
+    """
+    Returns the instruction of the root agent of a multi-dataset deployment,
+    which transfers each question to the agent of the dataset it is about.
+    """
+    dataset_lines = "\n".join(
+        f"* `{dataset.name}` (BigQuery dataset `{dataset.project_id}.{dataset.dataset_name}`): {dataset.description}"
+        for dataset in datasets
+    )
+    return _load_instructions_yaml()["dataset_routing"].format(datasets=dataset_lines)
+
+
+def build_instruction_from_context(context: dict) -> str:
+    """
+    Formats the fetched context and injects it into the main instruction
+    template. The context is rendered compactly, at the richest level of
+    detail that fits PROMPT_TOKEN_BUDGET, and the estimated tokens of each
+    section are logged.
+    """
+    sections, token_counts, detail_level = compile_context_sections(context)
+
+    instructions_yaml = _load_instructions_yaml()
+    instruction_template_from_yaml = "\n".join(
+        [
+            instructions_yaml.get("overall_workflow", ""),
+            instructions_yaml.get("bigquery_data_schema_and_context", ""),
+            instructions_yaml.get("table_schema_and_join_information", ""),
+            instructions_yaml.get("critical_joining_logic_and_context", ""),
+            instructions_yaml.get("data_profile_information", ""),
+            instructions_yaml.get("sample_data", ""),
+            instructions_yaml.get("few_shot_examples", ""),
+        ]
+    )
+    if not instruction_template_from_yaml.strip():
+        logger.error(
+            f"[{DISPLAY_NAME}] Instruction template loaded from YAML is empty."
+        )
+        raise ValueError("Instruction template loaded from YAML is empty.")
+
+    final_instruction = instruction_template_from_yaml.format(**sections)
+
+    total_tokens = estimate_tokens(final_instruction)
+    token_counts["template"] = total_tokens - sum(token_counts.values())
+    tokens_str = ", ".join(f"{section}={tokens}" for section, tokens in token_counts.items())
+    logger.info(
+        f"[{DISPLAY_NAME}] --- Built instruction of about {total_tokens} tokens (Detail level: {detail_level}; {tokens_str}) ---"
     )
     return final_instruction
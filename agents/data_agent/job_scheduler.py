@@ -0,0 +1,316 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+from .constants import (
+    BQ_ADMISSION_MAX_QUEUED,
+    BQ_ADMISSION_MAX_WAIT_SECONDS,
+    BQ_MAX_CONCURRENT_JOBS,
+    BQ_MAX_CONCURRENT_JOBS_PER_PRINCIPAL,
+    BQ_QUERY_TIMEOUT_SECONDS,
+    DISPLAY_NAME,
+)
+from .telemetry import bigquery_admission_wait, set_attributes
+
+# --- Logging Configuration ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a query job is not admitted: too many queries are already
+    waiting, or no slot freed up in time.
+    """
+
+
+class _Waiter:
+    """
+    A caller waiting for a slot, woken up through an event (threads) or a
+    future of its event loop (coroutines).
+    """
+
+    __slots__ = ("principal", "granted", "event", "future", "loop")
+
+    def __init__(self, principal: str, loop: asyncio.AbstractEventLoop | None = None):
+        self.principal = principal
+        self.granted = False
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+
+    def grant(self) -> None:
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class JobScheduler:
+    """
+    Admission control of BigQuery query jobs. At most `max_concurrent` jobs
+    run at once, and at most `max_per_principal` per principal (0 for no
+    limit). Callers beyond the limits wait in a queue per principal, and a
+    freed slot goes to the next principal, in round-robin order, that may run
+    another job, so one principal with many queued queries does not hold up
+    the others. Once `max_queued` callers wait, new ones are rejected right
+    away.
+    """
+
+    def __init__(self, max_concurrent: int, max_per_principal: int, max_queued: int):
+        self._max_concurrent = max_concurrent
+        self._max_per_principal = max_per_principal
+        self._max_queued = max_queued
+        self._lock = threading.Lock()
+        self._running = 0
+        self._running_per_principal: dict[str, int] = {}
+        # Principal -> its waiters in arrival order; principals in round-robin order.
+        self._queues: OrderedDict[str, deque[_Waiter]] = OrderedDict()
+        self._queued = 0
+
+    def _may_start(self, principal: str) -> bool:
+        return (not self._max_concurrent or self._running < self._max_concurrent) and (
+            not self._max_per_principal
+            or self._running_per_principal.get(principal, 0) < self._max_per_principal
+        )
+
+    def _start(self, principal: str) -> None:
+        self._running += 1
+        self._running_per_principal[principal] = self._running_per_principal.get(principal, 0) + 1
+
+    def _dispatch(self) -> None:
+        """
+        Grants free slots to waiters, one principal at a time in round-robin
+        order. Called with the lock held.
+        """
+        while self._queued:
+            principal = next(
+                (principal for principal in self._queues if self._may_start(principal)), None
+            )
+            if principal is None:
+                return
+            queue = self._queues.pop(principal)
+            waiter = queue.popleft()
+            self._queued -= 1
+            if queue:
+                # The principal goes to the back of the round.
+                self._queues[principal] = queue
+            self._start(principal)
+            waiter.grant()
+
+    def _admit_or_enqueue(
+        self, principal: str, loop: asyncio.AbstractEventLoop | None = None
+    ) -> _Waiter | None:
+        """
+        Admits the caller right away if a slot is free and none of its
+        earlier queries wait, or queues it.
+        Returns:
+            None if admitted, otherwise the queued waiter.
+        Raises:
+            AdmissionRejected: If `max_queued` callers already wait.
+        """
+        with self._lock:
+            if principal not in self._queues and self._may_start(principal):
+                self._start(principal)
+                return None
+            if self._max_queued and self._queued >= self._max_queued:
+                raise AdmissionRejected(f"{self._queued} queries are already waiting")
+            waiter = _Waiter(principal, loop)
+            self._queues.setdefault(principal, deque()).append(waiter)
+            self._queued += 1
+            return waiter
+
+    def _withdraw(self, waiter: _Waiter) -> bool:
+        """
+        Removes a waiter that gave up from its queue.
+        Returns:
+            True if it was granted a slot in the meantime, which it now holds.
+        """
+        with self._lock:
+            if waiter.granted:
+                return True
+            queue = self._queues[waiter.principal]
+            queue.remove(waiter)
+            self._queued -= 1
+            if not queue:
+                del self._queues[waiter.principal]
+            return False
+
+    def try_acquire(self, principal: str) -> bool:
+        """
+        Takes a slot to run a job as `principal` if one is free right away
+        and none of its earlier queries wait, without waiting.
+        Returns:
+            True if a slot was taken.
+        """
+        with self._lock:
+            if principal in self._queues or not self._may_start(principal):
+                return False
+            self._start(principal)
+            return True
+
+    def acquire(self, principal: str, timeout: float) -> None:
+        """
+        Waits, blocking, for a slot to run a job as `principal`.
+        Raises:
+            AdmissionRejected: If too many queries wait, or no slot is
+                granted within `timeout` seconds.
+        """
+        waiter = self._admit_or_enqueue(principal)
+        if waiter is not None and not waiter.event.wait(max(timeout, 0)):
+            if not self._withdraw(waiter):
+                raise AdmissionRejected(f"no slot freed up within {timeout:.1f} seconds")
+
+    async def acquire_async(self, principal: str, timeout: float) -> None:
+        """
+        Waits, without blocking the event loop, for a slot to run a job as
+        `principal`.
+        Raises:
+            AdmissionRejected: If too many queries wait, or no slot is
+                granted within `timeout` seconds.
+        """
+        waiter = self._admit_or_enqueue(principal, asyncio.get_running_loop())
+        if waiter is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), max(timeout, 0))
+        except asyncio.TimeoutError:
+            if not self._withdraw(waiter):
+                raise AdmissionRejected(f"no slot freed up within {timeout:.1f} seconds")
+        except asyncio.CancelledError:
+            if self._withdraw(waiter):
+                self.release(principal)
+            raise
+
+    def release(self, principal: str) -> None:
+        """
+        Frees the slot of a job of `principal` that finished or was cancelled.
+        """
+        with self._lock:
+            self._running -= 1
+            self._running_per_principal[principal] -= 1
+            if not self._running_per_principal[principal]:
+                del self._running_per_principal[principal]
+            self._dispatch()
+
+    def stats(self) -> dict:
+        """
+        Returns the number of running and waiting jobs, in total and per principal.
+        """
+        with self._lock:
+            return {
+                "running": self._running,
+                "queued": self._queued,
+                "running_per_principal": dict(self._running_per_principal),
+                "queued_per_principal": {
+                    principal: len(queue) for principal, queue in self._queues.items()
+                },
+            }
+
+
+job_scheduler = JobScheduler(
+    max_concurrent=BQ_MAX_CONCURRENT_JOBS,
+    max_per_principal=BQ_MAX_CONCURRENT_JOBS_PER_PRINCIPAL,
+    max_queued=BQ_ADMISSION_MAX_QUEUED,
+)
+
+
+def _admission_timeout(start_time: float) -> float:
+    """
+    Returns how long a query may wait for admission: BQ_ADMISSION_MAX_WAIT_SECONDS,
+    and never past the deadline of the tool call started at `start_time`.
+    """
+    remaining = BQ_QUERY_TIMEOUT_SECONDS - (time.time() - start_time)
+    return min(BQ_ADMISSION_MAX_WAIT_SECONDS, remaining)
+
+
+def _record_admission(principal: str, wait_start: float, outcome: str) -> None:
+    waited = time.monotonic() - wait_start
+    set_attributes(admission_wait_seconds=round(waited, 3))
+    bigquery_admission_wait.record(waited, {"outcome": outcome})
+    if outcome == "rejected":
+        logger.warning(
+            f"[{DISPLAY_NAME}] BigQuery job of {principal} not admitted after {waited:.2f} seconds. Scheduler: {job_scheduler.stats()}"
+        )
+    elif waited >= 1:
+        logger.info(
+            f"[{DISPLAY_NAME}] BigQuery job of {principal} admitted after waiting {waited:.2f} seconds."
+        )
+
+
+def acquire_job_slot(principal: str, start_time: float) -> None:
+    """
+    Waits for the job scheduler to admit a query job of `principal`, for at
+    most BQ_ADMISSION_MAX_WAIT_SECONDS. The wait is recorded on the current
+    operation and in the data_agent.bigquery.admission_wait histogram.
+    Release the slot with `release_job_slot` once the job is done.
+    Args:
+        principal: The identity the job runs as (see `principal_for_token`).
+        start_time: When the tool call started; the wait ends by its deadline.
+    Raises:
+        AdmissionRejected: If the job is not admitted.
+    """
+    wait_start = time.monotonic()
+    try:
+        job_scheduler.acquire(principal, _admission_timeout(start_time))
+    except AdmissionRejected:
+        _record_admission(principal, wait_start, "rejected")
+        raise
+    _record_admission(principal, wait_start, "admitted")
+
+
+async def acquire_job_slot_async(principal: str, start_time: float) -> None:
+    """
+    Like `acquire_job_slot`, without blocking the event loop.
+    """
+    wait_start = time.monotonic()
+    try:
+        await job_scheduler.acquire_async(principal, _admission_timeout(start_time))
+    except AdmissionRejected:
+        _record_admission(principal, wait_start, "rejected")
+        raise
+    _record_admission(principal, wait_start, "admitted")
+
+
+def try_acquire_job_slot(principal: str) -> bool:
+    """
+    Takes a slot for an extra query job of `principal`, e.g. a hedged
+    duplicate, only if one is free right away.
+    Returns:
+        True if a slot was taken; release it with `release_job_slot`.
+    """
+    return job_scheduler.try_acquire(principal)
+
+
+def release_job_slot(principal: str) -> None:
+    """
+    Frees the slot of a query job of `principal` once it is done, failed or
+    was cancelled, admitting the next waiting query, if any.
+    """
+    job_scheduler.release(principal)
@@ -0,0 +1,291 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+import threading
+import time
+import weakref
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.readonly_context import ReadonlyContext
+
+from .constants import (
+    AGENT_WARMUP_ENABLED,
+    CONTEXT_REFRESH_INTERVAL_SECONDS,
+    DISPLAY_NAME,
+    INSTRUCTION_MODE,
+)
+from .context_refresh import refresh_context
+from .datasets import DEFAULT_DATASET, DatasetConfig, dataset_state_key, use_dataset
+from .few_shot_index import (
+    FEW_SHOT_PLACEHOLDER,
+    FEW_SHOT_STATE_KEY,
+    FewShotIndex,
+    FewShotInstruction,
+)
+from .instructions import build_instruction_from_context, load_instruction_context
+from .schema_retrieval import SchemaRetriever
+from .sql_validation import SchemaCatalog
+
+# --- Logging Configuration ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# Session state key holding the generation of the instruction a turn started
+# with, so that a turn in flight when the instruction is refreshed finishes on it.
+INSTRUCTION_GENERATION_STATE_KEY = "instruction_generation"
+
+# The built instructions refreshed by the background refresh thread. One
+# thread serves the instructions of all datasets.
+_refreshed_instructions: "weakref.WeakSet[LazyInstruction]" = weakref.WeakSet()
+_refresh_lock = threading.Lock()
+_refresh_thread: threading.Thread | None = None
+_stop_refresh = threading.Event()
+
+
+def _refresh_loop() -> None:
+    while not _stop_refresh.wait(CONTEXT_REFRESH_INTERVAL_SECONDS):
+        for instruction in list(_refreshed_instructions):
+            try:
+                instruction.refresh()
+            except Exception:
+                logger.error(
+                    f"[{DISPLAY_NAME}] Refreshing the agent instruction of dataset '{instruction.dataset.name}' failed. Keeping the current one.",
+                    exc_info=True,
+                )
+
+
+def _schedule_refresh(instruction: "LazyInstruction") -> None:
+    """
+    Adds a built instruction to those refreshed every
+    CONTEXT_REFRESH_INTERVAL_SECONDS, starting the refresh thread if needed.
+    """
+    global _refresh_thread
+    with _refresh_lock:
+        _refreshed_instructions.add(instruction)
+        if _refresh_thread is None and not _stop_refresh.is_set():
+            _refresh_thread = threading.Thread(
+                target=_refresh_loop, name="agent-refresh", daemon=True
+            )
+            _refresh_thread.start()
+
+
+def stop_refresh() -> None:
+    """
+    Stops the background refresh of the instruction contexts.
+    """
+    _stop_refresh.set()
+
+
+class _ResolvedInstruction:
+    """
+    What the agent needs once the instruction context is loaded: the
+    instruction (a string or a provider), the callbacks run before each
+    turn and the schema catalog queries are validated against. A refreshed instruction keeps the few-shot example index of the
+    previous one when the examples did not change.
+    """
+
+    def __init__(
+        self,
+        context: dict,
+        generation: int = 1,
+        previous: "_ResolvedInstruction | None" = None,
+    ):
+        self.context = context
+        self.generation = generation
+        self.schema_catalog = SchemaCatalog.from_context(context)
+        examples = context.get("few_shot_examples") or []
+        if previous is not None and previous.few_shot_index.examples == examples:
+            self.few_shot_index = previous.few_shot_index
+            self.few_shot_generation = previous.few_shot_generation
+        else:
+            # Only the few-shot examples most similar to each question are sent.
+            self.few_shot_index = FewShotIndex(examples)
+            self.few_shot_generation = generation
+        self.callbacks = (
+            [self.few_shot_index.before_agent_callback]
+            if self.few_shot_index.examples
+            else []
+        )
+        self.schema_retriever = None
+        if INSTRUCTION_MODE == "retrieval":
+            # Describe only the tables relevant to each user turn.
+            self.schema_retriever = SchemaRetriever(self.context, self.few_shot_index)
+            self.instruction = self.schema_retriever.instruction
+            self.callbacks.append(self.schema_retriever.before_agent_callback)
+        elif self.few_shot_index.examples:
+            self.instruction = FewShotInstruction(
+                build_instruction_from_context(
+                    dict(self.context, few_shot_examples=[FEW_SHOT_PLACEHOLDER])
+                ),
+                self.few_shot_index,
+            )
+        else:
+            self.instruction = build_instruction_from_context(self.context)
+
+
+class LazyInstruction:
+    """
+    The instruction provider and before-agent callback of the data agent of
+    one dataset. The fetchers, the context snapshot and the prompt compiler
+    run with that dataset in scope.
+
+    The instruction context is loaded, and the instruction built, on first use
+    rather than when the agent is constructed, so importing the agent (e.g. to
+    deploy or delete it) does not fetch anything. With AGENT_WARMUP_ENABLED,
+    a background thread builds it as soon as the agent is loaded.
+
+    Once built, a background thread shared by all datasets refreshes the
+    context every CONTEXT_REFRESH_INTERVAL_SECONDS and swaps in a new
+    instruction when it changed. Turns that started on the previous
+    instruction finish on it.
+
+    Only the configuration is pickled: a deployed agent loads its context in
+    the runtime it is deployed to.
+    """
+
+    def __init__(self, dataset: DatasetConfig = DEFAULT_DATASET):
+        self.dataset = dataset
+        self._lock = threading.Lock()
+        self._resolved: _ResolvedInstruction | None = None
+        self._previous: _ResolvedInstruction | None = None
+        self._warmup_thread: threading.Thread | None = None
+
+    def __getstate__(self) -> dict:
+        return {"dataset": self.dataset}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state.get("dataset", DEFAULT_DATASET))
+        if AGENT_WARMUP_ENABLED:
+            self.start_warmup()
+
+    def resolve(self) -> _ResolvedInstruction:
+        """
+        Returns the resolved instruction, loading the context the first time.
+        Concurrent callers wait for the same load.
+        """
+        if self._resolved is not None:
+            return self._resolved
+        with self._lock:
+            if self._resolved is None:
+                start_time = time.time()
+                with use_dataset(self.dataset):
+                    self._resolved = _ResolvedInstruction(load_instruction_context())
+                logger.info(
+                    f"[{DISPLAY_NAME}] --- Built the agent instruction of dataset '{self.dataset.name}' (Duration: {time.time() - start_time:.2f} seconds) ---"
+                )
+                if CONTEXT_REFRESH_INTERVAL_SECONDS > 0:
+                    _schedule_refresh(self)
+        return self._resolved
+
+    async def _resolve_async(self) -> _ResolvedInstruction:
+        if self._resolved is not None:
+            return self._resolved
+        return await asyncio.to_thread(self.resolve)
+
+    def start_warmup(self) -> None:
+        """
+        Starts resolving the instruction in a background thread.
+        """
+        if self._resolved is not None or self._warmup_thread is not None:
+            return
+
+        def warm_up():
+            try:
+                self.resolve()
+            except Exception:
+                logger.error(
+                    f"[{DISPLAY_NAME}] Warming up the agent instruction failed. It will be built on the first turn.",
+                    exc_info=True,
+                )
+
+        self._warmup_thread = threading.Thread(
+            target=warm_up, name=f"agent-warmup-{self.dataset.name}", daemon=True
+        )
+        self._warmup_thread.start()
+
+    def refresh(self) -> bool:
+        """
+        Refreshes the instruction context, if it is built, and swaps in a new
+        instruction when anything changed.
+        Returns:
+            Whether a new instruction was swapped in.
+        """
+        current = self._resolved
+        if current is None:
+            return False
+        with use_dataset(self.dataset):
+            context = refresh_context(current.context)
+            if context is None:
+                return False
+            start_time = time.time()
+            refreshed = _ResolvedInstruction(context, current.generation + 1, current)
+        with self._lock:
+            self._previous, self._resolved = current, refreshed
+        logger.info(
+            f"[{DISPLAY_NAME}] --- Swapped in refreshed agent instruction {refreshed.generation} of dataset '{self.dataset.name}' (Duration: {time.time() - start_time:.2f} seconds) ---"
+        )
+        return True
+
+    def schema_catalog(self) -> SchemaCatalog | None:
+        """
+        Returns the schema catalog of the current instruction context, or None
+        before it is loaded.
+        """
+        resolved = self._resolved
+        return resolved.schema_catalog if resolved is not None else None
+
+    def _resolved_for(self, generation: int | None) -> _ResolvedInstruction:
+        resolved, previous = self._resolved, self._previous
+        if previous is not None and generation == previous.generation:
+            return previous
+        return resolved
+
+    async def before_agent_callback(self, callback_context: CallbackContext):
+        """
+        Runs the callbacks of the resolved instruction, e.g. the few-shot
+        example and table selection for the user's message, and pins the turn
+        to that instruction.
+        """
+        resolved = await self._resolve_async()
+        with use_dataset(self.dataset):
+            state = callback_context.state
+            generation_key = dataset_state_key(INSTRUCTION_GENERATION_STATE_KEY)
+            generation = state.get(generation_key)
+            if generation is not None and generation < resolved.few_shot_generation:
+                # The few-shot examples changed since they were selected.
+                state[dataset_state_key(FEW_SHOT_STATE_KEY)] = []
+            state[generation_key] = resolved.generation
+            for callback in resolved.callbacks:
+                content = await callback(callback_context)
+                if content is not None:
+                    return content
+        return None
+
+    async def __call__(self, readonly_context: ReadonlyContext) -> str:
+        await self._resolve_async()
+        with use_dataset(self.dataset):
+            resolved = self._resolved_for(
+                readonly_context.state.get(
+                    dataset_state_key(INSTRUCTION_GENERATION_STATE_KEY)
+                )
+            )
+            if callable(resolved.instruction):
+                return resolved.instruction(readonly_context)
+            return resolved.instruction
@@ -0,0 +1,401 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import json
+import logging
+import math
+
+from .constants import (
+    DISPLAY_NAME,
+    PROMPT_ASPECT_FIELDS,
+    PROMPT_CHARS_PER_TOKEN,
+    PROMPT_TOKEN_BUDGET,
+)
+from .datasets import current_dataset
+
+# --- Logging Configuration ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# Levels of detail, from the richest to the leanest. When the rendered context
+# is over the token budget, the next level is tried; each one drops the
+# lowest-value detail that the previous level still kept.
+#   aspects: "all", "joins" (join relationship aspects only) or "none"
+#   top_n / sample_rows / few_shot_examples: maximum number kept (None for all)
+#   stats: whether profile statistics other than top values are shown
+#   description_chars: maximum length of descriptions (None for no limit)
+DETAIL_LEVELS = [
+    {
+        "name": "full",
+        "aspects": "all",
+        "top_n": None,
+        "stats": True,
+        "sample_rows": None,
+        "description_chars": None,
+        "few_shot_examples": None,
+    },
+    {
+        "name": "joins_only",
+        "aspects": "joins",
+        "top_n": None,
+        "stats": True,
+        "sample_rows": None,
+        "description_chars": None,
+        "few_shot_examples": None,
+    },
+    {
+        "name": "fewer_values",
+        "aspects": "joins",
+        "top_n": 3,
+        "stats": True,
+        "sample_rows": 1,
+        "description_chars": None,
+        "few_shot_examples": None,
+    },
+    {
+        "name": "short_descriptions",
+        "aspects": "joins",
+        "top_n": 3,
+        "stats": False,
+        "sample_rows": 1,
+        "description_chars": 120,
+        "few_shot_examples": None,
+    },
+    {
+        "name": "no_values",
+        "aspects": "joins",
+        "top_n": 0,
+        "stats": False,
+        "sample_rows": 0,
+        "description_chars": 120,
+        "few_shot_examples": 5,
+    },
+    {
+        "name": "columns_only",
+        "aspects": "none",
+        "top_n": 0,
+        "stats": False,
+        "sample_rows": 0,
+        "description_chars": 0,
+        "few_shot_examples": 3,
+    },
+]
+
+CONTEXT_SECTIONS = (
+    "dataset_description",
+    "table_metadata",
+    "data_profiles",
+    "samples",
+    "few_shot_examples",
+)
+
+
+def json_serial_default(obj):
+    """JSON serializer for objects not serializable by default json code"""
+    if isinstance(obj, (datetime.date, datetime.datetime, datetime.time)):
+        return obj.isoformat()
+    return str(obj)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of model tokens in `text` from its length, without
+    calling the model's tokenizer.
+    """
+    return math.ceil(len(text) / PROMPT_CHARS_PER_TOKEN)
+
+
+def _compact_json(value) -> str:
+    return json.dumps(
+        value, ensure_ascii=False, separators=(",", ":"), default=json_serial_default
+    )
+
+
+def _truncate(text: str | None, max_chars: int | None) -> str:
+    if not text:
+        return ""
+    text = " ".join(str(text).split())
+    if max_chars is None or len(text) <= max_chars:
+        return text
+    return text[: max(0, max_chars - 3)].rstrip() + "..." if max_chars else ""
+
+
+def _field_key(key: str) -> str:
+    return key.lower().replace("_", "").replace("-", "")
+
+
+_ASPECT_FIELDS = {_field_key(field) for field in PROMPT_ASPECT_FIELDS}
+
+
+def filter_aspect_data(data):
+    """
+    Keeps only the whitelisted fields (PROMPT_ASPECT_FIELDS) of aspect data,
+    at any depth. Field names match regardless of case, '_' and '-'. Returns
+    None if nothing is left.
+    """
+    if isinstance(data, dict):
+        filtered = {}
+        for key, value in data.items():
+            if _field_key(key) not in _ASPECT_FIELDS:
+                continue
+            value = filter_aspect_data(value)
+            if value not in (None, "", [], {}):
+                filtered[key] = value
+        return filtered or None
+    if isinstance(data, list):
+        filtered = [value for value in map(filter_aspect_data, data) if value is not None]
+        return filtered or None
+    return data
+
+
+def _aspect_type(aspect_key: str) -> str:
+    # Aspect keys look like "<project>.<location>.<aspect type>".
+    return aspect_key.split(".")[-1]
+
+
+def _is_join_aspect(aspect_type: str) -> bool:
+    return "join" in aspect_type.lower() or "relationship" in aspect_type.lower()
+
+
+def _schema_aspect_columns(aspects: dict) -> list[dict]:
+    """
+    Returns the columns of a Dataplex schema aspect, with nested fields listed
+    by their dotted path.
+    """
+    columns = []
+
+    def add_fields(fields, prefix):
+        for field in fields or []:
+            name = f"{prefix}{field.get('name')}"
+            columns.append(
+                {
+                    "name": name,
+                    "type": field.get("dataType") or field.get("metadataType"),
+                    "description": field.get("description"),
+                }
+            )
+            add_fields(field.get("fields"), f"{name}.")
+
+    for aspect_key, data in aspects.items():
+        if _aspect_type(aspect_key) == "schema" and isinstance(data, dict):
+            add_fields(data.get("fields"), "")
+    return columns
+
+
+def _format_number(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+
+def _format_profile(profile: dict, level: dict) -> str:
+    parts = []
+    if level["stats"]:
+        if profile.get("percent_null") is not None:
+            parts.append(f"nulls {_format_number(profile['percent_null'])}%")
+        if profile.get("percent_unique") is not None:
+            parts.append(f"unique {_format_number(profile['percent_unique'])}%")
+        if profile.get("min_value") is not None or profile.get("max_value") is not None:
+            parts.append(f"range {profile.get('min_value')}..{profile.get('max_value')}")
+        if profile.get("max_string_length") is not None:
+            parts.append(
+                f"length {profile.get('min_string_length')}..{profile.get('max_string_length')}"
+            )
+    top_values = profile.get("top_n") or []
+    if level["top_n"] is not None:
+        top_values = top_values[: level["top_n"]]
+    if top_values:
+        formatted_values = []
+        for top_value in top_values:
+            value = top_value.get("value") if isinstance(top_value, dict) else top_value
+            formatted = _compact_json(value)
+            if isinstance(top_value, dict) and top_value.get("percent") is not None:
+                formatted += f" {_format_number(top_value['percent'])}%"
+            formatted_values.append(formatted)
+        parts.append("top_n: " + ", ".join(formatted_values))
+    return ", ".join(parts)
+
+
+def collect_tables(context: dict) -> dict[str, dict]:
+    """
+    Merges the schema, Dataplex metadata and data profiles of each table,
+    keyed by table ID.
+    """
+    tables: dict[str, dict] = {}
+
+    def table(table_name: str) -> dict:
+        table_id = table_name.split(".")[-1]
+        return tables.setdefault(
+            table_id,
+            {"description": None, "columns": [], "aspects": {}, "profiles": {}},
+        )
+
+    for schema in context.get("table_schemas") or []:
+        entry = table(schema["table_name"])
+        entry["description"] = schema.get("description")
+        entry["columns"] = schema.get("columns") or []
+    for metadata in context.get("table_metadata") or []:
+        entry = table(metadata["table_name"])
+        entry["aspects"] = metadata.get("aspects") or {}
+        if not entry["columns"]:
+            entry["columns"] = _schema_aspect_columns(entry["aspects"])
+    for profile in context.get("data_profiles") or []:
+        entry = table(profile["source_table_id"])
+        entry["profiles"][profile["column_name"]] = profile
+    return tables
+
+
+def _render_tables(tables: dict[str, dict], level: dict) -> str:
+    config = current_dataset()
+    blocks = []
+    for table_id, table in tables.items():
+        header = f"TABLE `{config.project_id}.{config.dataset_name}.{table_id}`"
+        description = _truncate(table["description"], level["description_chars"])
+        lines = [f"{header} -- {description}" if description else header]
+
+        columns = table["columns"] or [
+            {"name": column_name} for column_name in table["profiles"]
+        ]
+        for column in columns:
+            line = f"  {column['name']}"
+            if column.get("type"):
+                line += f" {column['type']}"
+            flags = []
+            if column.get("partitioning_column"):
+                flags.append("partitioning")
+            if column.get("clustering_position"):
+                flags.append(f"clustering {column['clustering_position']}")
+            if flags:
+                line += f" [{', '.join(flags)}]"
+            column_description = _truncate(
+                column.get("description"), level["description_chars"]
+            )
+            if column_description:
+                line += f" -- {column_description}"
+            profile = table["profiles"].get(column["name"])
+            profile_str = _format_profile(profile, level) if profile else ""
+            if profile_str:
+                line += f" | {profile_str}"
+            lines.append(line)
+
+        if level["aspects"] != "none":
+            for aspect_key, data in table["aspects"].items():
+                aspect_type = _aspect_type(aspect_key)
+                # The columns above already cover the schema aspect.
+                if aspect_type == "schema" and table["columns"]:
+                    continue
+                if level["aspects"] == "joins" and not _is_join_aspect(aspect_type):
+                    continue
+                filtered = filter_aspect_data(data)
+                if filtered is not None:
+                    lines.append(f"  {aspect_type}: {_compact_json(filtered)}")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+def _render_samples(sample_data: list[dict], level: dict) -> str:
+    blocks = []
+    for item in sample_data:
+        rows = item.get("sample_rows") or []
+        if level["sample_rows"] is not None:
+            rows = rows[: level["sample_rows"]]
+        if not rows:
+            continue
+        lines = [f"Sample rows of `{item['table_name']}`:"]
+        lines.extend(_compact_json(row) for row in rows)
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+def render_context_sections(context: dict, level: dict) -> dict[str, str]:
+    """
+    Renders the fetched context at one level of detail. Returns the text of
+    each section of the prompt (see CONTEXT_SECTIONS).
+    """
+    tables = collect_tables(context)
+    has_profiles = bool(context.get("data_profiles"))
+
+    if tables:
+        table_metadata = _render_tables(tables, level)
+    else:
+        table_metadata = "Table metadata information is not available."
+    # Set when only the tables relevant to the question are rendered.
+    other_tables = context.get("other_tables") or []
+    if other_tables:
+        names = ", ".join(f"`{table_id}`" for table_id in other_tables[:100])
+        if len(other_tables) > 100:
+            names += f" and {len(other_tables) - 100} more"
+        table_metadata += f"\n\nOther tables in the dataset, not described above: {names}."
+
+    if has_profiles:
+        data_profiles = "Data profiles are shown inline with each column in the table schema above, after the `|`."
+        samples = "Full data profiles are provided; sample data section is omitted for brevity."
+    else:
+        data_profiles = "Data profile information is not available. Please refer to the sample data below."
+        samples = _render_samples(context.get("sample_data") or [], level)
+        if not samples:
+            config = current_dataset()
+            scope = f"{config.project_id}.{config.dataset_name} (Tables: {config.table_names if config.table_names else 'All'})"
+            if context.get("sample_data") and level["sample_rows"] == 0:
+                samples = f"Sample data for {scope} is omitted to fit the prompt size limit."
+            else:
+                logger.warning(
+                    f"[{DISPLAY_NAME}] Could not fetch sample data for the target scope: {scope}."
+                )
+                samples = f"Could not fetch sample data for the target scope: {scope}."
+
+    few_shot_examples = context.get("few_shot_examples") or []
+    if level["few_shot_examples"] is not None:
+        few_shot_examples = few_shot_examples[: level["few_shot_examples"]]
+
+    return {
+        "dataset_description": context.get("dataset_description")
+        or "Dataset description is not available.",
+        "table_metadata": table_metadata,
+        "data_profiles": data_profiles,
+        "samples": samples,
+        # The examples are already formatted as strings, so we just join them.
+        "few_shot_examples": "\n\n---\n\n".join(few_shot_examples)
+        or "Few-shot examples are not available for this dataset.",
+    }
+
+
+def compile_context_sections(
+    context: dict, token_budget: int = PROMPT_TOKEN_BUDGET
+) -> tuple[dict[str, str], dict[str, int], str]:
+    """
+    Renders the fetched context at the richest level of detail whose sections
+    fit in `token_budget` estimated tokens (0 for no limit). If even the
+    leanest level is over budget, it is used anyway and a warning is logged.
+    Returns:
+        The text of each section, the estimated tokens of each section, and
+        the name of the level of detail used.
+    """
+    for level in DETAIL_LEVELS:
+        sections = render_context_sections(context, level)
+        token_counts = {
+            section: estimate_tokens(text) for section, text in sections.items()
+        }
+        if not token_budget or sum(token_counts.values()) <= token_budget:
+            break
+    else:
+        logger.warning(
+            f"[{DISPLAY_NAME}] The prompt context needs about {sum(token_counts.values())} tokens even at the leanest level of detail, over the budget of {token_budget} tokens."
+        )
+    return sections, token_counts, level["name"]
@@ -0,0 +1,261 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from .constants import (
+    DISPLAY_NAME,
+    QUERY_CACHE_ENABLED,
+    QUERY_CACHE_MAX_BYTES,
+    QUERY_CACHE_MAX_ENTRIES,
+    QUERY_CACHE_MAX_ENTRY_BYTES,
+    QUERY_CACHE_SPILL_DIR,
+    QUERY_CACHE_SPILL_MAX_BYTES,
+    QUERY_CACHE_TTL_SECONDS,
+    QUERY_CACHE_VALIDATION_TIMEOUT_SECONDS,
+)
+from .sql_utils import (
+    is_read_only_query,
+    is_volatile_query,
+    sql_fingerprint,
+    uses_current_date,
+)
+
+# --- Logging Configuration ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+def query_cache_key(sql_query: str, principal: str, *extra: str) -> str | None:
+    """
+    Returns the result cache key for a query run by a principal, or None if the
+    query must not be cached (statements other than SELECT, or SQL calling
+    functions like RAND or CURRENT_TIMESTAMP).
+
+    The key covers the normalized SQL, the principal, so users never share
+    results, and any `extra` key parts (e.g. the caps the result is serialized
+    with). Queries using CURRENT_DATE are also keyed by the current UTC hour.
+    """
+    if not is_read_only_query(sql_query) or is_volatile_query(sql_query):
+        return None
+    key_parts = [principal, *extra]
+    if uses_current_date(sql_query):
+        key_parts.append(datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d%H"))
+    return sql_fingerprint(sql_query, *key_parts)
+
+
+class QueryResultCache:
+    """
+    A size-bounded LRU of query results. Entries evicted from memory are
+    spilled to `spill_dir` (when set), which is itself bounded in bytes.
+
+    Each entry is a dict holding at least:
+        result: The result to return to the caller.
+        size_bytes: The approximate size of the result.
+        referenced_tables: IDs of the tables the query read.
+        started: When the job that produced the result started.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        max_entry_bytes: int,
+        ttl_seconds: int,
+        spill_dir: str | None = None,
+        spill_max_bytes: int = 0,
+    ):
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._max_entry_bytes = max_entry_bytes
+        self._ttl_seconds = ttl_seconds
+        self._spill_dir = spill_dir
+        self._spill_max_bytes = spill_max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._bytes = 0
+        # key -> size in bytes of the spilled file, oldest first.
+        self._spilled: OrderedDict[str, int] = OrderedDict()
+        self._spilled_bytes = 0
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self._spill_dir, f"{key}.pkl")
+
+    def _spill(self, key: str, entry: dict) -> None:
+        if not self._spill_dir or entry["size_bytes"] > self._spill_max_bytes:
+            return
+        try:
+            os.makedirs(self._spill_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self._spill_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._spill_path(key))
+        except Exception as e:
+            logger.warning(f"[{DISPLAY_NAME}] Could not spill cached query result: {e}")
+            return
+        self._spilled[key] = entry["size_bytes"]
+        self._spilled_bytes += entry["size_bytes"]
+        while self._spilled_bytes > self._spill_max_bytes:
+            self._drop_spilled(next(iter(self._spilled)))
+
+    def _drop_spilled(self, key: str) -> None:
+        self._spilled_bytes -= self._spilled.pop(key)
+        try:
+            os.unlink(self._spill_path(key))
+        except FileNotFoundError:
+            pass
+
+    def _load_spilled(self, key: str) -> dict | None:
+        try:
+            with open(self._spill_path(key), "rb") as f:
+                entry = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"[{DISPLAY_NAME}] Could not load spilled query result: {e}")
+            entry = None
+        self._drop_spilled(key)
+        return entry
+
+    def _store(self, key: str, entry: dict) -> None:
+        self._entries[key] = entry
+        self._bytes += entry["size_bytes"]
+        while self._entries and (
+            len(self._entries) > self._max_entries or self._bytes > self._max_bytes
+        ):
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted["size_bytes"]
+            self._spill(evicted_key, evicted)
+
+    def _remove(self, key: str) -> dict | None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry["size_bytes"]
+        return entry
+
+    def get(self, key: str) -> dict | None:
+        """
+        Returns the entry for `key` if present and not expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            elif key in self._spilled:
+                entry = self._load_spilled(key)
+                if entry is not None:
+                    self._store(key, entry)
+            if entry is None:
+                return None
+            if time.time() - entry["cached_at"] > self._ttl_seconds:
+                self._remove(key)
+                return None
+            return entry
+
+    def put(self, key: str, entry: dict) -> None:
+        """
+        Stores an entry, unless it is larger than the per-entry size limit.
+        """
+        if entry["size_bytes"] > self._max_entry_bytes:
+            return
+        entry = dict(entry, cached_at=time.time())
+        with self._lock:
+            self._remove(key)
+            if key in self._spilled:
+                self._drop_spilled(key)
+            self._store(key, entry)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+            if key in self._spilled:
+                self._drop_spilled(key)
+
+
+query_result_cache = QueryResultCache(
+    max_entries=QUERY_CACHE_MAX_ENTRIES,
+    max_bytes=QUERY_CACHE_MAX_BYTES,
+    max_entry_bytes=QUERY_CACHE_MAX_ENTRY_BYTES,
+    ttl_seconds=QUERY_CACHE_TTL_SECONDS,
+    spill_dir=QUERY_CACHE_SPILL_DIR,
+    spill_max_bytes=QUERY_CACHE_SPILL_MAX_BYTES,
+)
+
+
+def get_cached_result(client, cache_key: str) -> dict | None:
+    """
+    Returns the cached entry for `cache_key`, unless any table the query read
+    has been modified since the cached job started. The table metadata is
+    read without retries, within QUERY_CACHE_VALIDATION_TIMEOUT_SECONDS in
+    total; if it cannot be read in time, the entry is treated as a miss.
+    Args:
+        client: The BigQuery client of the principal, used to read the table
+            `modified` times (which also re-checks the principal's access).
+        cache_key: The key returned by query_cache_key.
+    """
+    if not QUERY_CACHE_ENABLED or cache_key is None:
+        return None
+    entry = query_result_cache.get(cache_key)
+    if entry is None:
+        return None
+    deadline = time.monotonic() + QUERY_CACHE_VALIDATION_TIMEOUT_SECONDS
+    try:
+        for table_id in entry["referenced_tables"]:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(
+                    f"Table metadata not read within {QUERY_CACHE_VALIDATION_TIMEOUT_SECONDS:.0f} seconds."
+                )
+            table = client.get_table(table_id, retry=None, timeout=remaining)
+            if table.modified is None or table.modified > entry["started"]:
+                logger.info(
+                    f"[{DISPLAY_NAME}] Cached query result is stale: table {table_id} was modified at {table.modified}."
+                )
+                query_result_cache.invalidate(cache_key)
+                return None
+    except Exception as e:
+        logger.warning(
+            f"[{DISPLAY_NAME}] Could not validate cached query result. Running the query instead. Error: {e}"
+        )
+        return None
+    return entry
+
+
+def cache_result(cache_key: str, query_job, result, size_bytes: int) -> None:
+    """
+    Caches the result of a finished query job.
+    """
+    if not QUERY_CACHE_ENABLED or cache_key is None or query_job.started is None:
+        return
+    query_result_cache.put(
+        cache_key,
+        {
+            "result": result,
+            "size_bytes": size_bytes,
+            "referenced_tables": [
+                f"{ref.project}.{ref.dataset_id}.{ref.table_id}"
+                for ref in query_job.referenced_tables
+            ],
+            "started": query_job.started,
+        },
+    )
@@ -0,0 +1,173 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from .constants import (
+    BQ_DRY_RUN_CACHE_TTL_SECONDS,
+    BQ_DRY_RUN_ENABLED,
+    BQ_MAX_BYTES_BILLED,
+    BQ_REQUIRE_PARTITION_FILTER,
+    DISPLAY_NAME,
+)
+from .execution_policy import BIGQUERY_RETRY
+from .sql_utils import filtered_names, sql_fingerprint
+
+if TYPE_CHECKING:
+    from google.cloud import bigquery
+
+# --- Logging Configuration ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# SQL fingerprint (including the principal) -> (dry run result, cached at)
+_dry_run_cache: dict[str, tuple[dict, float]] = {}
+_dry_run_cache_lock = threading.Lock()
+
+
+def format_bytes(num_bytes: int) -> str:
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if num_bytes < 1024 or unit == "TB":
+            return f"{num_bytes:.0f} {unit}" if unit == "B" else f"{num_bytes:.2f} {unit}"
+        num_bytes /= 1024
+
+
+def query_job_config(**kwargs) -> "bigquery.QueryJobConfig":
+    """
+    Returns the job config for running a query, capped at BQ_MAX_BYTES_BILLED.
+    """
+    from google.cloud import bigquery
+
+    if BQ_MAX_BYTES_BILLED:
+        kwargs.setdefault("maximum_bytes_billed", BQ_MAX_BYTES_BILLED)
+    return bigquery.QueryJobConfig(**kwargs)
+
+
+def _partition_column(table) -> str | None:
+    if table.time_partitioning is not None:
+        # Ingestion-time partitioned tables have no partition field.
+        return table.time_partitioning.field or "_PARTITIONTIME"
+    if table.range_partitioning is not None:
+        return table.range_partitioning.field
+    return None
+
+
+def _filters_on(names: set[str], column: str) -> bool:
+    if column == "_PARTITIONTIME":
+        return bool(names & {"_partitiontime", "_partitiondate"})
+    return column.lower() in names
+
+
+def _dry_run(client, sql_query: str, retry) -> dict:
+    start_time = time.time()
+    job = client.query(
+        sql_query,
+        job_config=query_job_config(dry_run=True, use_query_cache=False),
+        retry=retry,
+    )
+    # A partition column only prunes partitions when a WHERE, ON or QUALIFY
+    # clause uses it; selecting or grouping by it does not.
+    names = filtered_names(sql_query)
+    missing_partition_filters = []
+    for ref in job.referenced_tables:
+        table = client.get_table(ref, retry=retry)
+        partition_column = _partition_column(table)
+        if partition_column and not _filters_on(names, partition_column):
+            missing_partition_filters.append(
+                {
+                    "table": f"{ref.project}.{ref.dataset_id}.{ref.table_id}",
+                    "column": partition_column,
+                }
+            )
+    duration = time.time() - start_time
+    logger.info(
+        f"[{DISPLAY_NAME}] Dry run estimated {format_bytes(job.total_bytes_processed or 0)} processed (Duration: {duration:.2f} seconds)."
+    )
+    return {
+        "total_bytes_processed": job.total_bytes_processed or 0,
+        "missing_partition_filters": missing_partition_filters,
+    }
+
+
+def check_query_cost(
+    client, sql_query: str, principal: str, retry=BIGQUERY_RETRY
+) -> str | None:
+    """
+    Dry-runs a query to estimate the bytes it would process and to find
+    partitioned tables it reads without filtering on the partition column.
+    Dry-run results are cached per SQL fingerprint and principal for
+    BQ_DRY_RUN_CACHE_TTL_SECONDS, so repeated checks are free.
+
+    Does nothing unless BQ_DRY_RUN_ENABLED is set. Errors from the dry run
+    (e.g. invalid SQL) are raised, since the query itself would fail too.
+    Args:
+        client: The BigQuery client of the principal running the query.
+        sql_query: The SQL query string to check.
+        principal: The identity the query runs as.
+        retry: The retry policy of the dry run and of the table lookups, e.g.
+            one bounded by the deadline of the tool call.
+    Returns:
+        A message explaining why the query is rejected, or None if it may run.
+    """
+    if not BQ_DRY_RUN_ENABLED:
+        return None
+
+    fingerprint = sql_fingerprint(sql_query, principal)
+    now = time.time()
+    with _dry_run_cache_lock:
+        cached = _dry_run_cache.get(fingerprint)
+    if cached is not None and now - cached[1] <= BQ_DRY_RUN_CACHE_TTL_SECONDS:
+        dry_run = cached[0]
+    else:
+        dry_run = _dry_run(client, sql_query, retry)
+        with _dry_run_cache_lock:
+            for key in [
+                key
+                for key, (_, cached_at) in _dry_run_cache.items()
+                if now - cached_at > BQ_DRY_RUN_CACHE_TTL_SECONDS
+            ]:
+                del _dry_run_cache[key]
+            _dry_run_cache[fingerprint] = (dry_run, now)
+
+    missing = dry_run["missing_partition_filters"]
+    partition_hint = "; ".join(
+        f"filter `{item['table']}` on its partition column `{item['column']}` in the WHERE clause"
+        for item in missing
+    )
+    if BQ_REQUIRE_PARTITION_FILTER and missing:
+        return (
+            "The query reads partitioned tables without a partition filter. "
+            f"Please {partition_hint}, then run the query again."
+        )
+
+    bytes_processed = dry_run["total_bytes_processed"]
+    if BQ_MAX_BYTES_BILLED and bytes_processed > BQ_MAX_BYTES_BILLED:
+        suggestions = [partition_hint] if missing else []
+        suggestions.append(
+            "narrow the date range, select only the columns you need, or aggregate before joining"
+        )
+        return (
+            f"The query would process {format_bytes(bytes_processed)}, which is above the "
+            f"limit of {format_bytes(BQ_MAX_BYTES_BILLED)}. To reduce it, "
+            + "; ".join(suggestions)
+            + "."
+        )
+    return None
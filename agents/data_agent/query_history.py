@@ -0,0 +1,376 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The history of the query jobs run by the query tool, and a report of the
+slowest and most expensive query shapes:
+
+    python -m data_agent.query_history [--path query_history.sqlite] [--limit 10]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from .constants import (
+    DISPLAY_NAME,
+    QUERY_HISTORY_ENABLED,
+    QUERY_HISTORY_PATH,
+    QUERY_HISTORY_RETENTION_DAYS,
+    QUERY_HISTORY_SLOW_SECONDS,
+    QUERY_HISTORY_WINDOW,
+)
+from .query_guard import format_bytes
+from .sql_utils import query_shape
+
+# --- Logging Configuration ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# Bump whenever the schema changes; stores of another version are recreated.
+HISTORY_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fingerprint TEXT NOT NULL,
+    shape TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    outcome TEXT NOT NULL,
+    duration_seconds REAL NOT NULL,
+    job_seconds REAL,
+    bytes_processed INTEGER,
+    bytes_billed INTEGER,
+    slot_ms INTEGER,
+    cache_hit INTEGER,
+    total_rows INTEGER,
+    job_id TEXT,
+    stages TEXT
+);
+CREATE INDEX IF NOT EXISTS query_runs_by_fingerprint ON query_runs (fingerprint, id);
+"""
+
+# The statistics a report can be sorted by.
+SORT_KEYS = (
+    "p50_seconds",
+    "p95_seconds",
+    "total_seconds",
+    "avg_bytes_processed",
+    "total_bytes_billed",
+    "avg_slot_ms",
+)
+
+
+def shape_fingerprint(shape: str) -> str:
+    return hashlib.sha256(shape.encode("utf-8")).hexdigest()[:16]
+
+
+def _percentile(values: list[float], p: float) -> float:
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def _job_stages(query_job) -> list[dict]:
+    """
+    Returns the name, duration, slot time and records read and written of
+    each stage of a query job's plan.
+    """
+    stages = []
+    for entry in getattr(query_job, "query_plan", None) or []:
+        start, end = getattr(entry, "start", None), getattr(entry, "end", None)
+        stages.append(
+            {
+                "name": entry.name,
+                "ms": (end - start).total_seconds() * 1000 if start and end else None,
+                "slot_ms": getattr(entry, "slot_ms", None),
+                "records_read": getattr(entry, "records_read", None),
+                "records_written": getattr(entry, "records_written", None),
+            }
+        )
+    return stages
+
+
+def _summarize_runs(runs: list[sqlite3.Row]) -> dict:
+    """
+    Returns the statistics of the runs of one query shape, latest first.
+    """
+    durations = sorted(run["duration_seconds"] for run in runs)
+    successes = [run for run in runs if run["outcome"] == "success"]
+    slowest_stage = None
+    if successes and successes[0]["stages"]:
+        stages = json.loads(successes[0]["stages"])
+        if stages:
+            slowest_stage = max(stages, key=lambda stage: stage["slot_ms"] or 0)["name"]
+    return {
+        "fingerprint": runs[0]["fingerprint"],
+        "shape": runs[0]["shape"],
+        "runs": len(runs),
+        "failed_runs": len(runs) - len(successes),
+        "p50_seconds": _percentile(durations, 0.5),
+        "p95_seconds": _percentile(durations, 0.95),
+        "max_seconds": durations[-1],
+        "total_seconds": sum(durations),
+        "avg_bytes_processed": sum(run["bytes_processed"] or 0 for run in runs) / len(runs),
+        "total_bytes_billed": sum(run["bytes_billed"] or 0 for run in runs),
+        "avg_slot_ms": sum(run["slot_ms"] or 0 for run in runs) / len(runs),
+        "cache_hit_ratio": sum(1 for run in runs if run["cache_hit"]) / len(runs),
+        "last_run_at": runs[0]["recorded_at"],
+        "slowest_stage": slowest_stage,
+    }
+
+
+class QueryHistory:
+    """
+    An append-only SQLite store of query runs, keyed by query shape (the SQL
+    with its literals replaced, see `sql_utils.query_shape`). The statistics
+    of a shape cover its last `window` runs.
+
+    The store is opened on first use and is safe to share between threads
+    and processes.
+    """
+
+    def __init__(
+        self,
+        path: str = QUERY_HISTORY_PATH,
+        window: int = QUERY_HISTORY_WINDOW,
+        retention_days: float = QUERY_HISTORY_RETENTION_DAYS,
+    ):
+        self.path = path
+        self.window = window
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is not None:
+            return self._connection
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(
+            self.path, timeout=5, check_same_thread=False, isolation_level=None
+        )
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        if connection.execute("PRAGMA user_version").fetchone()[0] != HISTORY_VERSION:
+            connection.execute("DROP TABLE IF EXISTS query_runs")
+            connection.execute(f"PRAGMA user_version = {HISTORY_VERSION}")
+        connection.executescript(_SCHEMA)
+        if self.retention_days > 0:
+            connection.execute(
+                "DELETE FROM query_runs WHERE recorded_at < ?",
+                (time.time() - self.retention_days * 86400,),
+            )
+        self._connection = connection
+        return connection
+
+    def record(
+        self,
+        sql: str,
+        outcome: str,
+        duration_seconds: float,
+        query_job=None,
+        total_rows: int | None = None,
+    ) -> None:
+        """
+        Appends a run of a query.
+        Args:
+            sql: The SQL of the query.
+            outcome: "success", "timeout" or "error".
+            duration_seconds: The time the query tool spent on the query.
+            query_job: The BigQuery job, if one was submitted, for its
+                statistics: bytes processed and billed, slot time, cache hit
+                and stage timings.
+            total_rows: The number of rows of the result, if it finished.
+        """
+        shape = query_shape(sql)
+        started = getattr(query_job, "started", None)
+        ended = getattr(query_job, "ended", None)
+        cache_hit = getattr(query_job, "cache_hit", None)
+        row = (
+            shape_fingerprint(shape),
+            shape,
+            time.time(),
+            outcome,
+            duration_seconds,
+            (ended - started).total_seconds() if started and ended else None,
+            getattr(query_job, "total_bytes_processed", None),
+            getattr(query_job, "total_bytes_billed", None),
+            getattr(query_job, "slot_millis", None),
+            None if cache_hit is None else int(cache_hit),
+            total_rows,
+            getattr(query_job, "job_id", None),
+            json.dumps(_job_stages(query_job)) if query_job is not None else None,
+        )
+        with self._lock:
+            self._connect().execute(
+                "INSERT INTO query_runs (fingerprint, shape, recorded_at, outcome, "
+                "duration_seconds, job_seconds, bytes_processed, bytes_billed, slot_ms, "
+                "cache_hit, total_rows, job_id, stages) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+
+    def shape_stats(self, sql: str) -> dict | None:
+        """
+        Returns the statistics of the shape of a query, or None if it never ran.
+        """
+        with self._lock:
+            runs = (
+                self._connect()
+                .execute(
+                    "SELECT * FROM query_runs WHERE fingerprint = ? ORDER BY id DESC LIMIT ?",
+                    (shape_fingerprint(query_shape(sql)), self.window),
+                )
+                .fetchall()
+            )
+        return _summarize_runs(runs) if runs else None
+
+    def report(self, sort_by: str = "p95_seconds", limit: int = 10) -> list[dict]:
+        """
+        Returns the statistics of the query shapes with the highest `sort_by`
+        (one of SORT_KEYS), highest first.
+        """
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key '{sort_by}'. Use one of {SORT_KEYS}.")
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute(
+                    "SELECT * FROM ("
+                    " SELECT *, ROW_NUMBER() OVER (PARTITION BY fingerprint ORDER BY id DESC) AS position"
+                    " FROM query_runs"
+                    ") WHERE position <= ? ORDER BY fingerprint, id DESC",
+                    (self.window,),
+                )
+                .fetchall()
+            )
+        runs_by_shape = defaultdict(list)
+        for row in rows:
+            runs_by_shape[row["fingerprint"]].append(row)
+        stats = [_summarize_runs(runs) for runs in runs_by_shape.values()]
+        stats.sort(key=lambda shape_stats: shape_stats[sort_by], reverse=True)
+        return stats[:limit]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+_history = QueryHistory() if QUERY_HISTORY_ENABLED else None
+
+
+def record_query_run(
+    sql: str,
+    outcome: str,
+    duration_seconds: float,
+    query_job=None,
+    total_rows: int | None = None,
+) -> None:
+    """
+    Appends a run of a query to the query history, if enabled. Failures are
+    logged and never fail the query.
+    """
+    if _history is None:
+        return
+    try:
+        _history.record(sql, outcome, duration_seconds, query_job, total_rows)
+    except Exception as e:
+        logger.warning(f"[{DISPLAY_NAME}] Could not record the query in the query history. Error: {e}")
+
+
+def slow_query_hint(sql: str) -> str | None:
+    """
+    Returns a short hint for the model when queries of the same shape took
+    at least QUERY_HISTORY_SLOW_SECONDS (median) in the past, or None.
+    """
+    if _history is None or QUERY_HISTORY_SLOW_SECONDS <= 0:
+        return None
+    try:
+        stats = _history.shape_stats(sql)
+    except Exception as e:
+        logger.warning(f"[{DISPLAY_NAME}] Could not read the query history. Error: {e}")
+        return None
+    if stats is None or stats["p50_seconds"] < QUERY_HISTORY_SLOW_SECONDS:
+        return None
+    return (
+        f"Queries of this shape took {stats['p50_seconds']:.0f} seconds (median of {stats['runs']} runs) "
+        f"and processed {format_bytes(int(stats['avg_bytes_processed']))} on average. For similar "
+        "questions, prefer a narrower date range, fewer columns or more aggregation."
+    )
+
+
+def _print_report(title: str, stats: list[dict]) -> None:
+    print(title)
+    print(
+        f"{'fingerprint':<16} {'runs':>5} {'failed':>6} {'p50 s':>8} {'p95 s':>8} {'max s':>8} "
+        f"{'avg processed':>14} {'total billed':>13} {'avg slot ms':>12} {'cache hits':>10}  shape"
+    )
+    for shape_stats in stats:
+        print(
+            f"{shape_stats['fingerprint']:<16} {shape_stats['runs']:>5} {shape_stats['failed_runs']:>6} "
+            f"{shape_stats['p50_seconds']:>8.2f} {shape_stats['p95_seconds']:>8.2f} {shape_stats['max_seconds']:>8.2f} "
+            f"{format_bytes(int(shape_stats['avg_bytes_processed'])):>14} "
+            f"{format_bytes(shape_stats['total_bytes_billed']):>13} {shape_stats['avg_slot_ms']:>12.0f} "
+            f"{shape_stats['cache_hit_ratio']:>10.0%}  {shape_stats['shape'][:120]}"
+        )
+    print()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Report the slowest and most expensive query shapes of the query history."
+    )
+    parser.add_argument("--path", default=QUERY_HISTORY_PATH, help="The query history file.")
+    parser.add_argument("--limit", type=int, default=10, help="Query shapes per report.")
+    parser.add_argument(
+        "--sort",
+        choices=SORT_KEYS,
+        help="Print one report sorted by this statistic instead of the slowest and most expensive shapes.",
+    )
+    parser.add_argument("--json", action="store_true", help="Print the reports as JSON.")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        print(f"No query history at {args.path}.", file=sys.stderr)
+        return 1
+    history = QueryHistory(args.path, retention_days=0)
+    sort_keys = [args.sort] if args.sort else ["p95_seconds", "total_bytes_billed"]
+    reports = {sort_by: history.report(sort_by, args.limit) for sort_by in sort_keys}
+    history.close()
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return 0
+    titles = {
+        "p95_seconds": "Slowest query shapes (by p95 duration)",
+        "total_bytes_billed": "Most expensive query shapes (by total bytes billed)",
+    }
+    for sort_by, stats in reports.items():
+        _print_report(titles.get(sort_by, f"Query shapes by {sort_by}"), stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+
+# Filters are "<column> <operator> <value>", e.g. "region = 'WEST'",
+# "revenue >= 1000", "status in ('open', 'pending')", "name contains 'pro'"
+# or "discount is null". Operators are matched case-insensitively, and the
+# longest first (so "==" is not read as "=").
+_FILTER_RE = re.compile(
+    r"^\s*`?(?P<column>[^`<>=!]+?)`?\s+"
+    r"(?P<operator>==|!=|<>|<=|>=|=|<|>|not\s+in|in|not\s+contains|contains|is\s+not\s+null|is\s+null)"
+    r"\s*(?P<value>.*?)\s*$",
+    re.IGNORECASE,
+)
+# Aggregations are "<function>(<column>)", e.g. "sum(revenue)" or "count(*)".
+_AGGREGATION_RE = re.compile(r"^\s*(?P<function>\w+)\s*\(\s*`?(?P<column>[^`)]*?)`?\s*\)\s*$")
+_AGGREGATION_FUNCTIONS = {
+    "sum": "sum",
+    "avg": "mean",
+    "mean": "mean",
+    "min": "min",
+    "max": "max",
+    "median": "median",
+    "count": "count",
+    "count_distinct": "nunique",
+}
+
+
+def _resolve_column(frame, name: str) -> str:
+    """
+    Returns the column of the frame matching a name, ignoring case.
+    """
+    name = name.strip()
+    if name in frame.columns:
+        return name
+    for column in frame.columns:
+        if column.lower() == name.lower():
+            return column
+    raise ValueError(f"Unknown column '{name}'. The columns are: {', '.join(map(str, frame.columns))}.")
+
+
+def _parse_value(text: str):
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in ("'", '"'):
+        return text[1:-1]
+    if text.lower() in ("true", "false"):
+        return text.lower() == "true"
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def _parse_list(text: str) -> list:
+    text = text.strip()
+    if text.startswith("(") and text.endswith(")") or text.startswith("[") and text.endswith("]"):
+        text = text[1:-1]
+    # Split on commas outside of quotes.
+    return [_parse_value(item) for item in re.findall(r"'[^']*'|\"[^\"]*\"|[^,]+", text) if item.strip()]
+
+
+def _comparable(series, value):
+    """
+    Converts a filter value to the type of the column it is compared with.
+    """
+    import pandas as pd
+
+    if pd.api.types.is_datetime64_any_dtype(series.dtype) and isinstance(value, str):
+        timestamp = pd.Timestamp(value)
+        if series.dt.tz is not None and timestamp.tzinfo is None:
+            timestamp = timestamp.tz_localize("UTC")
+        return timestamp
+    return value
+
+
+def _filter_mask(frame, filter_text: str):
+    match = _FILTER_RE.match(filter_text)
+    if match is None:
+        raise ValueError(
+            f"Cannot parse the filter '{filter_text}'. Use '<column> <operator> <value>', with one of the "
+            "operators =, !=, <, <=, >, >=, in, not in, contains, not contains, is null, is not null."
+        )
+    series = frame[_resolve_column(frame, match["column"])]
+    operator = re.sub(r"\s+", " ", match["operator"].lower())
+    value_text = match["value"]
+    if operator in ("is null", "is not null"):
+        mask = series.isna()
+        return ~mask if operator == "is not null" else mask
+    if operator in ("in", "not in"):
+        mask = series.isin([_comparable(series, value) for value in _parse_list(value_text)])
+        return ~mask if operator == "not in" else mask
+    if operator in ("contains", "not contains"):
+        mask = series.astype(str).str.contains(
+            str(_parse_value(value_text)), case=False, regex=False
+        ) & series.notna()
+        return ~mask if operator == "not contains" else mask
+    value = _comparable(series, _parse_value(value_text))
+    if operator in ("=", "=="):
+        return series == value
+    if operator in ("!=", "<>"):
+        return series != value
+    if operator == "<":
+        return series < value
+    if operator == "<=":
+        return series <= value
+    if operator == ">":
+        return series > value
+    return series >= value
+
+
+def _aggregation(frame, text: str) -> tuple[str, str | None, str]:
+    """
+    Returns the output name, column (None for count(*)) and pandas function
+    of an aggregation.
+    """
+    match = _AGGREGATION_RE.match(text)
+    function = match["function"].lower() if match else None
+    if function not in _AGGREGATION_FUNCTIONS:
+        raise ValueError(
+            f"Cannot parse the aggregation '{text}'. Use '<function>(<column>)' with one of the functions "
+            f"{', '.join(_AGGREGATION_FUNCTIONS)}, or 'count(*)'."
+        )
+    if match["column"] in ("*", "") and function == "count":
+        return "count", None, "size"
+    column = _resolve_column(frame, match["column"])
+    return f"{function}_{column}", column, _AGGREGATION_FUNCTIONS[function]
+
+
+def analyze_frame(
+    frame,
+    filters: list[str] | None = None,
+    group_by: list[str] | None = None,
+    aggregations: list[str] | None = None,
+    order_by: list[str] | None = None,
+    columns: list[str] | None = None,
+    limit: int | None = None,
+):
+    """
+    Filters, groups, aggregates, sorts and limits a frame, in that order.
+    All steps are vectorized pandas operations.
+    Args:
+        frame: The frame to analyze.
+        filters: Conditions all rows must meet, e.g. "region = 'WEST'".
+        group_by: The columns to group by.
+        aggregations: The aggregations, e.g. "sum(revenue)" or "count(*)",
+            per group (or of all rows without group_by). Their output columns
+            are named "<function>_<column>" (e.g. "sum_revenue") or "count".
+        order_by: The columns to sort by, each optionally followed by "asc"
+            or "desc", e.g. "sum_revenue desc".
+        columns: The columns to return when nothing is aggregated.
+        limit: The maximum number of rows to return.
+    Returns:
+        The resulting frame.
+    Raises:
+        ValueError: If a filter, column or aggregation is not valid.
+    """
+    import pandas as pd
+
+    result = frame
+    for filter_text in filters or []:
+        result = result[_filter_mask(result, filter_text)]
+
+    group_columns = [_resolve_column(result, column) for column in group_by or []]
+    specs = [_aggregation(result, text) for text in aggregations or []]
+    if group_columns and not specs:
+        specs = [("count", None, "size")]
+    if specs:
+        if group_columns:
+            grouped = result.groupby(group_columns, observed=True, dropna=False, sort=False)
+            parts = [
+                grouped.size().rename(name)
+                if function == "size"
+                else grouped[column].agg(function).rename(name)
+                for name, column, function in specs
+            ]
+            result = pd.concat(parts, axis=1).reset_index()
+        else:
+            result = pd.DataFrame(
+                {
+                    name: [len(result) if function == "size" else result[column].agg(function)]
+                    for name, column, function in specs
+                }
+            )
+    elif columns:
+        result = result[[_resolve_column(result, column) for column in columns]]
+
+    if order_by:
+        sort_columns, ascending = [], []
+        for text in order_by:
+            parts = text.strip().rsplit(None, 1)
+            direction = parts[-1].lower() if len(parts) == 2 else ""
+            if direction in ("asc", "desc"):
+                name = parts[0]
+            else:
+                name, direction = text, "asc"
+            sort_columns.append(_resolve_column(result, name))
+            ascending.append(direction == "asc")
+        result = result.sort_values(sort_columns, ascending=ascending, kind="stable")
+    if limit is not None and limit >= 0:
+        result = result.head(limit)
+    return result
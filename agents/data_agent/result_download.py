@@ -0,0 +1,103 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+import logging
+from collections.abc import Iterator
+
+from google.api_core.exceptions import GoogleAPICallError
+
+from .clients import get_bigquery_storage_client
+from .constants import BQ_ARROW_MIN_ROWS, BQ_RESULT_DOWNLOAD_MODE, DISPLAY_NAME
+
+# --- Logging Configuration ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+def _arrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def choose_download_mode(total_rows: int | None) -> str:
+    """
+    Returns "arrow" if a result of `total_rows` rows should be downloaded with
+    the BigQuery Storage Read API as Arrow record batches, otherwise "rest".
+    """
+    if BQ_RESULT_DOWNLOAD_MODE == "rest" or not _arrow_available():
+        return "rest"
+    if BQ_RESULT_DOWNLOAD_MODE == "arrow":
+        return "arrow"
+    return "arrow" if (total_rows or 0) >= BQ_ARROW_MIN_ROWS else "rest"
+
+
+def stream_rows(
+    results, access_token: str | None = None, bqstorage_client=None
+) -> tuple[list[str], Iterator[tuple], str]:
+    """
+    Streams the rows of a finished query without materializing the result.
+
+    Small results are read through the REST row iterator. Large ones are read
+    with the BigQuery Storage Read API as Arrow record batches, which avoids
+    walking the REST pages row by row; only one batch is held at a time. If
+    the read session cannot be opened (e.g. the user may not create read
+    sessions), the result is read over REST instead.
+    Args:
+        results: The RowIterator returned by `QueryJob.result()`.
+        access_token: The user's OAuth access token, if any, used to pick the
+            Storage Read API client.
+        bqstorage_client: An explicit Storage Read API client, e.g. a local
+            fake; by default the pooled client for `access_token` is used.
+    Returns:
+        The column names, an iterator of row value tuples, and the download
+        mode that was used.
+    """
+    columns = [field.name for field in results.schema]
+    mode = choose_download_mode(results.total_rows)
+    if mode == "arrow":
+        if bqstorage_client is None:
+            bqstorage_client = get_bigquery_storage_client(access_token)
+        if bqstorage_client is None:
+            logger.info(
+                f"[{DISPLAY_NAME}] google-cloud-bigquery-storage is not installed. Downloading results over REST."
+            )
+            mode = "rest"
+        else:
+            try:
+                batches = iter(results.to_arrow_iterable(bqstorage_client=bqstorage_client))
+                # The read session is created when the first batch is read.
+                first_batch = next(batches, None)
+            except GoogleAPICallError as e:
+                logger.warning(
+                    f"[{DISPLAY_NAME}] Could not read the result with the BigQuery Storage Read API. Downloading it over REST. Error: {e}"
+                )
+                mode = "rest"
+            else:
+                if first_batch is not None:
+                    batches = itertools.chain([first_batch], batches)
+                return columns, _iter_arrow_rows(batches), mode
+    return columns, (tuple(row.values()) for row in results), mode
+
+
+def _iter_arrow_rows(batches) -> Iterator[tuple]:
+    for batch in batches:
+        yield from zip(*(column.to_pylist() for column in batch.columns))
@@ -0,0 +1,301 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import decimal
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Iterator
+
+from .constants import (
+    DISPLAY_NAME,
+    RESULT_STORE_ENABLED,
+    RESULT_STORE_MAX_BYTES,
+    RESULT_STORE_MAX_ROWS,
+    RESULT_STORE_SESSION_MAX_BYTES,
+)
+
+# --- Logging Configuration ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# pandas is imported on first use, so importing the agent stays fast.
+
+# String columns with at most this share of distinct values are stored as
+# categoricals, which keeps repeated values (regions, categories, ...) once.
+_CATEGORY_MAX_DISTINCT_RATIO = 0.5
+# Rows of a result converted to a frame at a time while it is collected.
+_COLLECT_CHUNK_ROWS = 10000
+
+
+def session_key(tool_context) -> str | None:
+    """
+    Returns the key of the ADK session a tool runs in, or None outside of one.
+    """
+    invocation_context = getattr(tool_context, "_invocation_context", None)
+    session = getattr(invocation_context, "session", None)
+    if session is None:
+        return None
+    return f"{session.app_name}/{session.user_id}/{session.id}"
+
+
+def build_frame(columns: list[str], rows: list[tuple]):
+    """
+    Builds a compact pandas frame from query result rows: NUMERIC values
+    become floats, DATE values datetimes, and repetitive strings categoricals.
+    """
+    import pandas as pd
+
+    return _compact(pd.DataFrame.from_records(rows, columns=columns))
+
+
+def _compact(frame):
+    """
+    Converts the object columns of a frame to compact types, in place.
+    """
+    import pandas as pd
+
+    for column in frame.columns:
+        series = frame[column]
+        if series.dtype != object:
+            continue
+        non_null = series.dropna()
+        if non_null.empty:
+            continue
+        first = non_null.iloc[0]
+        if isinstance(first, decimal.Decimal):
+            frame[column] = series.astype(float)
+        elif isinstance(first, datetime.date) and not isinstance(first, datetime.datetime):
+            frame[column] = pd.to_datetime(series)
+        elif isinstance(first, str) and (
+            non_null.nunique() <= _CATEGORY_MAX_DISTINCT_RATIO * len(non_null)
+        ):
+            frame[column] = series.astype("category")
+    return frame
+
+
+def _frame_bytes(frame) -> int:
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+
+class ResultCollector:
+    """
+    Keeps the rows of a query result as a compact frame while they stream to
+    the serializer. Rows are converted to a frame `_COLLECT_CHUNK_ROWS` at a
+    time, so only one chunk of rows is held as Python objects, and collecting
+    stops, dropping what was kept, once the frames pass `max_bytes`.
+    Iterate over the collector instead of the rows it wraps.
+    """
+
+    def __init__(
+        self,
+        columns: list[str],
+        rows: Iterator[tuple],
+        max_bytes: int = min(RESULT_STORE_MAX_BYTES, RESULT_STORE_SESSION_MAX_BYTES),
+    ):
+        self.columns = columns
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        # Set once the result is too large to keep, or could not be converted.
+        self.given_up = False
+        self._chunks = []
+        self._buffer: list[tuple] = []
+        self._rows = self._collect(rows)
+
+    def __iter__(self) -> Iterator[tuple]:
+        return self._rows
+
+    def _collect(self, rows: Iterator[tuple]) -> Iterator[tuple]:
+        for row in rows:
+            if not self.given_up:
+                self._buffer.append(row)
+                if len(self._buffer) >= _COLLECT_CHUNK_ROWS:
+                    self._flush()
+            yield row
+
+    def _flush(self) -> None:
+        buffer, self._buffer = self._buffer, []
+        if self.given_up or (not buffer and self._chunks):
+            return
+        try:
+            chunk = build_frame(self.columns, buffer)
+        except Exception as e:
+            logger.warning(f"[{DISPLAY_NAME}] Could not keep the query result for follow-up analysis. Error: {e}")
+            self._give_up()
+            return
+        self.size_bytes += _frame_bytes(chunk)
+        if self.size_bytes > self.max_bytes:
+            self._give_up()
+        else:
+            self._chunks.append(chunk)
+
+    def _give_up(self) -> None:
+        self.given_up = True
+        self._chunks = []
+
+    def frame(self):
+        """
+        Reads the rows the serializer left, unless the result is already too
+        large, and returns the frame of the whole result.
+        Returns:
+            The frame, or None if the result was too large to keep.
+        """
+        import pandas as pd
+
+        for _ in self._rows:
+            if self.given_up:
+                break
+        self._flush()
+        if self.given_up:
+            return None
+        if len(self._chunks) == 1:
+            return self._chunks[0]
+        # Chunks may differ in dtypes (e.g. categories), so compact again.
+        return _compact(pd.concat(self._chunks, ignore_index=True).infer_objects())
+
+
+def frame_rows(frame):
+    """
+    Returns the rows of a frame as tuples of plain Python values, with None
+    for missing values, for `serialize_result`.
+    """
+    values = frame.astype(object).where(frame.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+
+class _StoredResult:
+    __slots__ = ("sql", "frame", "size_bytes", "stored_at")
+
+    def __init__(self, sql: str, frame, size_bytes: int):
+        self.sql = sql
+        self.frame = frame
+        self.size_bytes = size_bytes
+        self.stored_at = time.time()
+
+
+class ResultStore:
+    """
+    An in-memory LRU of full query results, as pandas frames, each under a
+    handle scoped to the session it was stored in. The least recently used
+    results are evicted once a session holds more than `session_max_bytes`
+    or all sessions more than `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int, session_max_bytes: int):
+        self._max_bytes = max_bytes
+        self._session_max_bytes = session_max_bytes
+        self._lock = threading.Lock()
+        # (session, handle) -> result, least recently used first.
+        self._results: OrderedDict[tuple[str, str], _StoredResult] = OrderedDict()
+        self._bytes = 0
+        self._session_bytes: dict[str, int] = {}
+
+    def _evict(self, key: tuple[str, str]) -> None:
+        result = self._results.pop(key)
+        self._bytes -= result.size_bytes
+        session = key[0]
+        self._session_bytes[session] -= result.size_bytes
+        if not self._session_bytes[session]:
+            del self._session_bytes[session]
+
+    def put(self, session: str, sql: str, frame) -> str | None:
+        """
+        Stores a result for a session.
+        Returns:
+            The handle of the result, or None if it is larger than the
+            per-session limit.
+        """
+        size_bytes = _frame_bytes(frame)
+        if size_bytes > min(self._session_max_bytes, self._max_bytes):
+            return None
+        handle = f"result_{uuid.uuid4().hex[:8]}"
+        with self._lock:
+            for key in [key for key in self._results if key[0] == session]:
+                if self._session_bytes.get(session, 0) + size_bytes <= self._session_max_bytes:
+                    break
+                self._evict(key)
+            while self._results and self._bytes + size_bytes > self._max_bytes:
+                self._evict(next(iter(self._results)))
+            self._results[(session, handle)] = _StoredResult(sql, frame, size_bytes)
+            self._bytes += size_bytes
+            self._session_bytes[session] = self._session_bytes.get(session, 0) + size_bytes
+        return handle
+
+    def get(self, session: str, handle: str) -> _StoredResult | None:
+        """
+        Returns the result stored under a handle in a session, if still kept.
+        """
+        with self._lock:
+            result = self._results.get((session, handle))
+            if result is not None:
+                self._results.move_to_end((session, handle))
+            return result
+
+    def handles(self, session: str) -> list[str]:
+        """
+        Returns the handles of the results kept for a session, newest first.
+        """
+        with self._lock:
+            return [handle for key_session, handle in reversed(self._results) if key_session == session]
+
+
+result_store = ResultStore(
+    max_bytes=RESULT_STORE_MAX_BYTES, session_max_bytes=RESULT_STORE_SESSION_MAX_BYTES
+)
+
+
+def keeps_result(session: str | None, total_rows: int | None) -> bool:
+    """
+    Returns True if the full result of a query with `total_rows` rows should
+    be kept for the session.
+    """
+    return (
+        RESULT_STORE_ENABLED
+        and session is not None
+        and total_rows is not None
+        and total_rows <= RESULT_STORE_MAX_ROWS
+    )
+
+
+def store_result(session: str, sql: str, collector: ResultCollector) -> str | None:
+    """
+    Stores the frame of a query result collected while it was serialized for
+    the session. Failures are logged and never fail the query.
+    Returns:
+        The handle of the result, or None if it was not stored.
+    """
+    start_time = time.time()
+    try:
+        frame = collector.frame()
+        if frame is None:
+            logger.info(
+                f"[{DISPLAY_NAME}] The query result is too large to keep for follow-up analysis (more than {collector.max_bytes} bytes)."
+            )
+            return None
+        handle = result_store.put(session, sql, frame)
+    except Exception as e:
+        logger.warning(f"[{DISPLAY_NAME}] Could not keep the query result for follow-up analysis. Error: {e}")
+        return None
+    if handle is not None:
+        logger.info(
+            f"[{DISPLAY_NAME}] Kept the query result as {handle} ({len(frame)} rows, Duration: {time.time() - start_time:.2f} seconds)."
+        )
+    return handle
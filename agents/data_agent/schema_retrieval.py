@@ -0,0 +1,310 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import math
+import re
+import time
+from collections import OrderedDict
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.readonly_context import ReadonlyContext
+
+from .constants import (
+    DISPLAY_NAME,
+    SCHEMA_RETRIEVAL_EMBEDDING_MODEL,
+    SCHEMA_RETRIEVAL_MAX_JOIN_PARTNERS,
+    SCHEMA_RETRIEVAL_MAX_TABLES,
+    SCHEMA_RETRIEVAL_TOP_K,
+)
+from .datasets import dataset_state_key
+from .few_shot_index import FEW_SHOT_STATE_KEY, FewShotIndex, user_text
+from .instructions import build_instruction_from_context
+from .prompt_compiler import collect_tables, json_serial_default
+from .text_index import BM25Index
+
+# --- Logging Configuration ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# Session state key holding the tables selected for the current turn, so that
+# follow-up turns can keep them.
+RETRIEVED_TABLES_STATE_KEY = "retrieved_tables"
+
+# Weight of the embedding similarity in the combined score, when enabled.
+_EMBEDDING_WEIGHT = 0.5
+# Maximum characters of a table document sent to the embedding model.
+_EMBEDDING_MAX_CHARS = 8000
+_EMBEDDING_BATCH_SIZE = 100
+_INSTRUCTION_CACHE_SIZE = 64
+
+
+def _table_document(table_id: str, table: dict) -> str:
+    """
+    Returns the text a table is retrieved by. Table and column names are
+    repeated to weigh them above descriptions and values.
+    """
+    parts = [table_id] * 3
+    if table["description"]:
+        parts.append(table["description"])
+    for column in table["columns"]:
+        parts.extend([column["name"]] * 2)
+        if column.get("description"):
+            parts.append(column["description"])
+    for column_name, profile in table["profiles"].items():
+        parts.append(column_name)
+        for top_value in profile.get("top_n") or []:
+            value = top_value.get("value") if isinstance(top_value, dict) else top_value
+            if value is not None:
+                parts.append(str(value))
+    for aspect_data in table["aspects"].values():
+        parts.append(json.dumps(aspect_data, default=json_serial_default))
+    return "\n".join(parts)
+
+
+def _key_columns(table: dict) -> set[str]:
+    names = [column["name"] for column in table["columns"]] or list(table["profiles"])
+    return {
+        name.lower()
+        for name in names
+        if name.lower().endswith("_id") or re.search(r"[a-z]Id$", name)
+    }
+
+
+class SchemaRetriever:
+    """
+    A local retrieval index over the tables of the instruction context. It
+    builds an instruction for each user turn that describes only the tables
+    relevant to the question, their join partners, and the few-shot examples
+    selected by the FewShotIndex, so the prompt size does not grow with the
+    dataset.
+
+    Tables are ranked with BM25 over their names, descriptions, column names,
+    column descriptions and top values, combined with embedding similarity
+    when SCHEMA_RETRIEVAL_EMBEDDING_MODEL is set.
+    """
+
+    def __init__(self, context: dict, few_shot_index: FewShotIndex):
+        start_time = time.time()
+        self._context = context
+        self._tables = collect_tables(context)
+        self._table_ids = list(self._tables)
+        documents = [
+            _table_document(table_id, self._tables[table_id])
+            for table_id in self._table_ids
+        ]
+        self._table_index = BM25Index(documents)
+        self._few_shot_index = few_shot_index
+        self._join_partners = self._find_join_partners()
+        self._instructions: OrderedDict[tuple, str] = OrderedDict()
+        self._embedding_client = None
+        self._table_embeddings = None
+        if SCHEMA_RETRIEVAL_EMBEDDING_MODEL and documents:
+            self._embed_tables(documents)
+        duration = time.time() - start_time
+        logger.info(
+            f"[{DISPLAY_NAME}] --- Built schema retrieval index over {len(self._table_ids)} tables (Duration: {duration:.2f} seconds) ---"
+        )
+
+    def _find_join_partners(self) -> dict[str, list[str]]:
+        """
+        Returns the tables each table joins with: the tables named in its (or
+        their) Dataplex join relationship aspects or, for a dataset without
+        any, the tables sharing an ID column with it.
+        """
+        partners = {table_id: set() for table_id in self._table_ids}
+        for table_id, table in self._tables.items():
+            for aspect_key, data in table["aspects"].items():
+                aspect_type = aspect_key.split(".")[-1].lower()
+                if "join" not in aspect_type and "relationship" not in aspect_type:
+                    continue
+                aspect_text = json.dumps(data, default=json_serial_default)
+                for other_id in self._table_ids:
+                    if other_id != table_id and re.search(
+                        rf"\b{re.escape(other_id)}\b", aspect_text
+                    ):
+                        partners[table_id].add(other_id)
+                        partners[other_id].add(table_id)
+
+        if not any(partners.values()):
+            key_columns = {
+                table_id: _key_columns(table) for table_id, table in self._tables.items()
+            }
+            for table_id in self._table_ids:
+                for other_id in self._table_ids:
+                    if other_id != table_id and key_columns[table_id] & key_columns[other_id]:
+                        partners[table_id].add(other_id)
+        return {table_id: sorted(others) for table_id, others in partners.items()}
+
+    def _embed_tables(self, documents: list[str]) -> None:
+        try:
+            from google import genai
+
+            self._embedding_client = genai.Client()
+            embeddings = []
+            for i in range(0, len(documents), _EMBEDDING_BATCH_SIZE):
+                response = self._embedding_client.models.embed_content(
+                    model=SCHEMA_RETRIEVAL_EMBEDDING_MODEL,
+                    contents=[
+                        document[:_EMBEDDING_MAX_CHARS]
+                        for document in documents[i : i + _EMBEDDING_BATCH_SIZE]
+                    ],
+                )
+                embeddings.extend(embedding.values for embedding in response.embeddings)
+            self._table_embeddings = embeddings
+        except Exception as e:
+            logger.warning(
+                f"[{DISPLAY_NAME}] Could not embed the tables with '{SCHEMA_RETRIEVAL_EMBEDDING_MODEL}'. Using BM25 only. Error: {e}"
+            )
+            self._embedding_client = None
+            self._table_embeddings = None
+
+    async def _embedding_scores(self, question: str) -> list[float] | None:
+        if self._table_embeddings is None:
+            return None
+        try:
+            response = await self._embedding_client.aio.models.embed_content(
+                model=SCHEMA_RETRIEVAL_EMBEDDING_MODEL, contents=[question]
+            )
+        except Exception as e:
+            logger.warning(
+                f"[{DISPLAY_NAME}] Could not embed the question. Using BM25 only. Error: {e}"
+            )
+            return None
+        query = response.embeddings[0].values
+        query_norm = math.sqrt(sum(v * v for v in query)) or 1.0
+        scores = []
+        for embedding in self._table_embeddings:
+            norm = math.sqrt(sum(v * v for v in embedding)) or 1.0
+            similarity = sum(a * b for a, b in zip(query, embedding)) / (norm * query_norm)
+            scores.append(max(0.0, similarity))
+        return scores
+
+    async def select_tables(self, question: str, previous: list[str]) -> list[str]:
+        """
+        Returns the tables to describe for a question: the SCHEMA_RETRIEVAL_TOP_K
+        most relevant tables, their join partners, then the tables selected in
+        earlier turns, up to SCHEMA_RETRIEVAL_MAX_TABLES. When nothing in the
+        question matches (e.g. "yes, last month"), the previous selection is kept.
+        """
+        scores = self._table_index.scores(question)
+        top_score = max(scores, default=0.0)
+        if top_score > 0:
+            scores = [score / top_score for score in scores]
+        embedding_scores = await self._embedding_scores(question) if question else None
+        if embedding_scores is not None:
+            scores = [
+                (1 - _EMBEDDING_WEIGHT) * score + _EMBEDDING_WEIGHT * similarity
+                for score, similarity in zip(scores, embedding_scores)
+            ]
+        ranked = [
+            table_id
+            for score, table_id in sorted(
+                zip(scores, self._table_ids), key=lambda item: item[0], reverse=True
+            )
+            if score > 0
+        ]
+        if not ranked:
+            previous = [table_id for table_id in previous if table_id in self._tables]
+            return previous or self._table_ids[:SCHEMA_RETRIEVAL_TOP_K]
+
+        selected = ranked[:SCHEMA_RETRIEVAL_TOP_K]
+        rank = {table_id: i for i, table_id in enumerate(ranked)}
+        partners = []
+        for table_id in selected:
+            for partner_id in self._join_partners[table_id]:
+                if partner_id not in selected and partner_id not in partners:
+                    partners.append(partner_id)
+        partners.sort(key=lambda table_id: rank.get(table_id, len(rank)))
+        selected += partners[:SCHEMA_RETRIEVAL_MAX_JOIN_PARTNERS]
+        for table_id in previous:
+            if table_id in self._tables and table_id not in selected:
+                selected.append(table_id)
+        return selected[:SCHEMA_RETRIEVAL_MAX_TABLES]
+
+    async def before_agent_callback(self, callback_context: CallbackContext):
+        """
+        Selects the tables for the user's message once per turn, and keeps them
+        in the session state for the instruction provider.
+        """
+        question = user_text(callback_context.user_content)
+        state_key = dataset_state_key(RETRIEVED_TABLES_STATE_KEY)
+        previous = callback_context.state.get(state_key) or []
+        tables = await self.select_tables(question, previous)
+        callback_context.state[state_key] = tables
+        logger.info(f"[{DISPLAY_NAME}] Selected tables for this turn: {tables}")
+        return None
+
+    def instruction(self, readonly_context: ReadonlyContext) -> str:
+        """
+        The instruction provider of the agent: the instruction built from the
+        context of the tables and few-shot examples selected for the current
+        turn.
+        """
+        tables = readonly_context.state.get(dataset_state_key(RETRIEVED_TABLES_STATE_KEY))
+        if tables is None:
+            tables = self._table_ids[:SCHEMA_RETRIEVAL_TOP_K]
+        examples = readonly_context.state.get(dataset_state_key(FEW_SHOT_STATE_KEY)) or []
+        return self.build_instruction(tables, examples)
+
+    def build_instruction(self, tables: list[str], examples: list[int]) -> str:
+        key = (tuple(tables), tuple(examples))
+        if key in self._instructions:
+            self._instructions.move_to_end(key)
+            return self._instructions[key]
+
+        keep = set(tables)
+
+        def in_scope(table_name: str) -> bool:
+            return table_name.split(".")[-1] in keep
+
+        context = self._context
+        instruction = build_instruction_from_context(
+            dict(
+                context,
+                table_metadata=[
+                    metadata
+                    for metadata in context.get("table_metadata") or []
+                    if in_scope(metadata["table_name"])
+                ],
+                table_schemas=[
+                    schema
+                    for schema in context.get("table_schemas") or []
+                    if in_scope(schema["table_name"])
+                ],
+                data_profiles=[
+                    profile
+                    for profile in context.get("data_profiles") or []
+                    if in_scope(profile["source_table_id"])
+                ],
+                sample_data=[
+                    item
+                    for item in context.get("sample_data") or []
+                    if in_scope(item["table_name"])
+                ],
+                few_shot_examples=[self._few_shot_index.render(examples)],
+                other_tables=[
+                    table_id for table_id in self._table_ids if table_id not in keep
+                ],
+            )
+        )
+        self._instructions[key] = instruction
+        while len(self._instructions) > _INSTRUCTION_CACHE_SIZE:
+            self._instructions.popitem(last=False)
+        return instruction
@@ -0,0 +1,276 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import re
+
+# Functions whose result changes between runs of the same SQL. Queries using
+# them are never served from a cache, like in BigQuery's own result cache.
+_VOLATILE_FUNCTIONS_RE = re.compile(
+    r"\b(RAND|GENERATE_UUID|SESSION_USER|CURRENT_TIMESTAMP|CURRENT_DATETIME|CURRENT_TIME)\b",
+    re.IGNORECASE,
+)
+# CURRENT_DATE only changes at (whole-hour offset) midnight, so results can be
+# cached within the hour.
+_CURRENT_DATE_RE = re.compile(r"\bCURRENT_DATE\b", re.IGNORECASE)
+_READ_ONLY_STATEMENT_RE = re.compile(r"^\(*\s*(SELECT|WITH)\b", re.IGNORECASE)
+# Numeric literals, including those with a fraction or an exponent.
+_NUMBER_RE = re.compile(r"(?<![\w.])\d+(\.\d*)?([eE][+-]?\d+)?\b|(?<![\w.])\.\d+([eE][+-]?\d+)?\b")
+# A list of literal placeholders, e.g. the values of an IN list.
+_PLACEHOLDER_LIST_RE = re.compile(r"\?(\s*,\s*\?)+")
+
+# Tokens of GoogleSQL code, between string literals and comments.
+_TOKEN_RE = re.compile(
+    r"(?P<number>0[xX][0-9A-Fa-f]+|\d+\.\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?|\d+(?:[eE][+-]?\d+)?)"
+    r"|(?P<param>@@?\w+)"
+    r"|(?P<ident>[^\W\d]\w*)"
+    r"|(?P<op>=>|->|\S)"
+)
+# Prefixes of raw and bytes literals, e.g. r'\d+'.
+_LITERAL_PREFIXES = {"R", "B", "RB", "BR"}
+
+# Words that are never column references: GoogleSQL keywords, date parts, type
+# names and functions callable without parentheses. A column named like one
+# of them (e.g. `date`) is simply not checked.
+SQL_KEYWORDS = frozenset(
+    """
+    ALL AND ANY ARRAY AS ASC ASSERT_ROWS_MODIFIED AT BETWEEN BY CASE CAST COLLATE
+    CONTAINS CREATE CROSS CUBE CURRENT DEFAULT DEFINE DESC DISTINCT ELSE END ENUM
+    ESCAPE EXCEPT EXCLUDE EXISTS EXTRACT FALSE FETCH FOLLOWING FOR FROM FULL GROUP
+    GROUPING GROUPS HASH HAVING IF IGNORE IN INNER INTERSECT INTERVAL INTO IS JOIN
+    LATERAL LEFT LIKE LIMIT LOOKUP MERGE NATURAL NEW NO NOT NULL NULLS OF ON OR
+    ORDER OUTER OVER PARTITION PRECEDING PROTO QUALIFY RANGE RECURSIVE RESPECT
+    RIGHT ROLLUP ROWS SELECT SET SOME STRUCT TABLESAMPLE THEN TO TREAT TRUE
+    UNBOUNDED UNION UNNEST USING WHEN WHERE WINDOW WITH WITHIN
+    FIRST LAST OFFSET ORDINAL SAFE_OFFSET SAFE_ORDINAL ROW VALUE FORMAT ZONE
+    SYSTEM SYSTEM_TIME PERCENT REPLACE PIVOT UNPIVOT SAFE SETS OPTIONS
+    CORRESPONDING UNKNOWN NFC NFD NFKC NFKD
+    MICROSECOND MILLISECOND SECOND MINUTE HOUR DAY DAYOFWEEK DAYOFYEAR WEEK ISOWEEK
+    MONTH QUARTER YEAR ISOYEAR SUNDAY MONDAY TUESDAY WEDNESDAY THURSDAY FRIDAY
+    SATURDAY
+    INT64 INT INTEGER SMALLINT BIGINT TINYINT BYTEINT NUMERIC DECIMAL BIGNUMERIC
+    BIGDECIMAL FLOAT64 BOOL BOOLEAN STRING BYTES DATE DATETIME TIME TIMESTAMP
+    GEOGRAPHY JSON
+    CURRENT_DATE CURRENT_DATETIME CURRENT_TIME CURRENT_TIMESTAMP SESSION_USER
+    """.split()
+)
+# Clauses that filter rows, and the keywords that end them.
+_FILTER_CLAUSES = frozenset({"WHERE", "ON", "QUALIFY"})
+_FILTER_CLAUSE_END = frozenset(
+    {"SELECT", "GROUP", "HAVING", "WINDOW", "ORDER", "LIMIT", "UNION",
+     "INTERSECT", "EXCEPT", "JOIN", "USING"}
+)
+
+
+def split_sql(sql: str) -> list[tuple[str, str]]:
+    """
+    Splits GoogleSQL text into ("code", text), ("string", text) and
+    ("comment", text) segments, so that callers can transform code without
+    touching string literals, quoted identifiers or comments.
+    """
+    segments = []
+    code_start = 0
+    i = 0
+    n = len(sql)
+    while i < n:
+        ch = sql[i]
+        end = None
+        kind = None
+        if ch == "-" and sql.startswith("--", i) or ch == "#":
+            end = sql.find("\n", i)
+            end = n if end == -1 else end
+            kind = "comment"
+        elif ch == "/" and sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            end = n if end == -1 else end + 2
+            kind = "comment"
+        elif ch in ("'", '"', "`"):
+            kind = "string"
+            # Optional raw/bytes prefixes (r'', b'', rb'') belong to the code segment.
+            quote = sql[i : i + 3] if sql[i : i + 3] in ("'''", '"""') else ch
+            j = i + len(quote)
+            while j < n:
+                if sql[j] == "\\" and ch != "`":
+                    j += 2
+                    continue
+                if sql.startswith(quote, j):
+                    break
+                j += 1
+            end = min(n, j + len(quote))
+        if kind is None:
+            i += 1
+            continue
+        if code_start < i:
+            segments.append(("code", sql[code_start:i]))
+        segments.append((kind, sql[i:end]))
+        i = code_start = end
+    if code_start < n:
+        segments.append(("code", sql[code_start:]))
+    return segments
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Normalizes SQL text for use as a cache key: comments are removed,
+    whitespace outside of literals is collapsed and trailing semicolons are
+    dropped. String literals and quoted identifiers are kept verbatim.
+    """
+    parts = []
+    code_run = []
+    for kind, text in split_sql(sql):
+        if kind == "string":
+            parts.append(re.sub(r"\s+", " ", "".join(code_run)))
+            parts.append(text)
+            code_run = []
+        else:
+            # Comments become whitespace between the surrounding code.
+            code_run.append(" " if kind == "comment" else text)
+    parts.append(re.sub(r"\s+", " ", "".join(code_run)))
+    return "".join(parts).strip().rstrip("; ").strip()
+
+
+def query_shape(sql: str) -> str:
+    """
+    Returns the shape of a query: the normalized SQL with string and numeric
+    literals replaced by "?" and lists of literals collapsed to one, so that
+    queries differing only in their constants (dates, IDs, IN lists, LIMITs)
+    have the same shape. Quoted identifiers are kept.
+    """
+    parts = []
+    for kind, text in split_sql(normalize_sql(sql)):
+        if kind == "string" and not text.startswith("`"):
+            parts.append("?")
+        elif kind == "code":
+            parts.append(_NUMBER_RE.sub("?", text))
+        else:
+            parts.append(text)
+    return _PLACEHOLDER_LIST_RE.sub("?", "".join(parts))
+
+
+def code_only(sql: str) -> str:
+    """
+    Returns the SQL with string literals, quoted identifiers and comments
+    blanked out, for keyword and function detection.
+    """
+    return "".join(
+        text if kind == "code" else " " for kind, text in split_sql(sql)
+    )
+
+
+def is_read_only_query(sql: str) -> bool:
+    """
+    Returns True if the SQL is a single SELECT (or WITH ... SELECT) statement.
+    """
+    code = code_only(sql).strip().rstrip(";").strip()
+    return bool(_READ_ONLY_STATEMENT_RE.match(code)) and ";" not in code
+
+
+def is_volatile_query(sql: str) -> bool:
+    """
+    Returns True if the SQL calls functions whose result changes between runs.
+    """
+    return bool(_VOLATILE_FUNCTIONS_RE.search(code_only(sql)))
+
+
+def uses_current_date(sql: str) -> bool:
+    return bool(_CURRENT_DATE_RE.search(code_only(sql)))
+
+
+def sql_fingerprint(sql: str, *extra: str) -> str:
+    """
+    Returns a stable hash of the normalized SQL and any extra key parts.
+    """
+    key = "\n".join([normalize_sql(sql), *extra])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class Token:
+    """
+    A token of GoogleSQL, with its kind (see `tokenize_sql`), its text, its
+    text uppercased for identifiers, and its offsets in the SQL.
+    """
+
+    __slots__ = ("kind", "text", "upper", "start", "end")
+
+    def __init__(self, kind: str, text: str, start: int, end: int):
+        self.kind = kind
+        self.text = text
+        self.upper = text.upper() if kind == "ident" else text
+        self.start = start
+        self.end = end
+
+
+def tokenize_sql(sql: str) -> list[Token]:
+    """
+    Splits GoogleSQL into "ident", "quoted" (backtick identifier), "string",
+    "number", "param" and "op" tokens. Comments are dropped.
+    """
+    tokens = []
+    offset = 0
+    for kind, text in split_sql(sql):
+        if kind == "string":
+            if text.startswith("`"):
+                tokens.append(Token("quoted", text.strip("`"), offset, offset + len(text)))
+            else:
+                if (
+                    tokens
+                    and tokens[-1].kind == "ident"
+                    and tokens[-1].upper in _LITERAL_PREFIXES
+                    and tokens[-1].end == offset
+                ):
+                    tokens.pop()
+                tokens.append(Token("string", text, offset, offset + len(text)))
+        elif kind == "code":
+            for match in _TOKEN_RE.finditer(text):
+                tokens.append(
+                    Token(match.lastgroup, match.group(), offset + match.start(), offset + match.end())
+                )
+        offset += len(text)
+    return tokens
+
+
+def is_name(token: Token | None) -> bool:
+    """
+    Returns True if the token is an identifier that is not a keyword, or a
+    quoted identifier.
+    """
+    return token is not None and (
+        token.kind == "quoted" or token.kind == "ident" and token.upper not in SQL_KEYWORDS
+    )
+
+
+def filtered_names(sql_query: str) -> set[str]:
+    """
+    Returns the names, lowercase, used in the WHERE, ON and QUALIFY clauses
+    of a query, including those of subqueries. Each part of a dotted path
+    (e.g. `t.order_date`) is a name of its own.
+    """
+    names = set()
+    # Whether the tokens are in a filter clause, per parenthesis depth.
+    in_filter = [False]
+    for token in tokenize_sql(sql_query):
+        if token.text == "(":
+            in_filter.append(in_filter[-1])
+        elif token.text == ")":
+            if len(in_filter) > 1:
+                in_filter.pop()
+        elif token.text == ";":
+            in_filter = [False]
+        elif token.kind == "ident" and token.upper in _FILTER_CLAUSES:
+            in_filter[-1] = True
+        elif token.kind == "ident" and token.upper in _FILTER_CLAUSE_END:
+            in_filter[-1] = False
+        elif in_filter[-1] and is_name(token):
+            names.update(part.lower() for part in token.text.split("."))
+    return names
@@ -0,0 +1,420 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import difflib
+
+from .datasets import current_dataset
+from .prompt_compiler import collect_tables
+from .sql_utils import SQL_KEYWORDS, Token, is_name, is_read_only_query, tokenize_sql
+
+# The validation only rejects what BigQuery would certainly reject: wherever a
+# name could come from something the catalog does not describe (a CTE, a
+# subquery, UNNEST, a table function, another dataset), the columns are not
+# checked at all.
+
+# Most problems reported in one rejection.
+_MAX_PROBLEMS = 5
+# Most column names listed when a column has no close match.
+_MAX_LISTED_COLUMNS = 30
+
+# Keywords that end an operand, so that a name right after them is an
+# implicit alias, e.g. `CASE ... END status` or `SELECT NULL note`.
+_OPERAND_KEYWORDS = frozenset(
+    {"END", "NULL", "TRUE", "FALSE", "CURRENT_DATE", "CURRENT_DATETIME",
+     "CURRENT_TIME", "CURRENT_TIMESTAMP", "SESSION_USER"}
+)
+# Clauses that end the FROM clause of a SELECT.
+_FROM_CLAUSE_END = frozenset(
+    {"WHERE", "GROUP", "HAVING", "QUALIFY", "WINDOW", "ORDER", "LIMIT", "UNION",
+     "INTERSECT", "EXCEPT", "SELECT"}
+)
+# Modifiers of `ANY_VALUE(x HAVING MAX y)` and similar aggregate calls.
+_HAVING_MODIFIERS = frozenset({"MAX", "MIN"})
+# Constructs whose names the validation does not resolve; their presence
+# turns off the column checks.
+_UNRESOLVED_KEYWORDS = frozenset({"PIVOT", "UNPIVOT", "MATCH_RECOGNIZE"})
+# Pseudo-columns of partitioned, wildcard and external tables.
+_PSEUDO_COLUMNS = frozenset(
+    {"_partitiontime", "_partitiondate", "_table_suffix", "_file_name"}
+)
+
+
+class SchemaCatalog:
+    """
+    The tables of a dataset and their columns, as described by the
+    instruction context, to validate queries against without calling
+    BigQuery. Column names are matched case-insensitively, like in
+    BigQuery; table names are case-sensitive.
+    Args:
+        project_id: The project of the dataset.
+        dataset_name: The dataset.
+        tables: The columns of each table (None where they are not known);
+            nested fields by their dotted path.
+        complete: Whether `tables` lists every table of the dataset, so a
+            table missing from it does not exist.
+    """
+
+    def __init__(
+        self,
+        project_id: str | None,
+        dataset_name: str | None,
+        tables: dict[str, list[str] | None],
+        complete: bool,
+    ):
+        self.project_id = project_id
+        self.dataset_name = dataset_name
+        self.complete = complete
+        # Table -> lowercase top-level column name -> column name.
+        self.tables: dict[str, dict[str, str] | None] = {}
+        for table_id, columns in tables.items():
+            self.tables[table_id] = (
+                {column.split(".")[0].lower(): column.split(".")[0] for column in columns}
+                if columns
+                else None
+            )
+
+    @classmethod
+    def from_context(cls, context: dict) -> "SchemaCatalog":
+        """
+        Builds the catalog of the current dataset from its instruction context:
+        the columns of the INFORMATION_SCHEMA or Dataplex schema of each table,
+        and, when all tables of the dataset are in scope, the table list of
+        the freshness signals.
+        """
+        config = current_dataset()
+        tables = {
+            table_id: [column["name"] for column in table["columns"]] or None
+            for table_id, table in collect_tables(context).items()
+        }
+        freshness = context.get("freshness") or {}
+        for table_id in freshness.get("tables_modified") or {}:
+            tables.setdefault(table_id, None)
+        complete = not config.table_names and bool(freshness.get("tables_modified"))
+        return cls(config.project_id, config.dataset_name, tables, complete)
+
+    def full_table_id(self, table_id: str) -> str:
+        return f"{self.project_id}.{self.dataset_name}.{table_id}"
+
+
+def schema_catalog(tool_context) -> SchemaCatalog | None:
+    """
+    Returns the schema catalog of the agent a tool runs in, or None before
+    its instruction context is loaded (or for agents without one).
+    """
+    invocation_context = getattr(tool_context, "_invocation_context", None)
+    instruction = getattr(getattr(invocation_context, "agent", None), "instruction", None)
+    catalog = getattr(instruction, "schema_catalog", None)
+    return catalog() if callable(catalog) else None
+
+
+def _ends_operand(token: Token | None) -> bool:
+    return token is not None and (
+        is_name(token)
+        or token.kind in ("number", "string", "param")
+        or token.text in (")", "]")
+        or token.kind == "ident" and token.upper in _OPERAND_KEYWORDS
+    )
+
+
+def _read_path(tokens: list[Token], i: int) -> tuple[list[str], int]:
+    """
+    Reads a dotted path of names starting at token i, splitting quoted
+    parts like `project.dataset.table`.
+    Returns:
+        The parts and the index of the token after the path.
+    """
+    parts = []
+    while i < len(tokens) and tokens[i].kind in ("ident", "quoted"):
+        parts.extend(tokens[i].text.split(".") if tokens[i].kind == "quoted" else [tokens[i].text])
+        if (
+            i + 2 < len(tokens)
+            and tokens[i + 1].text == "."
+            and tokens[i + 2].kind in ("ident", "quoted")
+        ):
+            i += 2
+        else:
+            i += 1
+            break
+    return parts, i
+
+
+def _suggest(name: str, candidates, case_sensitive: bool = False) -> list[str]:
+    candidates = list(candidates)
+    exact_case = [candidate for candidate in candidates if candidate.lower() == name.lower()]
+    if exact_case and case_sensitive:
+        return exact_case[:1]
+    lowered = {candidate.lower(): candidate for candidate in candidates}
+    return [
+        lowered[match]
+        for match in difflib.get_close_matches(name.lower(), list(lowered), n=3, cutoff=0.6)
+    ]
+
+
+def _did_you_mean(suggestions: list[str]) -> str:
+    if not suggestions:
+        return ""
+    return " Did you mean " + " or ".join(f"`{suggestion}`" for suggestion in suggestions) + "?"
+
+
+class _Query:
+    """
+    What one pass over the tokens of a query finds: the tables it reads, the
+    names it defines (aliases, CTEs, windows) and whether all its names can be
+    resolved against the catalog.
+    """
+
+    def __init__(self, tokens: list[Token], catalog: SchemaCatalog):
+        self.tokens = tokens
+        self.catalog = catalog
+        self.problems: list[str] = []
+        # Alias (lowercase) -> catalog table it stands for, or None.
+        self.sources: dict[str, str | None] = {}
+        self.tables: list[str] = []
+        self.defined: set[str] = set()
+        self.resolvable = True
+        # Token indexes of table references, skipped by the column checks.
+        self.table_tokens: set[int] = set()
+        self._scan()
+
+    def _scan(self) -> None:
+        tokens = self.tokens
+        # Per open parenthesis: the function it belongs to, and whether the
+        # FROM clause of the SELECT at that depth is open.
+        functions = [None]
+        in_from = [False]
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            previous = tokens[i - 1] if i else None
+            following = tokens[i + 1] if i + 1 < len(tokens) else None
+            if token.text == "(":
+                functions.append(previous.upper if previous is not None and previous.kind == "ident" else None)
+                in_from.append(False)
+            elif token.text == ")" and len(functions) > 1:
+                functions.pop()
+                in_from.pop()
+            elif token.text == ";":
+                in_from[-1] = False
+            elif token.text == "->" or token.kind == "ident" and token.upper in _UNRESOLVED_KEYWORDS:
+                self.resolvable = False
+            elif token.kind == "ident" and token.upper in ("STRUCT", "ARRAY") and following is not None and following.text == "<":
+                # Typed constructors declare field names.
+                self.resolvable = False
+            elif token.kind == "ident" and token.upper == "FROM":
+                is_distinct_from = (
+                    previous is not None
+                    and previous.upper == "DISTINCT"
+                    and i >= 2
+                    and tokens[i - 2].upper in ("IS", "NOT")
+                )
+                if functions[-1] != "EXTRACT" and not is_distinct_from:
+                    in_from[-1] = True
+                    i = self._table_reference(i + 1)
+                    continue
+            elif token.kind == "ident" and token.upper == "JOIN":
+                in_from[-1] = True
+                i = self._table_reference(i + 1)
+                continue
+            elif token.text == "," and in_from[-1]:
+                i = self._table_reference(i + 1)
+                continue
+            elif token.kind == "ident" and token.upper in _FROM_CLAUSE_END:
+                in_from[-1] = False
+
+            if token.kind == "ident" and token.upper == "AS" and is_name(following):
+                self.defined.add(following.text.lower())
+            elif is_name(token) and _ends_operand(previous):
+                # An implicit alias, e.g. `SUM(x) total` or `orders o`.
+                self.defined.add(token.text.lower())
+            if is_name(token) and following is not None and following.upper == "AS":
+                after = tokens[i + 2] if i + 2 < len(tokens) else None
+                if after is not None and after.text == "(":
+                    # A CTE or a named window: `name AS (`.
+                    self.defined.add(token.text.lower())
+            i += 1
+
+    def _table_reference(self, i: int) -> int:
+        """
+        Reads the table reference starting at token i, checks the table and
+        records its alias.
+        Returns:
+            The index of the token after the reference.
+        """
+        tokens = self.tokens
+        if i >= len(tokens):
+            return i
+        if tokens[i].text == "(" or tokens[i].upper == "UNNEST":
+            # A subquery or an array: its columns are not in the catalog.
+            self.resolvable = False
+            return i
+        if tokens[i].kind not in ("ident", "quoted") or tokens[i].kind == "ident" and tokens[i].upper in SQL_KEYWORDS:
+            return i
+        start = i
+        parts, i = _read_path(tokens, i)
+        following = tokens[i] if i < len(tokens) else None
+        if following is not None and (
+            following.text == "(" or following.text == "-" and following.start == tokens[i - 1].end
+        ):
+            # A table function, or an unquoted project ID with dashes.
+            self.resolvable = False
+            return i
+        self.table_tokens.update(range(start, i))
+
+        table_id = self._resolve_table(parts)
+        alias = None
+        j = i
+        if j < len(tokens) and tokens[j].upper == "AS":
+            j += 1
+        if j < len(tokens) and is_name(tokens[j]):
+            alias = tokens[j].text
+            self.table_tokens.add(j)
+        self.sources[(alias or parts[-1]).lower()] = table_id
+        if table_id is None or self.catalog.tables.get(table_id) is None:
+            self.resolvable = False
+        else:
+            self.tables.append(table_id)
+        return i
+
+    def _resolve_table(self, parts: list[str]) -> str | None:
+        """
+        Returns the catalog table a table path refers to, or None for paths
+        outside of the catalog, reporting paths that cannot be valid.
+        """
+        catalog = self.catalog
+        if any(part.endswith("*") for part in parts):
+            return None
+        if len(parts) == 1:
+            name = parts[0]
+            if name.lower() in self.defined or name.lower() in self.sources:
+                # A CTE (or an alias of one).
+                return None
+            if name in catalog.tables:
+                self.problems.append(
+                    f"Table `{name}` is not qualified with a project and dataset; use `{catalog.full_table_id(name)}`."
+                )
+            else:
+                suggestions = [catalog.full_table_id(match) for match in _suggest(name, catalog.tables, True)]
+                self.problems.append(
+                    f"Table `{name}` is not qualified with a project and dataset, e.g. "
+                    f"`{catalog.full_table_id('table')}`.{_did_you_mean(suggestions)}"
+                )
+            return None
+        if len(parts) == 2:
+            if parts[0].lower() in self.sources:
+                # A correlated array path, e.g. `orders o, o.items`.
+                return None
+            project_id, (dataset_name, table_id) = catalog.project_id, parts
+        elif len(parts) == 3:
+            project_id, dataset_name, table_id = parts
+        else:
+            return None
+        if project_id != catalog.project_id or dataset_name != catalog.dataset_name:
+            return None
+        if table_id in catalog.tables:
+            return table_id
+        if catalog.complete:
+            suggestions = [catalog.full_table_id(match) for match in _suggest(table_id, catalog.tables, True)]
+            self.problems.append(
+                f"Table `{catalog.full_table_id(table_id)}` does not exist in dataset "
+                f"`{catalog.project_id}.{catalog.dataset_name}`.{_did_you_mean(suggestions)}"
+            )
+        return None
+
+    def check_columns(self) -> None:
+        """
+        Reports column references that no table of the query has. Only run
+        when every name of the query resolves to the catalog.
+        """
+        tokens = self.tokens
+        catalog = self.catalog
+        all_columns: dict[str, str] = {}
+        for table_id in self.tables:
+            all_columns.update(catalog.tables[table_id])
+        reported = set()
+        i = 0
+        while i < len(tokens) and len(self.problems) < _MAX_PROBLEMS:
+            token = tokens[i]
+            previous = tokens[i - 1] if i else None
+            if i in self.table_tokens or token.kind not in ("ident", "quoted") or (previous is not None and previous.text in (".", "@")):
+                i += 1
+                continue
+            parts, end = _read_path(tokens, i)
+            following = tokens[end] if end < len(tokens) else None
+            if following is not None and following.text in ("(", "=>"):
+                # A function or a named argument.
+                i = end
+                continue
+            if token.kind == "ident" and token.upper in SQL_KEYWORDS:
+                i = end
+                continue
+            if token.kind == "ident" and token.upper in _HAVING_MODIFIERS and previous is not None and previous.upper == "HAVING":
+                i = end
+                continue
+            if previous is not None and previous.upper == "AS":
+                # An alias definition (or a type in CAST ... AS).
+                i = end
+                continue
+            first = parts[0].lower()
+            if len(parts) > 1 and first in self.sources:
+                table_id = self.sources[first]
+                column = parts[1]
+                columns = catalog.tables.get(table_id) if table_id else None
+                if columns is not None and column.lower() not in columns and column.lower() not in _PSEUDO_COLUMNS and column != "*":
+                    key = (table_id, column.lower())
+                    if key not in reported:
+                        reported.add(key)
+                        self.problems.append(
+                            f"Column `{column}` is not in table `{catalog.full_table_id(table_id)}` "
+                            f"(`{parts[0]}`).{self._column_hint(column, columns)}"
+                        )
+            elif first not in all_columns and first not in self.defined and first not in self.sources and first not in _PSEUDO_COLUMNS:
+                if first not in reported:
+                    reported.add(first)
+                    tables = ", ".join(f"`{catalog.full_table_id(table_id)}`" for table_id in dict.fromkeys(self.tables))
+                    self.problems.append(
+                        f"Unrecognized name `{parts[0]}`: no table of the query ({tables}) has such a column."
+                        f"{self._column_hint(parts[0], all_columns)}"
+                    )
+            i = end
+
+    @staticmethod
+    def _column_hint(name: str, columns: dict[str, str]) -> str:
+        suggestions = _suggest(name, columns.values())
+        if suggestions:
+            return _did_you_mean(suggestions)
+        names = list(columns.values())
+        listed = ", ".join(names[:_MAX_LISTED_COLUMNS]) + (", ..." if len(names) > _MAX_LISTED_COLUMNS else "")
+        return f" The columns are: {listed}."
+
+
+def validate_query(sql_query: str, catalog: SchemaCatalog | None) -> str | None:
+    """
+    Validates the table and column references of a read-only query against
+    the schema catalog, without calling BigQuery: tables must be qualified
+    with their dataset and exist, and columns must exist in the tables the
+    query reads. Other statements, and names the catalog cannot resolve
+    (CTEs, subqueries, UNNEST, other datasets), are left to BigQuery.
+    Returns:
+        Why the query is invalid, with close matches for misspelled names,
+        or None if no problem was found.
+    """
+    if catalog is None or not catalog.tables or not is_read_only_query(sql_query):
+        return None
+    query = _Query(tokenize_sql(sql_query), catalog)
+    if query.resolvable and not query.problems and query.tables:
+        query.check_columns()
+    if not query.problems:
+        return None
+    return " ".join(query.problems[:_MAX_PROBLEMS])
+
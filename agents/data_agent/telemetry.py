@@ -0,0 +1,329 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import threading
+import time
+
+from opentelemetry import metrics, trace
+from opentelemetry.trace import Status, StatusCode
+
+from .constants import (
+    DISPLAY_NAME,
+    TELEMETRY_EXPORT_INTERVAL_SECONDS,
+    TELEMETRY_EXPORTERS,
+    TELEMETRY_FILE_PATH,
+    TELEMETRY_PROMETHEUS_PORT,
+)
+
+# --- Logging Configuration ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+_INSTRUMENTATION_NAME = "data_agent"
+# Histogram buckets of the operation latency, in seconds.
+_DURATION_BUCKETS = [
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300,
+]
+_ROWS_BUCKETS = [0, 1, 10, 100, 1000, 10000, 100000, 1000000, 10000000]
+# Attributes also recorded on the metrics; all others go on the span only.
+_METRIC_ATTRIBUTES = ("operation", "outcome", "credential_mode", "cache_hit")
+
+tracer = trace.get_tracer(_INSTRUMENTATION_NAME)
+meter = metrics.get_meter(_INSTRUMENTATION_NAME)
+operation_duration = meter.create_histogram(
+    "data_agent.operation.duration",
+    unit="s",
+    description="Latency of the agent's context fetchers and tool calls.",
+)
+operation_rows = meter.create_histogram(
+    "data_agent.operation.rows",
+    unit="{row}",
+    description="Rows returned by the agent's context fetchers and tool calls.",
+)
+bigquery_retries = meter.create_counter(
+    "data_agent.bigquery.retries",
+    unit="{retry}",
+    description="BigQuery calls and query jobs retried after a transient error.",
+)
+bigquery_hedges = meter.create_counter(
+    "data_agent.bigquery.hedges",
+    unit="{job}",
+    description="Duplicate query jobs submitted for queries whose job was still queued.",
+)
+bigquery_hedge_errors = meter.create_counter(
+    "data_agent.bigquery.hedge_errors",
+    unit="{error}",
+    description="Duplicate query jobs that could not be submitted.",
+)
+bigquery_admission_wait = meter.create_histogram(
+    "data_agent.bigquery.admission_wait",
+    unit="s",
+    description="Time queries waited for the job scheduler to admit (or reject) their job.",
+)
+
+# The attributes of the operation running in the current context. Worker
+# threads started with asyncio.to_thread see the same dictionary.
+_current_attributes: contextvars.ContextVar[dict | None] = contextvars.ContextVar(
+    "data_agent_telemetry_attributes", default=None
+)
+
+
+def set_attributes(**attributes) -> None:
+    """
+    Sets attributes of the operation running in the current context, on its
+    span and, for outcome, credential_mode and cache_hit, on its metrics.
+    None values are skipped.
+    """
+    attributes = {key: value for key, value in attributes.items() if value is not None}
+    current = _current_attributes.get()
+    if current is not None:
+        current.update(attributes)
+    span = trace.get_current_span()
+    for key, value in attributes.items():
+        span.set_attribute(f"data_agent.{key}", value)
+
+
+def count_event(key: str, counter) -> None:
+    """
+    Adds one to a count attribute (e.g. retries) of the operation running in
+    the current context, and to its counter, labelled with the operation.
+    """
+    current = _current_attributes.get()
+    set_attributes(**{key: (current or {}).get(key, 0) + 1})
+    counter.add(1, {"operation": current["operation"]} if current else {})
+
+
+def record_error(error: Exception) -> None:
+    """
+    Marks the operation running in the current context as failed, for errors
+    it handles instead of raising.
+    """
+    set_attributes(outcome="error")
+    trace.get_current_span().record_exception(error)
+
+
+def record_query_job(query_job) -> None:
+    """
+    Sets the BigQuery job ID, bytes processed and cache hit of a finished
+    query job on the span of the current operation.
+    """
+    span = trace.get_current_span()
+    span.set_attribute("bigquery.job_id", query_job.job_id or "")
+    if query_job.total_bytes_processed is not None:
+        span.set_attribute("bigquery.bytes_processed", query_job.total_bytes_processed)
+    if getattr(query_job, "cache_hit", None) is not None:
+        span.set_attribute("bigquery.cache_hit", query_job.cache_hit)
+
+
+class _Operation:
+    """
+    The span and metrics of one call of an instrumented function.
+    """
+
+    def __init__(self, operation: str, attributes: dict):
+        self.attributes = {"operation": operation, "outcome": "success", **attributes}
+        self._span_context = tracer.start_as_current_span(
+            operation, record_exception=False, set_status_on_exception=False
+        )
+
+    def __enter__(self):
+        self._start_time = time.perf_counter()
+        self._span = self._span_context.__enter__()
+        self._token = _current_attributes.set(self.attributes)
+        set_attributes(**self.attributes)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start_time
+        if isinstance(exc, asyncio.CancelledError):
+            self.attributes["outcome"] = "cancelled"
+        elif exc is not None:
+            self.attributes["outcome"] = "error"
+            self._span.record_exception(exc)
+        if self.attributes["outcome"] == "error":
+            self._span.set_status(Status(StatusCode.ERROR))
+        self._span.set_attribute("data_agent.outcome", self.attributes["outcome"])
+        metric_attributes = {
+            key: self.attributes[key]
+            for key in _METRIC_ATTRIBUTES
+            if key in self.attributes
+        }
+        operation_duration.record(duration, metric_attributes)
+        if "rows" in self.attributes:
+            operation_rows.record(self.attributes["rows"], metric_attributes)
+        _current_attributes.reset(self._token)
+        return self._span_context.__exit__(exc_type, exc, tb)
+
+    def finish(self, result):
+        if "rows" not in self.attributes and isinstance(result, list):
+            set_attributes(rows=len(result))
+        return result
+
+
+def instrumented(operation: str | None = None, **attributes):
+    """
+    Decorates a function, sync or async, so that each call runs in a span
+    named after the operation (the function name by default) and records
+    the data_agent.operation.duration and data_agent.operation.rows
+    histograms. Rows default to the length of a list result; the
+    function can set them, and other attributes, with `set_attributes`.
+    """
+
+    def decorator(fn):
+        name = operation or fn.__name__
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _Operation(name, attributes) as call:
+                    return call.finish(await fn(*args, **kwargs))
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Operation(name, attributes) as call:
+                return call.finish(fn(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+class _LockedFile:
+    """A file shared by the span and metric exporters, one line per write."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, text: str) -> None:
+        with self._lock:
+            self._file.write(text)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._file.flush()
+
+
+def _add_span_processor(span_processor) -> None:
+    """
+    Adds a span processor to the global tracer provider. If the runtime
+    (e.g. AdkApp with tracing enabled) already installed one, the processor
+    is added to it, so spans still reach its exporter.
+    """
+    from opentelemetry.sdk.trace import TracerProvider
+
+    provider = trace.get_tracer_provider()
+    if not isinstance(provider, TracerProvider):
+        provider = TracerProvider()
+        trace.set_tracer_provider(provider)
+    provider.add_span_processor(span_processor)
+
+
+def configure_exporters(exporters: list[str] = TELEMETRY_EXPORTERS) -> None:
+    """
+    Installs the local exporters listed in TELEMETRY_EXPORTERS:
+    - "file": spans and metrics, as JSON lines, to TELEMETRY_FILE_PATH.
+    - "prometheus": metrics on a scrape endpoint on TELEMETRY_PROMETHEUS_PORT.
+    Without any, spans go to whatever tracer provider the runtime installed
+    (e.g. Cloud Trace with AdkApp(enable_tracing=True)).
+    """
+    if not exporters:
+        return
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.view import (
+        ExplicitBucketHistogramAggregation,
+        View,
+    )
+
+    metric_readers = []
+    for exporter in exporters:
+        try:
+            if exporter == "file":
+                from opentelemetry.sdk.metrics.export import (
+                    ConsoleMetricExporter,
+                    PeriodicExportingMetricReader,
+                )
+                from opentelemetry.sdk.trace.export import (
+                    BatchSpanProcessor,
+                    ConsoleSpanExporter,
+                )
+
+                out = _LockedFile(TELEMETRY_FILE_PATH)
+                _add_span_processor(
+                    BatchSpanProcessor(
+                        ConsoleSpanExporter(
+                            out=out, formatter=lambda span: span.to_json(indent=None) + "\n"
+                        )
+                    )
+                )
+                metric_readers.append(
+                    PeriodicExportingMetricReader(
+                        ConsoleMetricExporter(
+                            out=out,
+                            formatter=lambda data: data.to_json(indent=None) + "\n",
+                        ),
+                        export_interval_millis=TELEMETRY_EXPORT_INTERVAL_SECONDS * 1000,
+                    )
+                )
+            elif exporter == "prometheus":
+                from opentelemetry.exporter.prometheus import PrometheusMetricReader
+                from prometheus_client import start_http_server
+
+                start_http_server(TELEMETRY_PROMETHEUS_PORT)
+                metric_readers.append(PrometheusMetricReader())
+            else:
+                logger.warning(
+                    f"[{DISPLAY_NAME}] Unknown telemetry exporter '{exporter}'. Ignoring it."
+                )
+                continue
+            logger.info(f"[{DISPLAY_NAME}] Enabled '{exporter}' telemetry exporter.")
+        except ImportError as e:
+            logger.warning(
+                f"[{DISPLAY_NAME}] Could not enable '{exporter}' telemetry exporter. Install its package to use it. Error: {e}"
+            )
+
+    if metric_readers:
+        metrics.set_meter_provider(
+            MeterProvider(
+                metric_readers=metric_readers,
+                views=[
+                    View(
+                        instrument_name="data_agent.operation.duration",
+                        aggregation=ExplicitBucketHistogramAggregation(_DURATION_BUCKETS),
+                    ),
+                    View(
+                        instrument_name="data_agent.bigquery.admission_wait",
+                        aggregation=ExplicitBucketHistogramAggregation(_DURATION_BUCKETS),
+                    ),
+                    View(
+                        instrument_name="data_agent.operation.rows",
+                        aggregation=ExplicitBucketHistogramAggregation(_ROWS_BUCKETS),
+                    ),
+                ],
+            )
+        )
+
+
+configure_exporters()
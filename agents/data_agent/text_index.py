@@ -0,0 +1,94 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import re
+from collections import Counter, defaultdict
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Splits text into lowercase word tokens. snake_case and camelCase names are
+    split into their words, and plural endings are removed.
+    """
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text)
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+", text.lower()):
+        if len(token) > 4 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """
+    An Okapi BM25 inverted index over a list of documents. A query only
+    touches the postings of its own terms, so lookups stay fast as the number
+    of documents grows. The index is a plain object and can be pickled.
+    """
+
+    def __init__(self, documents: list[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.num_documents = len(documents)
+        # term -> [(document index, term frequency)]
+        self.postings: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        self.lengths: list[int] = []
+        for i, document in enumerate(documents):
+            term_counts = Counter(tokenize(document))
+            self.lengths.append(sum(term_counts.values()))
+            for term, frequency in term_counts.items():
+                self.postings[term].append((i, frequency))
+        self.postings = dict(self.postings)
+        self.average_length = (
+            sum(self.lengths) / self.num_documents if self.num_documents else 0
+        )
+        self.idf = {
+            term: math.log(
+                1 + (self.num_documents - len(postings) + 0.5) / (len(postings) + 0.5)
+            )
+            for term, postings in self.postings.items()
+        }
+
+    def scores(self, query: str) -> list[float]:
+        """
+        Returns the BM25 score of every document for the query.
+        """
+        scores = [0.0] * self.num_documents
+        average_length = self.average_length or 1
+        for term in set(tokenize(query)):
+            for i, frequency in self.postings.get(term, ()):
+                length_norm = 1 - self.b + self.b * self.lengths[i] / average_length
+                scores[i] += (
+                    self.idf[term]
+                    * frequency
+                    * (self.k1 + 1)
+                    / (frequency + self.k1 * length_norm)
+                )
+        return scores
+
+    def top(self, query: str, k: int) -> list[int]:
+        """
+        Returns the indexes of the (at most) k best matching documents, best
+        first. Documents without any query term are never returned.
+        """
+        scores = self.scores(query)
+        ranked = sorted(
+            (i for i, score in enumerate(scores) if score > 0),
+            key=lambda i: scores[i],
+            reverse=True,
+        )
+        return ranked[:k]
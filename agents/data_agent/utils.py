@@ -12,22 +12,36 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
+import json
 import logging
+import os
+import pickle
+import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-from google.cloud import bigquery, dataplex_v1
-from google.cloud.bigquery.table import TableReference
+from google.api_core import exceptions as api_exceptions
+from google.api_core import retry as api_retry
 from proto.marshal.collections import maps, repeated
 
+from .clients import get_bigquery_client, get_dataplex_client
 from .constants import (
-    DATASET_NAME,
-    DATA_PROFILES_TABLE_FULL_ID,
+    CONTEXT_CACHE_DIR,
+    CONTEXT_CACHE_ENABLED,
+    DATA_PROFILE_MAX_PERCENT_NULL,
+    DATA_PROFILE_TOP_N,
+    DATAPLEX_FETCH_MAX_WORKERS,
+    DATAPLEX_RETRY_DEADLINE_SECONDS,
     DISPLAY_NAME,
-    FEW_SHOT_EXAMPLES_TABLE_FULL_ID,
-    LOCATION,
-    PROJECT_ID,
-    TABLE_NAMES,
+    SAMPLE_DATA_MAX_WORKERS,
+    SAMPLE_DATA_MODE,
 )
+from .datasets import current_dataset
+from .execution_policy import BIGQUERY_RETRY, query_retry_kwargs
+# google.cloud.bigquery and dataplex_v1 take about a second each to import, so
+# they are imported by the functions that use them, on first use.
+from .telemetry import instrumented, record_error, record_query_job, set_attributes
 
 # --- Logging Configuration ---
 logging.basicConfig(
@@ -37,14 +51,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Retries Dataplex calls on transient gRPC errors, with exponential backoff.
+_DATAPLEX_RETRY = api_retry.Retry(
+    predicate=api_retry.if_exception_type(
+        api_exceptions.ServiceUnavailable,
+        api_exceptions.DeadlineExceeded,
+        api_exceptions.InternalServerError,
+        api_exceptions.ResourceExhausted,
+    ),
+    initial=0.5,
+    maximum=8.0,
+    multiplier=2.0,
+    timeout=DATAPLEX_RETRY_DEADLINE_SECONDS,
+)
+
 
+@instrumented(credential_mode="service_account")
 def fetch_few_shot_examples() -> list[str]:
     """
     Fetches few-shot examples from a BigQuery table for the current dataset.
     This function is schema-agnostic; it fetches all columns and formats them
     as key-value strings for the prompt.
     """
-    examples_table_id = FEW_SHOT_EXAMPLES_TABLE_FULL_ID
+    config = current_dataset()
+    examples_table_id = config.few_shot_examples_table_full_id
     if not examples_table_id:
         logger.info(
             f"[{DISPLAY_NAME}] FEW_SHOT_EXAMPLES_TABLE_FULL_ID is not configured. Skipping few-shot example fetching."
@@ -53,9 +83,11 @@ def fetch_few_shot_examples() -> list[str]:
 
     start_time = time.time()
     logger.info(
-        f"[{DISPLAY_NAME}] Starting to fetch few-shot examples for dataset '{DATASET_NAME}' from '{examples_table_id}'."
+        f"[{DISPLAY_NAME}] Starting to fetch few-shot examples for dataset '{config.dataset_name}' from '{examples_table_id}'."
     )
-    client = bigquery.Client(project=PROJECT_ID)
+    from google.cloud import bigquery
+
+    client = get_bigquery_client()
     # Use SELECT * to remain schema-agnostic. The filtering column 'dataset' is assumed to exist.
     query = """
         SELECT *
@@ -65,13 +97,14 @@ def fetch_few_shot_examples() -> list[str]:
 
     job_config = bigquery.QueryJobConfig(
         query_parameters=[
-            bigquery.ScalarQueryParameter("dataset_name", "STRING", DATASET_NAME)
+            bigquery.ScalarQueryParameter("dataset_name", "STRING", config.dataset_name)
         ]
     )
 
     try:
-        query_job = client.query(query, job_config=job_config)
+        query_job = client.query(query, job_config=job_config, **query_retry_kwargs())
         results = query_job.result()
+        record_query_job(query_job)
         formatted_examples = []
         for row in results:
             # For each row, create a formatted string of key-value pairs.
@@ -87,6 +120,7 @@ def fetch_few_shot_examples() -> list[str]:
         return formatted_examples
     except Exception as e:
         # Catch exceptions like the 'dataset' column not being found.
+        record_error(e)
         duration = time.time() - start_time
         logger.error(
             f"[{DISPLAY_NAME}] --- Failed to fetch few-shot examples after {duration:.2f} seconds. Check if the table exists and contains a 'dataset' column. Error: {e} ---",
@@ -95,41 +129,49 @@ def fetch_few_shot_examples() -> list[str]:
         return []
 
 
+@instrumented(credential_mode="service_account")
 def fetch_dataset_description() -> str:
     """
     Fetches the description for a given BigQuery dataset.
     """
-    if not PROJECT_ID or not DATASET_NAME:
+    config = current_dataset()
+    if not config.project_id or not config.dataset_name:
         logger.warning(
             f"[{DISPLAY_NAME}] PROJECT_ID or DATASET_NAME not configured. Skipping dataset description fetch."
         )
         return ""
     try:
         start_time = time.time()
-        client = bigquery.Client(project=PROJECT_ID)
-        dataset_id = f"{PROJECT_ID}.{DATASET_NAME}"
-        dataset = client.get_dataset(dataset_id)
+        client = get_bigquery_client()
+        dataset_id = f"{config.project_id}.{config.dataset_name}"
+        dataset = client.get_dataset(dataset_id, retry=BIGQUERY_RETRY)
         duration = time.time() - start_time
         logger.info(
             f"[{DISPLAY_NAME}] --- Successfully fetched dataset description (Duration: {duration:.2f} seconds) ---"
         )
         return dataset.description if dataset.description else ""
     except Exception as e:
+        record_error(e)
         logger.error(
-            f"[{DISPLAY_NAME}] Failed to fetch dataset description for {PROJECT_ID}.{DATASET_NAME}: {e}",
+            f"[{DISPLAY_NAME}] Failed to fetch dataset description for {config.project_id}.{config.dataset_name}: {e}",
             exc_info=True,
         )
         return ""
 
 
-def fetch_bigquery_data_profiles() -> list[dict]:
+@instrumented(credential_mode="service_account")
+def fetch_bigquery_data_profiles(table_names: list[str] | None = None) -> list[dict]:
     """
     Fetches data profile information from a BigQuery table specified in constants.
+    Args:
+        table_names: The tables to fetch profiles for (default: the tables in
+            scope of the current dataset).
     """
+    config = current_dataset()
     start_time = time.time()
-    dataset_name_to_filter = DATASET_NAME
-    target_table_names = TABLE_NAMES
-    profiles_table_id = DATA_PROFILES_TABLE_FULL_ID
+    dataset_name_to_filter = config.dataset_name
+    target_table_names = config.table_names if table_names is None else table_names
+    profiles_table_id = config.data_profiles_table_full_id
 
     if not profiles_table_id: # Check if the ID is None or an empty string
         logger.info(
@@ -146,8 +188,13 @@ def fetch_bigquery_data_profiles() -> list[dict]:
             f"[{DISPLAY_NAME}] Starting to fetch data profiles for all tables in dataset '{dataset_name_to_filter}' from '{profiles_table_id}'."
         )
 
-    client = bigquery.Client(project=PROJECT_ID)
+    from google.cloud import bigquery
+
+    client = get_bigquery_client()
 
+    # The export table keeps the rows of every scan run. Only the latest
+    # profile of each column is read, and columns that are mostly null or
+    # long top value lists are dropped before the rows leave BigQuery.
     select_clause = """
         SELECT
             CONCAT(data_source.table_project_id, '.', data_source.dataset_id, '.', data_source.table_id) AS source_table_id,
@@ -158,14 +205,24 @@ def fetch_bigquery_data_profiles() -> list[dict]:
             max_string_length,
             min_value,
             max_value,
-            top_n
+            job_start_time,
+            ARRAY(
+                SELECT AS STRUCT top_value.*
+                FROM UNNEST(top_n) AS top_value WITH OFFSET AS top_value_offset
+                WHERE top_value_offset < @top_n_param
+                ORDER BY top_value_offset
+            ) AS top_n
     """
     from_clause = f"FROM `{profiles_table_id}`"
     where_conditions = ["data_source.dataset_id = @dataset_name_param"]
     query_params = [
         bigquery.ScalarQueryParameter(
             "dataset_name_param", "STRING", dataset_name_to_filter
-        )
+        ),
+        bigquery.ScalarQueryParameter(
+            "max_percent_null_param", "FLOAT64", DATA_PROFILE_MAX_PERCENT_NULL
+        ),
+        bigquery.ScalarQueryParameter("top_n_param", "INT64", DATA_PROFILE_TOP_N),
     ]
 
     if target_table_names:
@@ -177,37 +234,27 @@ def fetch_bigquery_data_profiles() -> list[dict]:
         )
 
     where_clause = "WHERE " + " AND ".join(where_conditions)
+    # QUALIFY runs after the window, so an older scan never replaces a latest
+    # profile that is dropped by the null threshold.
+    qualify_clause = """
+        QUALIFY ROW_NUMBER() OVER (
+            PARTITION BY data_source.table_project_id, data_source.dataset_id, data_source.table_id, column_name
+            ORDER BY job_start_time DESC
+        ) = 1
+        AND (percent_null IS NULL OR percent_null <= @max_percent_null_param)
+    """
     order_by_clause = "ORDER BY source_table_id, column_name"
-    final_query = f"{select_clause}\n{from_clause}\n{where_clause}\n{order_by_clause};"
+    final_query = f"{select_clause}\n{from_clause}\n{where_clause}\n{qualify_clause}\n{order_by_clause};"
     logger.debug(
         f"[{DISPLAY_NAME}] Executing BigQuery data profiles query:\n{final_query}"
     )
     job_config = bigquery.QueryJobConfig(query_parameters=query_params)
-    profiles_data = []
 
     try:
-        query_job = client.query(final_query, job_config=job_config)
+        query_job = client.query(final_query, job_config=job_config, **query_retry_kwargs())
         results = query_job.result()
-        raw_profiles_data = [dict(row.items()) for row in results]
-
-        profiles_data = []  # Initialize the final list for filtered profiles
-        for profile in raw_profiles_data:
-            percent_null_value = profile.get('percent_null')
-            description_value = profile.get('description')
-
-            remove_profile = False
-            reason = ""
-
-            # Check condition 1: percent_null > 80
-            if isinstance(percent_null_value, (float, int)) and percent_null_value > 90:
-                remove_profile = True
-                reason = f"percent_null > 80% (Value: {percent_null_value}%)"
-
-            if remove_profile:
-                continue  # Skip adding this profile to the final list
-
-            # Add profile if it doesn't meet any removal condition
-            profiles_data.append(profile)
+        record_query_job(query_job)
+        profiles_data = [dict(row.items()) for row in results]
 
         num_profiles_fetched = len(profiles_data)
         end_time = time.time()
@@ -217,7 +264,8 @@ def fetch_bigquery_data_profiles() -> list[dict]:
         )
         return profiles_data
 
-    except Exception:
+    except Exception as e:
+        record_error(e)
         end_time = time.time()
         duration = end_time - start_time
         logger.error(
@@ -227,20 +275,141 @@ def fetch_bigquery_data_profiles() -> list[dict]:
         return []
 
 
-def fetch_sample_data_for_tables(num_rows: int = 3) -> list[dict]:
+def _sample_cache_path(full_table_name: str, modified: int, num_rows: int) -> str:
+    key = hashlib.sha256(
+        f"{full_table_name}:{modified}:{num_rows}".encode("utf-8")
+    ).hexdigest()
+    return os.path.join(CONTEXT_CACHE_DIR, "samples", f"{key[:32]}.pkl")
+
+
+def _load_cached_sample(
+    full_table_name: str, modified: int | None, num_rows: int
+) -> list[dict] | None:
+    if not CONTEXT_CACHE_ENABLED or modified is None:
+        return None
+    try:
+        with open(_sample_cache_path(full_table_name, modified, num_rows), "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(
+            f"[{DISPLAY_NAME}] Could not read cached sample data for table {full_table_name}: {e}"
+        )
+        return None
+
+
+def _save_cached_sample(
+    full_table_name: str, modified: int | None, num_rows: int, rows: list[dict]
+) -> None:
+    if not CONTEXT_CACHE_ENABLED or modified is None:
+        return
+    path = _sample_cache_path(full_table_name, modified, num_rows)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(rows, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning(
+            f"[{DISPLAY_NAME}] Could not cache sample data for table {full_table_name}: {e}"
+        )
+
+
+def _fetch_table_sample(client, full_table_name: str, num_rows: int) -> list[dict]:
+    from google.cloud.bigquery.table import TableReference
+
+    logger.info(f"[{DISPLAY_NAME}] Fetching sample data for table: {full_table_name}")
+    table_reference = TableReference.from_string(full_table_name)
+    rows_iterator = client.list_rows(
+        table_reference, max_results=num_rows, retry=BIGQUERY_RETRY
+    )
+    return [dict(row.items()) for row in rows_iterator]
+
+
+def _fetch_samples_parallel(
+    client, project_id: str, dataset_id: str, table_ids: list[str], num_rows: int
+) -> dict[str, list[dict]]:
+    """
+    Samples each table with `list_rows` (which is not billed) on a bounded
+    worker pool. Tables that fail are logged and left out.
     """
-    Fetches a few sample rows from tables defined in constants (PROJECT_ID, DATASET_NAME, TABLE_NAMES),
+    samples: dict[str, list[dict]] = {}
+    with ThreadPoolExecutor(
+        max_workers=SAMPLE_DATA_MAX_WORKERS, thread_name_prefix="sample-data"
+    ) as executor:
+        futures = {
+            table_id_str: executor.submit(
+                _fetch_table_sample,
+                client,
+                f"{project_id}.{dataset_id}.{table_id_str}",
+                num_rows,
+            )
+            for table_id_str in table_ids
+        }
+        for table_id_str, future in futures.items():
+            try:
+                samples[table_id_str] = future.result()
+            except Exception as e:
+                logger.error(
+                    f"[{DISPLAY_NAME}] Error fetching sample data for table {project_id}.{dataset_id}.{table_id_str}: {e}",
+                    exc_info=True,
+                )
+    return samples
+
+
+def _fetch_samples_batched(
+    client, project_id: str, dataset_id: str, table_ids: list[str], num_rows: int
+) -> dict[str, list[dict]] | None:
+    """
+    Samples all tables with one UNION ALL query. Unlike `list_rows`, the query
+    is billed for a scan of every table. Returns None if the query fails (e.g.
+    a table requires a partition filter), so the caller can fall back.
+    """
+    union_parts = [
+        f"SELECT '{table_id_str}' AS table_id, TO_JSON_STRING(t) AS row_json "
+        f"FROM (SELECT * FROM `{project_id}.{dataset_id}.{table_id_str}` LIMIT {int(num_rows)}) AS t"
+        for table_id_str in table_ids
+    ]
+    query = "\nUNION ALL\n".join(union_parts)
+    try:
+        logger.info(
+            f"[{DISPLAY_NAME}] Fetching sample data for {len(table_ids)} tables in one batched query."
+        )
+        samples: dict[str, list[dict]] = {table_id_str: [] for table_id_str in table_ids}
+        query_job = client.query(query, **query_retry_kwargs())
+        for row in query_job.result():
+            samples[row["table_id"]].append(json.loads(row["row_json"]))
+        record_query_job(query_job)
+        return samples
+    except Exception as e:
+        logger.warning(
+            f"[{DISPLAY_NAME}] Batched sample data query failed. Sampling tables one by one instead. Error: {e}"
+        )
+        return None
+
+
+@instrumented(credential_mode="service_account")
+def fetch_sample_data_for_tables(
+    num_rows: int = 3, table_names: list[str] | None = None
+) -> list[dict]:
+    """
+    Fetches a few sample rows from the tables in scope of the current dataset (see `current_dataset`).
     Args:
         num_rows: The number of sample rows to fetch for each table.
+        table_names: The tables to sample (default: the tables in scope, or all
+            base tables of the dataset if none are listed).
     Returns:
         A list of dictionaries, where each dictionary contains 'table_name' (fully qualified)
         and 'sample_rows'. Returns an empty list if no data can be fetched or an error occurs.
     """
+    config = current_dataset()
     start_time = time.time()
     sample_data_results: list[dict] = []
-    project_id = PROJECT_ID
-    dataset_id = DATASET_NAME
-    table_names_list = TABLE_NAMES
+    project_id = config.project_id
+    dataset_id = config.dataset_name
+    table_names_list = config.table_names if table_names is None else table_names
 
     if not project_id or not dataset_id:
         logger.error(
@@ -248,8 +417,9 @@ def fetch_sample_data_for_tables(num_rows: int = 3) -> list[dict]:
         )
         return sample_data_results
     try:
-        client = bigquery.Client(project=project_id)
+        client = get_bigquery_client()
     except Exception as e:
+        record_error(e)
         logger.error(
             f"[{DISPLAY_NAME}] Failed to create BigQuery client for project {project_id}: {e}",
             exc_info=True,
@@ -268,7 +438,7 @@ def fetch_sample_data_for_tables(num_rows: int = 3) -> list[dict]:
         )
         try:
             dataset_ref = client.dataset(dataset_id, project=project_id)
-            for bq_table in client.list_tables(dataset_ref):
+            for bq_table in client.list_tables(dataset_ref, retry=BIGQUERY_RETRY):
                 if bq_table.table_type == "TABLE":
                     tables_to_fetch_samples_from_ids.append(bq_table.table_id)
                 else:
@@ -276,6 +446,7 @@ def fetch_sample_data_for_tables(num_rows: int = 3) -> list[dict]:
                         f"[{DISPLAY_NAME}] Skipping non-base table: {bq_table.project}.{bq_table.dataset_id}.{bq_table.table_id} (Type: {bq_table.table_type})"
                     )
         except Exception as e:
+            record_error(e)
             logger.error(
                 f"[{DISPLAY_NAME}] Error listing tables for {project_id}.{dataset_id}: {e}",
                 exc_info=True,
@@ -288,31 +459,61 @@ def fetch_sample_data_for_tables(num_rows: int = 3) -> list[dict]:
         )
         return sample_data_results
 
+    # Samples are cached per table and last modified time, so unchanged tables are never sampled again.
+    try:
+        tables_modified = fetch_table_modified_times(client)
+    except Exception as e:
+        logger.warning(
+            f"[{DISPLAY_NAME}] Could not read table modified times for {project_id}.{dataset_id}. Sample data will not be cached. Error: {e}"
+        )
+        tables_modified = {}
+    samples_by_table: dict[str, list[dict]] = {}
+    tables_to_sample: list[str] = []
     for table_id_str in tables_to_fetch_samples_from_ids:
-        full_table_name = f"{project_id}.{dataset_id}.{table_id_str}"
-        try:
-            logger.info(
-                f"[{DISPLAY_NAME}] Fetching sample data for table: {full_table_name}"
+        cached_rows = _load_cached_sample(
+            f"{project_id}.{dataset_id}.{table_id_str}",
+            tables_modified.get(table_id_str),
+            num_rows,
+        )
+        if cached_rows is not None:
+            samples_by_table[table_id_str] = cached_rows
+        else:
+            tables_to_sample.append(table_id_str)
+    if samples_by_table:
+        logger.info(
+            f"[{DISPLAY_NAME}] Using cached sample data for {len(samples_by_table)} unchanged tables."
+        )
+
+    if tables_to_sample:
+        fetched_samples = None
+        if SAMPLE_DATA_MODE == "batched":
+            fetched_samples = _fetch_samples_batched(
+                client, project_id, dataset_id, tables_to_sample, num_rows
             )
-            table_reference = TableReference.from_string(
-                full_table_name, default_project=project_id
+        if fetched_samples is None:
+            fetched_samples = _fetch_samples_parallel(
+                client, project_id, dataset_id, tables_to_sample, num_rows
             )
-            rows_iterator = client.list_rows(table_reference, max_results=num_rows)
-            table_sample_rows = [dict(row.items()) for row in rows_iterator]
-            if table_sample_rows:
-                sample_data_results.append(
-                    {"table_name": full_table_name, "sample_rows": table_sample_rows}
-                )
-            else:
-                logger.info(
-                    f"[{DISPLAY_NAME}] No sample data found for table '{full_table_name}'."
-                )
-        except Exception as e:
-            logger.error(
-                f"[{DISPLAY_NAME}] Error fetching sample data for table {full_table_name}: {e}",
-                exc_info=True,
+        for table_id_str, table_sample_rows in fetched_samples.items():
+            samples_by_table[table_id_str] = table_sample_rows
+            _save_cached_sample(
+                f"{project_id}.{dataset_id}.{table_id_str}",
+                tables_modified.get(table_id_str),
+                num_rows,
+                table_sample_rows,
+            )
+
+    for table_id_str in tables_to_fetch_samples_from_ids:
+        full_table_name = f"{project_id}.{dataset_id}.{table_id_str}"
+        table_sample_rows = samples_by_table.get(table_id_str)
+        if table_sample_rows:
+            sample_data_results.append(
+                {"table_name": full_table_name, "sample_rows": table_sample_rows}
+            )
+        elif table_sample_rows is not None:
+            logger.info(
+                f"[{DISPLAY_NAME}] No sample data found for table '{full_table_name}'."
             )
-            continue
 
     end_time = time.time()
     duration = end_time - start_time
@@ -322,6 +523,125 @@ def fetch_sample_data_for_tables(num_rows: int = 3) -> list[dict]:
     return sample_data_results
 
 
+@instrumented(credential_mode="service_account")
+def fetch_table_modified_times(client) -> dict[str, int]:
+    """
+    Returns the last modified time (in milliseconds since the epoch) of every
+    table in the configured dataset, read from __TABLES__ in one query.
+    """
+    config = current_dataset()
+    query = f"SELECT table_id, last_modified_time FROM `{config.project_id}.{config.dataset_name}.__TABLES__`"
+    query_job = client.query(query, **query_retry_kwargs())
+    tables_modified = {
+        row["table_id"]: row["last_modified_time"] for row in query_job.result()
+    }
+    record_query_job(query_job)
+    set_attributes(rows=len(tables_modified))
+    return tables_modified
+
+
+@instrumented(credential_mode="service_account")
+def fetch_context_freshness() -> dict | None:
+    """
+    Fetches cheap change signals for the configured scope: the dataset and
+    table `modified` timestamps, plus the `modified` timestamps and row counts
+    of the data profile and few-shot example source tables.
+    Returns:
+        A dictionary of signals that compares equal as long as none of the
+        sources changed, or None if the signals could not be fetched.
+    """
+    config = current_dataset()
+    if not config.project_id or not config.dataset_name:
+        return None
+    try:
+        start_time = time.time()
+        client = get_bigquery_client()
+        dataset = client.get_dataset(
+            f"{config.project_id}.{config.dataset_name}", retry=BIGQUERY_RETRY
+        )
+
+        tables_modified = fetch_table_modified_times(client)
+        if config.table_names:
+            tables_modified = {
+                table_id: modified
+                for table_id, modified in tables_modified.items()
+                if table_id in config.table_names
+            }
+
+        sources_modified = {}
+        sources_rows = {}
+        for source_table_id in (
+            config.data_profiles_table_full_id,
+            config.few_shot_examples_table_full_id,
+        ):
+            if source_table_id:
+                source_table = client.get_table(source_table_id, retry=BIGQUERY_RETRY)
+                sources_modified[source_table_id] = (
+                    source_table.modified.isoformat() if source_table.modified else None
+                )
+                sources_rows[source_table_id] = source_table.num_rows
+
+        set_attributes(rows=len(tables_modified))
+        duration = time.time() - start_time
+        logger.info(
+            f"[{DISPLAY_NAME}] --- Successfully fetched context freshness signals for {len(tables_modified)} tables (Duration: {duration:.2f} seconds) ---"
+        )
+        return {
+            "dataset_modified": dataset.modified.isoformat() if dataset.modified else None,
+            "tables_modified": tables_modified,
+            "sources_modified": sources_modified,
+            "sources_rows": sources_rows,
+        }
+    except Exception as e:
+        record_error(e)
+        logger.warning(
+            f"[{DISPLAY_NAME}] Could not fetch context freshness signals for {config.project_id}.{config.dataset_name}: {e}"
+        )
+        return None
+
+
+@instrumented(credential_mode="service_account")
+def fetch_profile_scan_times() -> dict | None:
+    """
+    Fetches the start time of the latest data profile scan of each table in
+    the configured dataset, from the data profiles table.
+    Returns:
+        A dictionary mapping table IDs to their latest scan time, or None if
+        there is no profiles table or the scan times could not be fetched.
+    """
+    config = current_dataset()
+    if not config.data_profiles_table_full_id:
+        return None
+    from google.cloud import bigquery
+
+    query = f"""
+        SELECT data_source.table_id AS table_id, MAX(job_start_time) AS job_start_time
+        FROM `{config.data_profiles_table_full_id}`
+        WHERE data_source.dataset_id = @dataset_name
+        GROUP BY table_id
+    """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("dataset_name", "STRING", config.dataset_name)
+        ]
+    )
+    try:
+        client = get_bigquery_client()
+        query_job = client.query(query, job_config=job_config, **query_retry_kwargs())
+        scan_times = {
+            row["table_id"]: row["job_start_time"] for row in query_job.result()
+        }
+        record_query_job(query_job)
+        set_attributes(rows=len(scan_times))
+        return scan_times
+    except Exception as e:
+        record_error(e)
+        logger.warning(
+            f"[{DISPLAY_NAME}] Could not fetch data profile scan times from {config.data_profiles_table_full_id}: {e}"
+        )
+        return None
+
+
 def convert_proto_to_dict(obj):
     if isinstance(obj, maps.MapComposite):
         return {k: convert_proto_to_dict(v) for k, v in obj.items()}
@@ -331,26 +651,62 @@ def convert_proto_to_dict(obj):
         return obj
 
 
-def fetch_table_entry_metadata() -> list[dict]:
+def _fetch_entry_metadata(client, entry_name: str) -> dict | None:
+    """
+    Fetches the aspects of a single Dataplex entry, retrying transient errors.
+    Returns None if the entry has no aspects or cannot be fetched.
+    """
+    from google.cloud import dataplex_v1
+
+    try:
+        get_entry_request = dataplex_v1.GetEntryRequest(
+            name=entry_name, view=dataplex_v1.EntryView.ALL
+        )
+        entry = client.get_entry(request=get_entry_request, retry=_DATAPLEX_RETRY)
+        aspects_data = {
+            aspect_key: convert_proto_to_dict(aspect.data)
+            for aspect_key, aspect in entry.aspects.items()
+            if hasattr(aspect, "data") and aspect.data
+        }
+        if aspects_data:
+            return {
+                "table_name": entry_name.split("/")[-1],
+                "aspects": aspects_data,
+            }
+    except Exception as e:
+        logger.warning(
+            f"[{DISPLAY_NAME}] Could not fetch metadata for single entry {entry_name}. Skipping. Error: {e}"
+        )
+    return None
+
+
+@instrumented()
+def fetch_table_entry_metadata(table_names: list[str] | None = None) -> list[dict]:
     """
     Fetches complete metadata (schema, tags, aspects, etc.) for table entries from Dataplex.
     This function is designed to fail gracefully, returning an empty list if it
     encounters any issues (e.g., permissions errors during a CI/CD build).
+    Args:
+        table_names: The tables to fetch entries for (default: the tables in
+            scope, or all tables of the dataset found by a Dataplex search if
+            none are listed).
     """
+    config = current_dataset()
     try:
         start_time = time.time()
-        project_id_val = PROJECT_ID
-        location_val = LOCATION
-        dataset_id_val = DATASET_NAME
-        table_names_val = TABLE_NAMES.split(",") if TABLE_NAMES else []
+        project_id_val = config.project_id
+        location_val = config.location
+        dataset_id_val = config.dataset_name
+        table_names_val = config.table_names if table_names is None else table_names
 
         logger.info(
             f"[{DISPLAY_NAME}] Fetching Dataplex metadata for "
             f"project='{project_id_val}', location='{location_val}', dataset='{dataset_id_val}', "
             f"tables='{table_names_val if table_names_val else 'All'}'"
         )
-        all_entry_metadata: list[dict] = []
-        client = dataplex_v1.CatalogServiceClient()
+        from google.cloud import dataplex_v1
+
+        client = get_dataplex_client()
         target_entry_names: list[str] = []
 
         if table_names_val:
@@ -367,7 +723,9 @@ def fetch_table_entry_metadata() -> list[dict]:
                 query=f"name:projects/{project_id_val}/datasets/{dataset_id_val}/tables/",
                 page_size=100,
             )
-            for entry in client.search_entries(request=search_request):
+            for entry in client.search_entries(
+                request=search_request, retry=_DATAPLEX_RETRY
+            ):
                 target_entry_names.append(entry.dataplex_entry.name)
 
         if not target_entry_names:
@@ -376,28 +734,14 @@ def fetch_table_entry_metadata() -> list[dict]:
             )
             return []
 
-        for entry_name in target_entry_names:
-            try:
-                get_entry_request = dataplex_v1.GetEntryRequest(
-                    name=entry_name, view=dataplex_v1.EntryView.ALL
-                )
-                entry = client.get_entry(request=get_entry_request)
-                aspects_data = {
-                    aspect_key: convert_proto_to_dict(aspect.data)
-                    for aspect_key, aspect in entry.aspects.items()
-                    if hasattr(aspect, "data") and aspect.data
-                }
-                if aspects_data:
-                    metadata = {
-                        "table_name": entry_name.split("/")[-1],
-                        "aspects": aspects_data,
-                    }
-                    all_entry_metadata.append(metadata)
-            except Exception as e:
-                logger.warning(
-                    f"[{DISPLAY_NAME}] Could not fetch metadata for single entry {entry_name}. Skipping. Error: {e}"
-                )
-                continue
+        with ThreadPoolExecutor(
+            max_workers=DATAPLEX_FETCH_MAX_WORKERS, thread_name_prefix="dataplex-entry"
+        ) as executor:
+            entries = executor.map(
+                lambda entry_name: _fetch_entry_metadata(client, entry_name),
+                target_entry_names,
+            )
+            all_entry_metadata = [metadata for metadata in entries if metadata]
 
         duration = time.time() - start_time
         logger.info(
@@ -406,8 +750,104 @@ def fetch_table_entry_metadata() -> list[dict]:
         return all_entry_metadata
 
     except Exception as e:
+        record_error(e)
         logger.warning(
             f"[{DISPLAY_NAME}] Could not fetch Dataplex metadata. This can be expected during a build process "
             f"if the service account lacks Dataplex permissions. The agent will proceed without this metadata. Error: {e}"
         )
         return []
+
+
+def _option_string_value(option_value: str | None) -> str | None:
+    """
+    Returns the value of a string option from INFORMATION_SCHEMA.TABLE_OPTIONS,
+    which is reported as a quoted GoogleSQL literal.
+    """
+    if not option_value:
+        return None
+    try:
+        return json.loads(option_value)
+    except ValueError:
+        return option_value.strip("\"'")
+
+
+@instrumented(credential_mode="service_account")
+def fetch_table_schemas(table_names: list[str] | None = None) -> list[dict]:
+    """
+    Fetches the column schemas and descriptions of the tables in scope from
+    INFORMATION_SCHEMA in a single query. Nested fields are listed by their
+    field path. This is the fallback for tables without Dataplex metadata,
+    and needs only BigQuery metadata access.
+    Args:
+        table_names: The tables to fetch schemas for (default: the tables in
+            scope of the current dataset).
+    Returns:
+        A list of dictionaries with 'table_name', 'description' and 'columns',
+        or an empty list if the schemas cannot be fetched.
+    """
+    config = current_dataset()
+    if not config.project_id or not config.dataset_name:
+        return []
+    from google.cloud import bigquery
+
+    if table_names is None:
+        table_names = config.table_names
+    start_time = time.time()
+    dataset_ref = f"{config.project_id}.{config.dataset_name}"
+    query = f"""
+        SELECT
+            p.table_name,
+            t.option_value AS table_description,
+            p.field_path,
+            p.data_type,
+            p.description,
+            c.is_partitioning_column,
+            c.clustering_ordinal_position
+        FROM `{dataset_ref}.INFORMATION_SCHEMA.COLUMN_FIELD_PATHS` AS p
+        JOIN `{dataset_ref}.INFORMATION_SCHEMA.COLUMNS` AS c
+            USING (table_name, column_name)
+        LEFT JOIN `{dataset_ref}.INFORMATION_SCHEMA.TABLE_OPTIONS` AS t
+            ON t.table_name = p.table_name AND t.option_name = 'description'
+        WHERE @all_tables OR p.table_name IN UNNEST(@table_names)
+        ORDER BY p.table_name, c.ordinal_position, p.field_path
+    """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("all_tables", "BOOL", not table_names),
+            bigquery.ArrayQueryParameter("table_names", "STRING", table_names),
+        ]
+    )
+    try:
+        client = get_bigquery_client()
+        schemas: dict[str, dict] = {}
+        query_job = client.query(query, job_config=job_config, **query_retry_kwargs())
+        for row in query_job.result():
+            schema = schemas.setdefault(
+                row["table_name"],
+                {
+                    "table_name": row["table_name"],
+                    "description": _option_string_value(row["table_description"]),
+                    "columns": [],
+                },
+            )
+            column = {"name": row["field_path"], "type": row["data_type"]}
+            if row["description"]:
+                column["description"] = row["description"]
+            if row["is_partitioning_column"] == "YES":
+                column["partitioning_column"] = True
+            if row["clustering_ordinal_position"] is not None:
+                column["clustering_position"] = row["clustering_ordinal_position"]
+            schema["columns"].append(column)
+
+        record_query_job(query_job)
+        duration = time.time() - start_time
+        logger.info(
+            f"[{DISPLAY_NAME}] --- Successfully fetched {len(schemas)} table schemas from INFORMATION_SCHEMA (Duration: {duration:.2f} seconds) ---"
+        )
+        return list(schemas.values())
+    except Exception as e:
+        record_error(e)
+        logger.warning(
+            f"[{DISPLAY_NAME}] Could not fetch table schemas from INFORMATION_SCHEMA for {dataset_ref}. Error: {e}"
+        )
+        return []
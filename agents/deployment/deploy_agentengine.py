@@ -25,7 +25,6 @@ import google.auth
 import sys
 
 import vertexai
-from data_agent.agent import root_agent
 from google.api_core import exceptions as google_exceptions
 from google.cloud import storage
 from vertexai import agent_engines
@@ -101,6 +100,9 @@ def create_agent_engine(env_vars: dict) -> str | None:
 
     logger.info(f"[{agent_display_name}] Found agent package: {agent_whl_file}")
 
+    # Only creating an agent engine needs the agent itself.
+    from data_agent.agent import root_agent
+
     adk_app = AdkApp(agent=root_agent, enable_tracing=True)
 
     try:
@@ -289,6 +291,95 @@ def main():
             "FEW_SHOT_EXAMPLES_TABLE_FULL_ID"
         ),
         "AUTH_ID": os.getenv("AUTH_ID"),
+        "DATASET_CONFIGS": os.getenv("DATASET_CONFIGS"),
+        "BQ_HTTP_POOL_SIZE": os.getenv("BQ_HTTP_POOL_SIZE"),
+        "BQ_USER_CLIENT_CACHE_SIZE": os.getenv("BQ_USER_CLIENT_CACHE_SIZE"),
+        "BQ_USER_CLIENT_TTL_SECONDS": os.getenv("BQ_USER_CLIENT_TTL_SECONDS"),
+        "QUERY_CACHE_ENABLED": os.getenv("QUERY_CACHE_ENABLED"),
+        "QUERY_CACHE_MAX_ENTRIES": os.getenv("QUERY_CACHE_MAX_ENTRIES"),
+        "QUERY_CACHE_MAX_BYTES": os.getenv("QUERY_CACHE_MAX_BYTES"),
+        "QUERY_CACHE_MAX_ENTRY_BYTES": os.getenv("QUERY_CACHE_MAX_ENTRY_BYTES"),
+        "QUERY_CACHE_TTL_SECONDS": os.getenv("QUERY_CACHE_TTL_SECONDS"),
+        "QUERY_CACHE_VALIDATION_TIMEOUT_SECONDS": os.getenv(
+            "QUERY_CACHE_VALIDATION_TIMEOUT_SECONDS"
+        ),
+        "QUERY_CACHE_SPILL_DIR": os.getenv("QUERY_CACHE_SPILL_DIR"),
+        "QUERY_CACHE_SPILL_MAX_BYTES": os.getenv("QUERY_CACHE_SPILL_MAX_BYTES"),
+        "BQ_RESULT_DOWNLOAD_MODE": os.getenv("BQ_RESULT_DOWNLOAD_MODE"),
+        "BQ_ARROW_MIN_ROWS": os.getenv("BQ_ARROW_MIN_ROWS"),
+        "RESULT_MAX_ROWS": os.getenv("RESULT_MAX_ROWS"),
+        "RESULT_MAX_BYTES": os.getenv("RESULT_MAX_BYTES"),
+        "RESULT_SUMMARY_MAX_ROWS": os.getenv("RESULT_SUMMARY_MAX_ROWS"),
+        "RESULT_STORE_ENABLED": os.getenv("RESULT_STORE_ENABLED"),
+        "RESULT_STORE_MAX_ROWS": os.getenv("RESULT_STORE_MAX_ROWS"),
+        "RESULT_STORE_MAX_BYTES": os.getenv("RESULT_STORE_MAX_BYTES"),
+        "RESULT_STORE_SESSION_MAX_BYTES": os.getenv("RESULT_STORE_SESSION_MAX_BYTES"),
+        "BQ_MAX_BYTES_BILLED": os.getenv("BQ_MAX_BYTES_BILLED"),
+        "BQ_DRY_RUN_ENABLED": os.getenv("BQ_DRY_RUN_ENABLED"),
+        "BQ_REQUIRE_PARTITION_FILTER": os.getenv("BQ_REQUIRE_PARTITION_FILTER"),
+        "BQ_DRY_RUN_CACHE_TTL_SECONDS": os.getenv("BQ_DRY_RUN_CACHE_TTL_SECONDS"),
+        "SQL_VALIDATION_ENABLED": os.getenv("SQL_VALIDATION_ENABLED"),
+        "BQ_ASYNC_TOOL_ENABLED": os.getenv("BQ_ASYNC_TOOL_ENABLED"),
+        "BQ_BATCH_MAX_QUERIES": os.getenv("BQ_BATCH_MAX_QUERIES"),
+        "BQ_RETRY_INITIAL_SECONDS": os.getenv("BQ_RETRY_INITIAL_SECONDS"),
+        "BQ_RETRY_MAX_SECONDS": os.getenv("BQ_RETRY_MAX_SECONDS"),
+        "BQ_RETRY_DEADLINE_SECONDS": os.getenv("BQ_RETRY_DEADLINE_SECONDS"),
+        "BQ_HEDGE_ENABLED": os.getenv("BQ_HEDGE_ENABLED"),
+        "BQ_HEDGE_PERCENTILE": os.getenv("BQ_HEDGE_PERCENTILE"),
+        "BQ_HEDGE_MIN_DELAY_SECONDS": os.getenv("BQ_HEDGE_MIN_DELAY_SECONDS"),
+        "BQ_HEDGE_WINDOW": os.getenv("BQ_HEDGE_WINDOW"),
+        "BQ_MAX_CONCURRENT_JOBS": os.getenv("BQ_MAX_CONCURRENT_JOBS"),
+        "BQ_MAX_CONCURRENT_JOBS_PER_PRINCIPAL": os.getenv(
+            "BQ_MAX_CONCURRENT_JOBS_PER_PRINCIPAL"
+        ),
+        "BQ_ADMISSION_MAX_QUEUED": os.getenv("BQ_ADMISSION_MAX_QUEUED"),
+        "BQ_ADMISSION_MAX_WAIT_SECONDS": os.getenv("BQ_ADMISSION_MAX_WAIT_SECONDS"),
+        "QUERY_HISTORY_ENABLED": os.getenv("QUERY_HISTORY_ENABLED"),
+        "QUERY_HISTORY_PATH": os.getenv("QUERY_HISTORY_PATH"),
+        "QUERY_HISTORY_WINDOW": os.getenv("QUERY_HISTORY_WINDOW"),
+        "QUERY_HISTORY_RETENTION_DAYS": os.getenv("QUERY_HISTORY_RETENTION_DAYS"),
+        "QUERY_HISTORY_SLOW_SECONDS": os.getenv("QUERY_HISTORY_SLOW_SECONDS"),
+        "BQ_QUERY_TIMEOUT_SECONDS": os.getenv("BQ_QUERY_TIMEOUT_SECONDS"),
+        "BQ_MIN_POLL_INTERVAL_SECONDS": os.getenv("BQ_MIN_POLL_INTERVAL_SECONDS"),
+        "BQ_MAX_POLL_INTERVAL_SECONDS": os.getenv("BQ_MAX_POLL_INTERVAL_SECONDS"),
+        "CONTEXT_FETCH_MAX_WORKERS": os.getenv("CONTEXT_FETCH_MAX_WORKERS"),
+        "CONTEXT_FETCH_TIMEOUT_SECONDS": os.getenv("CONTEXT_FETCH_TIMEOUT_SECONDS"),
+        "CONTEXT_REFRESH_INTERVAL_SECONDS": os.getenv(
+            "CONTEXT_REFRESH_INTERVAL_SECONDS"
+        ),
+        "CONTEXT_CACHE_ENABLED": os.getenv("CONTEXT_CACHE_ENABLED"),
+        "CONTEXT_CACHE_DIR": os.getenv("CONTEXT_CACHE_DIR"),
+        "CONTEXT_CACHE_TTL_SECONDS": os.getenv("CONTEXT_CACHE_TTL_SECONDS"),
+        "CONTEXT_CACHE_VALIDATE_AFTER_SECONDS": os.getenv(
+            "CONTEXT_CACHE_VALIDATE_AFTER_SECONDS"
+        ),
+        "SAMPLE_DATA_MODE": os.getenv("SAMPLE_DATA_MODE"),
+        "SAMPLE_DATA_MAX_WORKERS": os.getenv("SAMPLE_DATA_MAX_WORKERS"),
+        "DATAPLEX_FETCH_MAX_WORKERS": os.getenv("DATAPLEX_FETCH_MAX_WORKERS"),
+        "DATAPLEX_RETRY_DEADLINE_SECONDS": os.getenv("DATAPLEX_RETRY_DEADLINE_SECONDS"),
+        "DATA_PROFILE_MAX_PERCENT_NULL": os.getenv("DATA_PROFILE_MAX_PERCENT_NULL"),
+        "DATA_PROFILE_TOP_N": os.getenv("DATA_PROFILE_TOP_N"),
+        "PROMPT_TOKEN_BUDGET": os.getenv("PROMPT_TOKEN_BUDGET"),
+        "PROMPT_CHARS_PER_TOKEN": os.getenv("PROMPT_CHARS_PER_TOKEN"),
+        "PROMPT_ASPECT_FIELDS": os.getenv("PROMPT_ASPECT_FIELDS"),
+        "INSTRUCTION_MODE": os.getenv("INSTRUCTION_MODE"),
+        "SCHEMA_RETRIEVAL_TOP_K": os.getenv("SCHEMA_RETRIEVAL_TOP_K"),
+        "SCHEMA_RETRIEVAL_MAX_JOIN_PARTNERS": os.getenv(
+            "SCHEMA_RETRIEVAL_MAX_JOIN_PARTNERS"
+        ),
+        "SCHEMA_RETRIEVAL_MAX_TABLES": os.getenv("SCHEMA_RETRIEVAL_MAX_TABLES"),
+        "SCHEMA_RETRIEVAL_EMBEDDING_MODEL": os.getenv(
+            "SCHEMA_RETRIEVAL_EMBEDDING_MODEL"
+        ),
+        "FEW_SHOT_TOP_K": os.getenv("FEW_SHOT_TOP_K"),
+        "FEW_SHOT_MAX_TOKENS": os.getenv("FEW_SHOT_MAX_TOKENS"),
+        "TELEMETRY_EXPORTERS": os.getenv("TELEMETRY_EXPORTERS"),
+        "TELEMETRY_FILE_PATH": os.getenv("TELEMETRY_FILE_PATH"),
+        "TELEMETRY_PROMETHEUS_PORT": os.getenv("TELEMETRY_PROMETHEUS_PORT"),
+        "TELEMETRY_EXPORT_INTERVAL_SECONDS": os.getenv(
+            "TELEMETRY_EXPORT_INTERVAL_SECONDS"
+        ),
+        "AGENT_WARMUP_ENABLED": os.getenv("AGENT_WARMUP_ENABLED"),
     }
     env_vars = {k: v for k, v in raw_env_vars.items() if v is not None and v != ""}
     display_name = env_vars.get("DISPLAY_NAME")